@@ -2,59 +2,388 @@
 import re
 import time
 from datetime import datetime
-from typing import Dict, Tuple, Optional
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
 import json
 import os
+import threading
+
+from .matcher import LayeredMatcher, MatcherCache, VerdictCache, highlight_message, iter_scan_parallel
+from .normalize import NormalizedText, normalize
+from .patterns import rule_key
+from .scores import ScoreDecay, ScoreTable
+from .snapshot import MatcherSnapshot
+from .storage import ScoreJournal, WriteBehindWriter, create_storage
 
 # 配置数据存储路径
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 BAN_WORDS_FILE = os.path.join(DATA_DIR, "ban_words.json")
 USER_SCORE_FILE = os.path.join(DATA_DIR, "user_scores.json")
 
+# 存储后端："json"（默认，整体重写文件）或 "sqlite"（WAL 模式，按行写入，首次启用时自动迁移 JSON 数据）
+STORAGE_BACKEND = "json"
+
+# 用户分数延迟写盘策略：每隔一段时间或积累一定数量的变化后统一写一次
+SCORE_FLUSH_INTERVAL = 5     # 秒
+SCORE_FLUSH_MAX_DIRTY = 50   # 条
+
+# JSON 后端下用追加日志记录每次分数变化，定期压缩进 user_scores.json 快照
+SCORE_JOURNAL_ENABLED = True
+SCORE_JOURNAL_FILE = os.path.join(DATA_DIR, "user_scores.journal")
+SCORE_COMPACT_INTERVAL = 300     # 秒
+SCORE_COMPACT_MAX_DIRTY = 1000   # 条
+
+# 用户分数随时间衰减："none"（不衰减）、"exponential"（按半衰期）或 "linear"（每小时扣分）
+SCORE_DECAY_MODE = "none"
+SCORE_DECAY_HALF_LIFE = 24 * 3600   # 指数衰减半衰期（秒）
+SCORE_DECAY_POINTS_PER_HOUR = 1     # 线性衰减每小时扣除的分数
+
+# 分数记录清理：写盘时顺带清理分数为 0 的记录，以及超过一定时间没有变化的记录（None 表示不清理）
+SCORE_EVICT_ZERO = True
+SCORE_EVICT_IDLE = None          # 秒，例如 30 * 24 * 3600
+SCORE_EVICT_INTERVAL = 600       # 两次清理之间至少间隔的秒数
+
+# 共享词库模板：没有单独设置订阅的群默认订阅 global 模板。
+# 群自己的违禁词在模板基础上增加或覆盖权重，权重为 0 表示在本群屏蔽模板中的该词
+GLOBAL_TEMPLATE = "global"
+DEFAULT_TEMPLATES = [GLOBAL_TEMPLATE]
+
+# 编译好的匹配器持久化到快照文件，重启后违禁词没变的群直接加载，不必重新编译（None 表示关闭）
+MATCHER_SNAPSHOT_FILE = os.path.join(DATA_DIR, "matchers.cache")
+MATCHER_SNAPSHOT_MAX_AGE = 7 * 24 * 3600   # 秒，超过该时间没有用到的匹配器不再保存
+MATCHER_SNAPSHOT_SAVE_INTERVAL = 60        # 秒，重建后延迟在后台保存，合并期间的多次重建（None 表示只在关闭时保存）
+
+# 检测结果缓存：重复的短消息直接复用上次的检测结果（VERDICT_CACHE_SIZE 为 0 表示关闭）
+VERDICT_CACHE_SIZE = 4096        # 条
+VERDICT_CACHE_TTL = 600          # 秒
+VERDICT_CACHE_MAX_LENGTH = 200   # 超过该长度的消息不缓存
+
 class BanWordsDetector:
     def __init__(self):
+        started = time.perf_counter()
         self.ban_words = {}
-        self.user_scores = {}  # 存储用户累计权重分数
+        self.group_settings = {}  # 各群的附加设置（如分隔符容错）
+        self.templates = {}  # 共享词库模板 {模板名: {违禁词: 权重}}
+        self._snapshot = None
+        if MATCHER_SNAPSHOT_FILE:
+            self._snapshot = MatcherSnapshot(
+                MATCHER_SNAPSHOT_FILE, MATCHER_SNAPSHOT_MAX_AGE, MATCHER_SNAPSHOT_SAVE_INTERVAL
+            )
+        self._matcher_cache = MatcherCache(self._snapshot)  # 每个群（及每组共享模板）编译好的多模式匹配器
+        self._base_keys = {}  # {群号: 共享匹配器的缓存键，None 表示没有订阅非空模板}
+        self._base_specs = {}  # {共享匹配器的缓存键: (模板名元组, 匹配参数)}
+        self._layers = {}  # {群号: (版本, LayeredMatcher)}
+        self._verdict_cache = VerdictCache(VERDICT_CACHE_SIZE, VERDICT_CACHE_TTL, VERDICT_CACHE_MAX_LENGTH)
+        self.user_scores = ScoreTable()  # 存储用户累计权重分数 {群号: {用户ID: (分数, 最后更新时间)}}
+        self._last_evict = 0
         self.threshold = 10    # 默认阈值，达到此分数触发禁言
+        self.decay = ScoreDecay(SCORE_DECAY_MODE, SCORE_DECAY_HALF_LIFE, SCORE_DECAY_POINTS_PER_HOUR)
+        self._score_lock = threading.Lock()
         
         # 确保数据目录存在
         os.makedirs(DATA_DIR, exist_ok=True)
+        self.storage = create_storage(STORAGE_BACKEND, DATA_DIR)
+        
+        # 启用日志时每次变化都已追加落盘，快照只需低频压缩
+        self._journal = None
+        if SCORE_JOURNAL_ENABLED and STORAGE_BACKEND == "json":
+            self._journal = ScoreJournal(SCORE_JOURNAL_FILE)
+            self._score_writer = WriteBehindWriter(
+                self._save_user_scores, SCORE_COMPACT_INTERVAL, SCORE_COMPACT_MAX_DIRTY,
+                name="user-scores-compactor"
+            )
+        else:
+            self._score_writer = WriteBehindWriter(
+                self._save_user_scores, SCORE_FLUSH_INTERVAL, SCORE_FLUSH_MAX_DIRTY,
+                name="user-scores-writer"
+            )
         
         # 加载数据
         self._load_data()
+        self.load_seconds = time.perf_counter() - started  # 启动时加载数据的耗时
     
     def _load_data(self):
         """加载违禁词和用户分数数据"""
         try:
-            # 加载违禁词
-            if os.path.exists(BAN_WORDS_FILE):
-                with open(BAN_WORDS_FILE, "r", encoding="utf-8") as f:
-                    self.ban_words = json.load(f)
+            # 加载违禁词和共享模板
+            self.ban_words = self.storage.load_ban_words()
+            self.templates = self.storage.load_templates()
             
-            # 加载用户分数
-            if os.path.exists(USER_SCORE_FILE):
-                with open(USER_SCORE_FILE, "r", encoding="utf-8") as f:
-                    self.user_scores = json.load(f)
+            # 加载用户分数快照，再重放快照之后的日志
+            user_scores = self.storage.load_user_scores()
+            if self._journal is not None:
+                self._journal.replay(user_scores)
+            self.user_scores = ScoreTable()
+            self.user_scores.load(user_scores, self.decay.decode)
         except Exception as e:
             print(f"加载数据失败：{e}")
     
-    def _save_user_scores(self):
-        """保存用户分数数据"""
-        try:
-            with open(USER_SCORE_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.user_scores, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"保存用户分数失败：{e}")
+    def _save_user_scores(self, dirty_keys=None):
+        """
+        保存用户分数数据（由延迟写入器在后台线程调用）
+
+        JSON 后端整体原子替换文件，SQLite 后端只写变化的行；
+        写入失败时抛出异常，由写入器保留脏键稍后重试。
+        """
+        with self._score_lock:
+            if self._journal is not None:
+                # 快照包含了当前日志中的全部变化，之后的变化写入新日志
+                self._journal.rotate()
+            evicted = self._evict_scores()
+            if self.storage.needs_full_snapshot or dirty_keys is None:
+                snapshot = self.user_scores.dump(self.decay.encode)
+                changes = list(snapshot)
+            else:
+                keys = set(dirty_keys).union(evicted)
+                snapshot = self.user_scores.dump(self.decay.encode, keys)
+                changes = [ScoreTable.make_key(gid, uid) for gid, uid in keys]
+        self.storage.save_user_scores(snapshot, changes)
+        if self._journal is not None:
+            self._journal.discard_rotated()
+
+    def _evict_scores(self) -> List[Tuple]:
+        """
+        清理分数已为 0 或长时间没有变化的记录（调用方需持有 _score_lock）
+
+        Returns:
+            被清理的紧凑键列表
+        """
+        now = time.time()
+        if now - self._last_evict < SCORE_EVICT_INTERVAL:
+            return []
+        self._last_evict = now
+        evict_zero = SCORE_EVICT_ZERO or self.decay.enabled
+        if not evict_zero and SCORE_EVICT_IDLE is None:
+            return []
+
+        def should_evict(record) -> bool:
+            if SCORE_EVICT_IDLE is not None and now - record.last_update > SCORE_EVICT_IDLE:
+                return True
+            return evict_zero and self.decay.apply(record.score, record.last_update, now) <= 0
+
+        return self.user_scores.evict(should_evict)
+
+    def set_decay(self, mode: str, half_life: float = None, points_per_hour: float = None):
+        """
+        设置分数衰减模式
+
+        Args:
+            mode: "none" / "exponential" / "linear"
+            half_life: 指数衰减半衰期（秒）
+            points_per_hour: 线性衰减每小时扣除的分数
+        """
+        self.decay.configure(mode, half_life, points_per_hour)
+
+    def _current_score(self, group_id: str, user_id: str, now: float) -> float:
+        """按衰减模型计算用户此刻的分数"""
+        record = self.user_scores.get(group_id, user_id)
+        if record is None:
+            return 0
+        return self.decay.apply(record.score, record.last_update, now)
+
+    def set_flush_policy(self, interval: float = None, max_dirty: int = None):
+        """设置用户分数的写盘间隔（秒）和触发立即写盘的变化条数"""
+        self._score_writer.set_policy(interval, max_dirty)
+
+    def flush(self):
+        """立即把未写盘的用户分数写入文件"""
+        self._score_writer.flush()
+
+    def close(self):
+        """停止后台写盘线程，做最后一次写盘并关闭存储后端，保存匹配器快照"""
+        self._score_writer.close()
+        if self._journal is not None:
+            self._journal.close()
+        self.storage.close()
+        if self._snapshot is not None:
+            try:
+                self._snapshot.close()
+            except Exception as e:
+                print(f"保存匹配器快照失败：{e}")
     
     def set_ban_words(self, ban_words: Dict):
         """设置违禁词数据"""
         self.ban_words = ban_words
+        self._reset_matchers()
+
+    def set_group_settings(self, group_settings: Dict):
+        """设置各群的附加设置"""
+        self.group_settings = group_settings
+        self._reset_matchers()
+
+    def set_templates(self, templates: Dict):
+        """设置共享词库模板"""
+        self.templates = templates
+        self._reset_matchers()
+
+    def _reset_matchers(self):
+        self._matcher_cache.clear()
+        self._base_keys.clear()
+        self._layers.clear()
+
+    def subscribed_templates(self, group_id: str) -> List[str]:
+        """获取群订阅的模板名"""
+        settings = self.group_settings.get(group_id) or {}
+        return settings.get("templates", DEFAULT_TEMPLATES)
+
+    def _base_key(self, group_id: str) -> Optional[str]:
+        """
+        计算群使用的共享匹配器的缓存键
+
+        订阅的非空模板和匹配参数都相同的群得到同一个键，共用同一个匹配器。
+        """
+        names = tuple(sorted({name for name in self.subscribed_templates(group_id) if self.templates.get(name)}))
+        if not names:
+            return None
+        options = self._matcher_options(group_id)
+        key = "@" + "+".join(names)
+        if options:
+            key += "|" + json.dumps(options, sort_keys=True, ensure_ascii=False)
+        self._base_specs[key] = (names, options)
+        return key
+
+    def _template_words(self, names: Iterable[str]) -> Dict[str, int]:
+        """合并多个模板，同一个词出现在多个模板中时取最大权重"""
+        merged = {}
+        for name in names:
+            for word, weight in self.templates.get(name, {}).items():
+                if weight > merged.get(word, 0):
+                    merged[word] = weight
+        return merged
+
+    def _delta_words(self, group_id: str) -> Dict[str, int]:
+        """群自己需要编译的违禁词（去掉屏蔽标记）"""
+        return {word: weight for word, weight in self.ban_words.get(group_id, {}).items() if weight > 0}
+
+    def _group_matcher(self, group_id: str):
+        """
+        获取群的 (版本, 匹配器)，群没有任何违禁词时返回 None
+
+        没有订阅模板时与原来一样只有群自己的匹配器；订阅了模板时把共享匹配器和
+        群增量匹配器组合成 LayeredMatcher，版本为两者版本号的组合。
+        """
+        if group_id in self._base_keys:
+            base_key = self._base_keys[group_id]
+        else:
+            base_key = self._base_keys[group_id] = self._base_key(group_id)
+        group_words = self.ban_words.get(group_id)
+        options = self._matcher_options(group_id)
+
+        delta_entry = None
+        if group_words:
+            delta_entry = self._matcher_cache.peek(group_id) or self._matcher_cache.get_versioned(
+                group_id, self._delta_words(group_id), options
+            )
+        if base_key is None:
+            return delta_entry
+
+        base_entry = self._matcher_cache.peek(base_key) or self._matcher_cache.get_versioned(
+            base_key, self._template_words(self._base_specs[base_key][0]), options
+        )
+        version = (base_key, base_entry[0], delta_entry[0] if delta_entry else -1)
+        layer = self._layers.get(group_id)
+        if layer is None or layer[0] != version:
+            delta = delta_entry[1] if delta_entry and len(delta_entry[1]) else None
+            layer = (version, LayeredMatcher(base_entry[1], delta, group_words or ()))
+            self._layers[group_id] = layer
+        return layer
+
+    def effective_words(self, group_id: str) -> Dict[str, Tuple[int, str]]:
+        """
+        群实际生效的违禁词
+
+        Returns:
+            {违禁词: (权重, 来源)}，来源为模板名或 "本群"
+        """
+        group_words = self.ban_words.get(group_id, {})
+        overridden = {rule_key(word) for word in group_words}
+        effective = {}
+        for name in self.subscribed_templates(group_id):
+            for word, weight in self.templates.get(name, {}).items():
+                if rule_key(word) in overridden:
+                    continue
+                if word not in effective or weight > effective[word][0]:
+                    effective[word] = (weight, name)
+        for word, weight in group_words.items():
+            if weight > 0:
+                effective[word] = (weight, "本群")
+        return effective
+
+    def merged_words(self, group_id: str) -> Dict[str, List[str]]:
+        """
+        群实际生效的违禁词中归一化后相同、写法不同的词（匹配时合并为一个，按其中最大的权重计分）
+
+        Returns:
+            {违禁词: [与它合并的其他写法]}，只包含发生合并的词
+        """
+        spellings: Dict[str, List[str]] = {}
+        for word in self.effective_words(group_id):
+            spellings.setdefault(rule_key(word), []).append(word)
+        return {
+            word: [other for other in words if other != word]
+            for words in spellings.values() if len(words) > 1
+            for word in words
+        }
+
+    def inherits_word(self, group_id: str, word: str) -> bool:
+        """群订阅的模板中是否有与 word 归一化后相同的词"""
+        key = rule_key(word)
+        return any(
+            rule_key(w) == key
+            for name in self.subscribed_templates(group_id)
+            for w in self.templates.get(name, {})
+        )
+
+    def pattern_timeouts(self) -> int:
+        """模式规则扫描超出时间预算的次数"""
+        return self._matcher_cache.pattern_timeouts()
+
+    def _matcher_options(self, group_id: str) -> Dict:
+        """根据群设置生成构建匹配器的参数"""
+        settings = self.group_settings.get(group_id)
+        if not settings:
+            return {}
+        options = {}
+        if settings.get("fuzzy_gap", 0) > 0:
+            options["fuzzy_gap"] = settings["fuzzy_gap"]
+            if settings.get("fuzzy_separators"):
+                options["separators"] = settings["fuzzy_separators"]
+        if settings.get("pinyin"):
+            options["pinyin"] = True
+        return options
+
+    async def refresh_group(self, group_id: str):
+        """
+        某个群的违禁词或设置发生变化后重建该群的匹配器
+
+        只重建这一个群，构建在线程池中进行，完成前旧匹配器继续生效。
+        """
+        options = self._matcher_options(group_id)
+        await self._matcher_cache.rebuild(group_id, self._delta_words(group_id), options)
+        # 订阅或匹配参数可能变了，重新计算共享匹配器的键，需要时预先构建
+        base_key = self._base_keys[group_id] = self._base_key(group_id)
+        if base_key is not None and self._matcher_cache.peek(base_key) is None:
+            await self._matcher_cache.rebuild(
+                base_key, self._template_words(self._base_specs[base_key][0]), options
+            )
+
+    async def refresh_template(self, name: str):
+        """
+        模板内容变化后重建订阅了它的共享匹配器
+
+        每组订阅只重建一次，与订阅它的群数量无关。
+        """
+        # 模板可能从空变为非空（或反过来），各群的共享键需要重新计算
+        self._base_keys.clear()
+        for base_key, (names, options) in list(self._base_specs.items()):
+            if name in names and self._matcher_cache.peek(base_key) is not None:
+                await self._matcher_cache.rebuild(base_key, self._template_words(names), options)
     
     def set_threshold(self, threshold: int):
         """设置触发阈值"""
         self.threshold = threshold
     
-    def detect_ban_words(self, message: str, group_id: str, user_id: str) -> Tuple[int, Dict[str, int], str]:
+    def detect_ban_words(self, message: str, group_id: str, user_id: str,
+                         text: Optional[NormalizedText] = None) -> Tuple[int, Dict[str, int], List[Tuple[int, int, str]]]:
         """
         检测消息中的违禁词
         
@@ -62,33 +391,60 @@ class BanWordsDetector:
             message: 用户消息
             group_id: 群组ID
             user_id: 用户ID
+            text: 调用方已经归一化过的消息，传入时不再重复归一化
         
         Returns:
-            Tuple[总权重, 检测到的违禁词字典, 高亮消息]
+            Tuple[总权重, 检测到的违禁词字典, 命中位置列表[(起始, 结束, 违禁词)]]
         """
-        if group_id not in self.ban_words:
-            return 0, {}, message
+        entry = self._group_matcher(group_id)
+        if entry is None:
+            return 0, {}, []
+        version, matcher = entry
         
-        group_ban_words = self.ban_words[group_id]
-        total_weight = 0
-        detected_words = {}
-        highlighted_message = message
+        # 重复消息直接复用缓存的结果（版本号随违禁词变化，旧结果不会命中）
+        cacheable = self._verdict_cache.cacheable(message)
+        if cacheable:
+            cached = self._verdict_cache.get(group_id, version, message)
+            if cached is not None:
+                weight, detected_words, spans = cached
+                return weight, dict(detected_words), list(spans)
         
-        # 检测每个违禁词
-        for word, weight in group_ban_words.items():
-            # 使用正则表达式进行匹配（忽略大小写）
-            pattern = re.compile(re.escape(word), re.IGNORECASE)
-            matches = pattern.findall(message)
-            
-            if matches:
-                count = len(matches)
-                detected_words[word] = count
-                total_weight += weight * count
-                
-                # 高亮显示违禁词
-                highlighted_message = pattern.sub(f"【{word}】", highlighted_message)
-        
-        return total_weight, detected_words, highlighted_message
+        # 归一化（全半角、大小写、零宽字符、繁简），每条消息只做一次
+        if text is None:
+            text = normalize(message)
+        
+        # 多模式匹配，一次扫描找出所有违禁词
+        weight, detected_words, spans = matcher.scan(text)
+        if cacheable:
+            self._verdict_cache.put(group_id, version, message, (weight, dict(detected_words), tuple(spans)))
+        return weight, detected_words, spans
+    
+    def detect_many(self, records: Iterable[Tuple[str, str, str]], workers: int = 0,
+                    chunk_size: int = 1000) -> Iterator[Tuple]:
+        """
+        批量检测消息（用于历史消息回溯等离线场景），按输入顺序逐条产出结果
+        
+        Args:
+            records: (群号, 用户ID, 消息) 的可迭代对象，可以是文件流等惰性序列
+            workers: 大于 1 时使用多进程并行检测，否则在当前线程逐条检测
+            chunk_size: 多进程模式下每个任务包含的消息条数
+        
+        Yields:
+            Tuple[群号, 用户ID, 总权重, 检测到的违禁词字典, 命中位置列表]
+        """
+        if workers <= 1:
+            for group_id, user_id, message in records:
+                yield (group_id, user_id, *self.detect_ban_words(message, group_id, user_id))
+            return
+        
+        # 先在主进程编译好所有群的匹配器，每个工作进程只接收一次
+        # （共享匹配器在序列化时只会出现一份）；未单独配置的群使用键为 None 的默认匹配器
+        matchers = {}
+        for group_id in [None, *self.ban_words, *self.group_settings]:
+            entry = self._group_matcher(group_id)
+            if entry is not None:
+                matchers[group_id] = entry[1]
+        yield from iter_scan_parallel(records, matchers, workers, chunk_size)
     
     def update_user_score(self, group_id: str, user_id: str, weight: int) -> Tuple[int, bool]:
         """
@@ -102,35 +458,42 @@ class BanWordsDetector:
         Returns:
             Tuple[当前总分数, 是否触发禁言]
         """
-        # 生成用户唯一标识
-        user_key = f"{group_id}_{user_id}"
-        
-        # 获取当前分数
-        current_score = self.user_scores.get(user_key, 0)
-        
-        # 更新分数（可考虑添加衰减机制）
-        new_score = current_score + weight
-        self.user_scores[user_key] = new_score
+        now = time.time()
+        with self._score_lock:
+            # 获取当前分数（读取时按经过的时间计算衰减）
+            current_score = self._current_score(group_id, user_id, now)
+            
+            # 更新分数
+            new_score = current_score + weight
+            key = self.user_scores.set(group_id, user_id, new_score, now)
+            if self._journal is not None:
+                self._journal.append(ScoreTable.make_key(group_id, user_id), weight,
+                                     self.decay.encode(new_score, now))
         
-        # 保存分数
-        self._save_user_scores()
+        # 标记待保存，由后台线程合并写盘
+        self._score_writer.mark_dirty(key)
         
         # 检查是否触发禁言
         trigger_ban = new_score >= self.threshold
         
-        return new_score, trigger_ban
+        # 阈值为整数，向下取整后的比较结果与原分数一致
+        return int(new_score), trigger_ban
     
     def reset_user_score(self, group_id: str, user_id: str):
         """重置用户分数"""
-        user_key = f"{group_id}_{user_id}"
-        if user_key in self.user_scores:
-            self.user_scores[user_key] = 0
-            self._save_user_scores()
+        if self.user_scores.get(group_id, user_id) is not None:
+            now = time.time()
+            with self._score_lock:
+                delta = -self._current_score(group_id, user_id, now)
+                key = self.user_scores.set(group_id, user_id, 0, now)
+                if self._journal is not None:
+                    self._journal.append(ScoreTable.make_key(group_id, user_id), delta,
+                                         self.decay.encode(0, now))
+            self._score_writer.mark_dirty(key)
     
     def get_user_score(self, group_id: str, user_id: str) -> int:
         """获取用户当前分数"""
-        user_key = f"{group_id}_{user_id}"
-        return self.user_scores.get(user_key, 0)
+        return int(self._current_score(group_id, user_id, time.time()))
     
     def get_current_time(self) -> str:
         """获取当前格式化时间"""
@@ -138,7 +501,7 @@ class BanWordsDetector:
     
     def generate_ban_message(self, user_id: str, current_score: int, 
                            detected_words: Dict[str, int], original_message: str, 
-                           highlighted_message: str, duration: int = 600) -> str:
+                           spans: List[Tuple[int, int, str]], duration: int = 600) -> str:
         """
         生成禁言提示消息
         
@@ -147,7 +510,7 @@ class BanWordsDetector:
             current_score: 当前总分数
             detected_words: 检测到的违禁词
             original_message: 原始消息
-            highlighted_message: 高亮消息
+            spans: 违禁词命中位置
             duration: 禁言时长（秒）
         
         Returns:
@@ -176,16 +539,110 @@ class BanWordsDetector:
         message_parts.append(f"   {original_message}")
         message_parts.append("")
         message_parts.append("🔍 高亮显示：")
-        message_parts.append(f"   {highlighted_message}")
+        message_parts.append(f"   {highlight_message(original_message, spans)}")
         message_parts.append("═" * 30)
         message_parts.append("💡 请遵守群规，文明发言")
         
         return "\n".join(message_parts)
     
+    def generate_recall_and_ban_message(self, user_id: str, current_score: int, 
+                                    detected_words: Dict[str, int], original_message: str, 
+                                    spans: List[Tuple[int, int, str]], duration: int = 600) -> str:
+        """
+        生成撤回并禁言提示消息
+        
+        Args:
+            user_id: 用户ID
+            current_score: 当前总分数
+            detected_words: 检测到的违禁词
+            original_message: 原始消息
+            spans: 违禁词命中位置
+            duration: 禁言时长（秒）
+        
+        Returns:
+            格式化提示消息
+        """
+        current_time = self.get_current_time()
+        
+        # 构建消息
+        message_parts = []
+        message_parts.append("🚫 消息撤回+禁言处理")
+        message_parts.append("═" * 35)
+        message_parts.append(f"🕐 处理时间：{current_time}")
+        message_parts.append(f"👤 违规用户：{user_id}")
+        message_parts.append(f"📊 累计分数：{current_score}/{self.threshold}")
+        message_parts.append(f"⏰ 禁言时长：{duration}秒")
+        message_parts.append("")
+        
+        # 违禁词详情
+        if detected_words:
+            message_parts.append("📋 检测到的违禁词：")
+            for word, count in detected_words.items():
+                message_parts.append(f"  • {word} × {count}")
+            message_parts.append("")
+        
+        message_parts.append("💬 原始消息内容：")
+        # 处理长消息，避免消息过长
+        if len(original_message) > 200:
+            message_parts.append(f"   {original_message[:200]}...（消息过长已截断）")
+        else:
+            message_parts.append(f"   {original_message}")
+        
+        message_parts.append("")
+        message_parts.append("🔍 违规词汇高亮：")
+        # 超过 200 字会被截断，只拼接需要展示的前 200 字
+        highlighted_message = highlight_message(original_message, spans, limit=200)
+        if len(highlighted_message) > 200:
+            message_parts.append(f"   {highlighted_message[:200]}...（消息过长已截断）")
+        else:
+            message_parts.append(f"   {highlighted_message}")
+        
+        message_parts.append("═" * 35)
+        message_parts.append("💡 消息已自动撤回，请遵守群规文明发言")
+        
+        return "\n".join(message_parts)
+
+    def generate_recall_warning_message(self, user_id: str, current_score: int, 
+                                    detected_words: Dict[str, int], weight: int, 
+                                    original_message: str) -> str:
+        """
+        生成撤回警告消息（未达到禁言阈值时）
+        """
+        current_time = self.get_current_time()
+        
+        message_parts = []
+        message_parts.append("⚠️ 消息撤回警告")
+        message_parts.append("─" * 28)
+        message_parts.append(f"🕐 时间：{current_time}")
+        message_parts.append(f"👤 用户：{user_id}")
+        message_parts.append(f"📊 当前分数：{current_score}/{self.threshold} (+{weight})")
+        message_parts.append("")
+        
+        if detected_words:
+            message_parts.append("📋 违规词汇：")
+            for word, count in detected_words.items():
+                message_parts.append(f"  • {word} × {count}")
+            message_parts.append("")
+        
+        message_parts.append("💬 撤回的消息：")
+        if len(original_message) > 150:
+            message_parts.append(f"   {original_message[:150]}...")
+        else:
+            message_parts.append(f"   {original_message}")
+        
+        message_parts.append("─" * 28)
+        message_parts.append("💡 消息已撤回，请注意发言内容")
+        
+        return "\n".join(message_parts)
+    
     def generate_warning_message(self, user_id: str, current_score: int, 
-                               detected_words: Dict[str, int], weight: int) -> str:
+                               detected_words: Dict[str, int], weight: int,
+                               violations: int = 1) -> str:
         """
         生成警告消息（未达到禁言阈值时）
+
+        Args:
+            violations: 合并到这条提示中的违规消息条数，weight 和 detected_words 为这些消息的合计
         """
         current_time = self.get_current_time()
         
@@ -195,6 +652,8 @@ class BanWordsDetector:
         message_parts.append(f"🕐 时间：{current_time}")
         message_parts.append(f"👤 用户：{user_id}")
         message_parts.append(f"📊 当前分数：{current_score}/{self.threshold} (+{weight})")
+        if violations > 1:
+            message_parts.append(f"🔁 违规消息：{violations} 条（已合并提示）")
         message_parts.append("")
         
         if detected_words:
@@ -207,9 +666,20 @@ class BanWordsDetector:
         
         return "\n".join(message_parts)
 
-# 全局检测器实例
-detector = BanWordsDetector()
+# 全局检测器实例，第一次调用 get_detector() 时才创建，导入模块本身不会读写数据目录
+detector: Optional[BanWordsDetector] = None
 
 def get_detector() -> BanWordsDetector:
     """获取全局检测器实例"""
-    return detector
\ No newline at end of file
+    global detector
+    if detector is None:
+        detector = BanWordsDetector()
+    return detector
+
+
+def close_detector():
+    """关闭全局检测器（停止后台写盘并保存数据），之后再调用 get_detector() 会重新创建"""
+    global detector
+    if detector is not None:
+        detector.close()
+        detector = None
@@ -0,0 +1,179 @@
+# dispatcher.py
+import asyncio
+import random
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from astrbot.api import logger
+
+
+class TokenBucket:
+    """
+    令牌桶限速
+
+    每秒补充 rate 个令牌，最多积攒 burst 个；没有令牌时按先来后到排队等待。
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        # asyncio.Lock 按等待顺序唤醒，保证排队公平
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class ActionDispatcher:
+    """
+    OneBot 动作调度器
+
+    - 互不相关的动作并发执行，调用方可以同时提交撤回、禁言等请求再一起等待
+    - 每个机器人账号一个令牌桶，避免短时间内大量调用触发 OneBot 的频率限制
+    - 调用失败时按指数退避重试，重试次数和等待时间都有上限
+    - 带 dedupe_key 的动作会去重：同一个键正在执行时直接复用结果；
+      remember=True 的动作成功后 dedupe_ttl 秒内再次提交也直接返回上次的结果
+      （例如重复撤回同一条消息）
+    """
+
+    def __init__(self, rate: float = 5.0, burst: int = 10, max_retries: int = 2,
+                 retry_base_delay: float = 0.5, retry_max_delay: float = 5.0,
+                 dedupe_ttl: float = 60.0):
+        """
+        Args:
+            rate: 每个账号每秒允许的调用次数
+            burst: 每个账号允许的突发调用次数
+            max_retries: 失败后最多重试的次数
+            retry_base_delay: 第一次重试前的等待时间（秒），之后每次翻倍
+            retry_max_delay: 单次重试等待时间的上限（秒）
+            dedupe_ttl: 成功的动作在多少秒内不重复执行
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.dedupe_ttl = dedupe_ttl
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._done: Dict[Hashable, Tuple[float, Any]] = {}
+        self._tasks = set()
+
+    @staticmethod
+    def _account_key(bot) -> Hashable:
+        """区分机器人账号：优先使用 self_id，没有时按客户端对象区分"""
+        return getattr(bot, "self_id", None) or id(bot)
+
+    def _bucket(self, bot) -> TokenBucket:
+        key = self._account_key(bot)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def _prune_done(self, now: float):
+        expired = [key for key, (ts, _) in self._done.items() if now - ts > self.dedupe_ttl]
+        for key in expired:
+            del self._done[key]
+
+    async def _run(self, bot, action: str, params: Dict[str, Any]) -> Any:
+        bucket = self._bucket(bot)
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            try:
+                return await getattr(bot, action)(**params)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt))
+                # 加一点随机抖动，避免大量失败的调用同时重试
+                delay *= random.uniform(0.5, 1.0)
+                attempt += 1
+                logger.warning(f"{action} 调用失败，{delay:.2f} 秒后第 {attempt} 次重试：{e}")
+                await asyncio.sleep(delay)
+
+    def submit(self, bot, action: str, dedupe_key: Optional[Hashable] = None,
+               remember: bool = False, **params) -> asyncio.Future:
+        """
+        提交一个动作，立即返回 Future，不等待执行完成
+
+        Args:
+            bot: OneBot 客户端（event.bot）
+            action: 动作名，例如 "delete_msg"、"set_group_ban"
+            dedupe_key: 去重键，为 None 时不去重
+            remember: 成功后是否在 dedupe_ttl 秒内记住结果，只适合重复执行没有意义的动作
+            **params: 动作参数
+        """
+        loop = asyncio.get_running_loop()
+        if dedupe_key is not None:
+            future = self._inflight.get(dedupe_key)
+            if future is not None:
+                return future
+            now = time.monotonic()
+            self._prune_done(now)
+            done = self._done.get(dedupe_key)
+            if done is not None:
+                future = loop.create_future()
+                future.set_result(done[1])
+                return future
+
+        task = loop.create_task(self._run(bot, action, params))
+        self._tasks.add(task)
+
+        def on_done(t: asyncio.Task):
+            self._tasks.discard(t)
+            if dedupe_key is None:
+                return
+            self._inflight.pop(dedupe_key, None)
+            if remember and not t.cancelled() and t.exception() is None:
+                self._done[dedupe_key] = (time.monotonic(), t.result())
+
+        task.add_done_callback(on_done)
+        if dedupe_key is not None:
+            self._inflight[dedupe_key] = task
+        return task
+
+    async def call(self, bot, action: str, dedupe_key: Optional[Hashable] = None,
+                   remember: bool = False, **params) -> Any:
+        """提交一个动作并等待结果，失败时抛出最后一次调用的异常"""
+        return await self.submit(bot, action, dedupe_key, remember, **params)
+
+    # 常用动作的快捷方式。撤回同一条消息永远只需要一次；
+    # 禁言、踢人可能被管理员撤销后再次执行，只对正在执行的请求去重
+
+    def recall(self, bot, message_id) -> asyncio.Future:
+        return self.submit(bot, "delete_msg", ("delete_msg", str(message_id)), True,
+                           message_id=int(message_id))
+
+    def ban(self, bot, group_id, user_id, duration: int) -> asyncio.Future:
+        return self.submit(bot, "set_group_ban", ("set_group_ban", str(group_id), str(user_id), duration),
+                           group_id=int(group_id), user_id=int(user_id), duration=duration)
+
+    def kick(self, bot, group_id, user_id, reject_add_request: bool = False) -> asyncio.Future:
+        return self.submit(bot, "set_group_kick",
+                           ("set_group_kick", str(group_id), str(user_id), reject_add_request),
+                           group_id=int(group_id), user_id=int(user_id),
+                           reject_add_request=reject_add_request)
+
+    def close(self):
+        """取消所有尚未完成的动作"""
+        for task in list(self._tasks):
+            task.cancel()
+        self._tasks.clear()
+        self._inflight.clear()
+        self._done.clear()
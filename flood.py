@@ -0,0 +1,108 @@
+# flood.py
+import time
+from typing import Dict, Optional, Tuple
+
+from .scores import compact_id
+
+
+class RateWindow:
+    """
+    单个用户最近 limit 条消息的时间戳环形缓冲区
+
+    内存大小固定为 limit 个时间戳，与发言量无关。
+    """
+
+    __slots__ = ("stamps", "index", "count")
+
+    def __init__(self, limit: int):
+        self.stamps = [0.0] * limit
+        self.index = 0   # 下一个写入位置，缓冲区满时也是最旧的一条
+        self.count = 0
+
+    def push(self, now: float, window: float) -> bool:
+        """
+        记录一条消息
+
+        Returns:
+            加上这条消息后，window 秒内的消息数是否超过 limit 条
+        """
+        limit = len(self.stamps)
+        exceeded = self.count == limit and now - self.stamps[self.index] < window
+        self.stamps[self.index] = now
+        self.index = (self.index + 1) % limit
+        if self.count < limit:
+            self.count += 1
+        return exceeded
+
+    def reset(self):
+        self.index = 0
+        self.count = 0
+
+    @property
+    def last(self) -> float:
+        return self.stamps[self.index - 1] if self.count else 0.0
+
+
+class FloodDetector:
+    """
+    按群、按用户的刷屏检测
+
+    每个用户 window 秒内发言超过 limit 条即视为刷屏。触发后清空该用户的记录，
+    需要再发满 limit + 1 条才会再次触发，避免刷屏期间每条消息都重复计分。
+    超过 window 秒没有发言的用户在 sweep_interval 间隔的顺带清理中删除。
+    """
+
+    def __init__(self, limit: int = 10, window: float = 10.0, sweep_interval: float = 60.0):
+        """
+        Args:
+            limit: window 秒内允许的最多消息条数，为 0 时关闭检测
+            window: 统计窗口（秒）
+            sweep_interval: 清理空闲用户的最小间隔（秒）
+        """
+        self.limit = limit
+        self.window = window
+        self.sweep_interval = sweep_interval
+        self._windows: Dict[Tuple, RateWindow] = {}
+        self._last_sweep = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit > 0
+
+    def configure(self, limit: int, window: float):
+        """修改阈值，已有的记录全部作废"""
+        self.limit = limit
+        self.window = window
+        self._windows.clear()
+
+    def hit(self, group_id: str, user_id: str, now: Optional[float] = None) -> bool:
+        """
+        记录一条消息并判断是否刷屏
+
+        Returns:
+            本条消息是否触发刷屏
+        """
+        if self.limit <= 0:
+            return False
+        now = time.monotonic() if now is None else now
+        if now - self._last_sweep >= self.sweep_interval:
+            self._sweep(now)
+
+        key = (compact_id(group_id), compact_id(user_id))
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = RateWindow(self.limit)
+        if window.push(now, self.window):
+            window.reset()
+            return True
+        return False
+
+    def _sweep(self, now: float):
+        """删除超过 window 秒没有发言的用户"""
+        self._last_sweep = now
+        idle = [key for key, w in self._windows.items() if now - w.last >= self.window]
+        for key in idle:
+            del self._windows[key]
@@ -15,6 +15,8 @@ import sys
 import os
 import re
 import json
+import asyncio
+import functools
 from typing import Dict, Tuple, Optional
 import time
 from datetime import datetime
@@ -22,315 +24,62 @@ from typing import Dict, Tuple, Optional
 import json
 import os
 
+from .BanWordsDetector import DATA_DIR, close_detector, get_detector
+from .dispatcher import ActionDispatcher
+from .flood import FloodDetector
+from .metrics import Metrics
+from .normalize import normalize
+from .notices import NoticeAggregator, PendingNotice
+from .patterns import validate_rule
+from .raid import RaidDetector
+from .storage import atomic_write_text
+from .wordlist import export_words, plan_import
+from .watcher import FileWatcher, changed_groups, group_digest, group_digests
 
-# 配置数据存储路径
-DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
-BAN_WORDS_FILE = os.path.join(DATA_DIR, "ban_words.json")
-BAN_STATUS_FILE = os.path.join(DATA_DIR, "ban_status.json")
-USER_SCORE_FILE = os.path.join(DATA_DIR, "user_scores.json")
-
-# 本来想把这个类放到单独的文件里，但不知道为什么死活导不进去，只能放这里了
-class BanWordsDetector:
-    def __init__(self):
-        self.ban_words = {}
-        self.user_scores = {}  # 存储用户累计权重分数
-        self.threshold = 10    # 默认阈值，达到此分数触发禁言
-        
-        # 确保数据目录存在
-        os.makedirs(DATA_DIR, exist_ok=True)
-        
-        # 加载数据
-        self._load_data()
-    
-    def _load_data(self):
-        """加载违禁词和用户分数数据"""
-        try:
-            # 加载违禁词
-            if os.path.exists(BAN_WORDS_FILE):
-                with open(BAN_WORDS_FILE, "r", encoding="utf-8") as f:
-                    self.ban_words = json.load(f)
-            
-            # 加载用户分数
-            if os.path.exists(USER_SCORE_FILE):
-                with open(USER_SCORE_FILE, "r", encoding="utf-8") as f:
-                    self.user_scores = json.load(f)
-        except Exception as e:
-            print(f"加载数据失败：{e}")
-    
-    def _save_user_scores(self):
-        """保存用户分数数据"""
-        try:
-            with open(USER_SCORE_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.user_scores, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"保存用户分数失败：{e}")
-    
-    def set_ban_words(self, ban_words: Dict):
-        """设置违禁词数据"""
-        self.ban_words = ban_words
-    
-    def set_threshold(self, threshold: int):
-        """设置触发阈值"""
-        self.threshold = threshold
-    
-    def detect_ban_words(self, message: str, group_id: str, user_id: str) -> Tuple[int, Dict[str, int], str]:
-        """
-        检测消息中的违禁词
-        
-        Args:
-            message: 用户消息
-            group_id: 群组ID
-            user_id: 用户ID
-        
-        Returns:
-            Tuple[总权重, 检测到的违禁词字典, 高亮消息]
-        """
-        if group_id not in self.ban_words:
-            return 0, {}, message
-        
-        group_ban_words = self.ban_words[group_id]
-        total_weight = 0
-        detected_words = {}
-        highlighted_message = message
-        
-        # 检测每个违禁词
-        for word, weight in group_ban_words.items():
-            # 使用正则表达式进行匹配（忽略大小写）
-            pattern = re.compile(re.escape(word), re.IGNORECASE)
-            matches = pattern.findall(message)
-            
-            if matches:
-                count = len(matches)
-                detected_words[word] = count
-                total_weight += weight * count
-                
-                # 高亮显示违禁词
-                highlighted_message = pattern.sub(f"【{word}】", highlighted_message)
-        
-        return total_weight, detected_words, highlighted_message
-    
-    def update_user_score(self, group_id: str, user_id: str, weight: int) -> Tuple[int, bool]:
-        """
-        更新用户分数并检查是否触发禁言
-        
-        Args:
-            group_id: 群组ID
-            user_id: 用户ID
-            weight: 本次违规权重
-        
-        Returns:
-            Tuple[当前总分数, 是否触发禁言]
-        """
-        # 生成用户唯一标识
-        user_key = f"{group_id}_{user_id}"
-        
-        # 获取当前分数
-        current_score = self.user_scores.get(user_key, 0)
-        
-        # 更新分数（可考虑添加衰减机制）
-        new_score = current_score + weight
-        self.user_scores[user_key] = new_score
-        
-        # 保存分数
-        self._save_user_scores()
-        
-        # 检查是否触发禁言
-        trigger_ban = new_score >= self.threshold
-        
-        return new_score, trigger_ban
-    
-    def reset_user_score(self, group_id: str, user_id: str):
-        """重置用户分数"""
-        user_key = f"{group_id}_{user_id}"
-        if user_key in self.user_scores:
-            self.user_scores[user_key] = 0
-            self._save_user_scores()
-    
-    def get_user_score(self, group_id: str, user_id: str) -> int:
-        """获取用户当前分数"""
-        user_key = f"{group_id}_{user_id}"
-        return self.user_scores.get(user_key, 0)
-    
-    def get_current_time(self) -> str:
-        """获取当前格式化时间"""
-        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    def generate_ban_message(self, user_id: str, current_score: int, 
-                           detected_words: Dict[str, int], original_message: str, 
-                           highlighted_message: str, duration: int = 600) -> str:
-        """
-        生成禁言提示消息
-        
-        Args:
-            user_id: 用户ID
-            current_score: 当前总分数
-            detected_words: 检测到的违禁词
-            original_message: 原始消息
-            highlighted_message: 高亮消息
-            duration: 禁言时长（秒）
-        
-        Returns:
-            格式化提示消息
-        """
-        current_time = self.get_current_time()
-        
-        # 构建消息
-        message_parts = []
-        message_parts.append("🚫 违禁词检测触发禁言")
-        message_parts.append("═" * 30)
-        message_parts.append(f"🕐 时间：{current_time}")
-        message_parts.append(f"👤 用户：{user_id}")
-        message_parts.append(f"📊 累计分数：{current_score}/{self.threshold}")
-        message_parts.append(f"⏰ 禁言时长：{duration}秒")
-        message_parts.append("")
-        
-        # 违禁词详情
-        if detected_words:
-            message_parts.append("📋 检测到的违禁词：")
-            for word, count in detected_words.items():
-                message_parts.append(f"  • {word} × {count}")
-            message_parts.append("")
-        
-        message_parts.append("💬 原始消息：")
-        message_parts.append(f"   {original_message}")
-        message_parts.append("")
-        message_parts.append("🔍 高亮显示：")
-        message_parts.append(f"   {highlighted_message}")
-        message_parts.append("═" * 30)
-        message_parts.append("💡 请遵守群规，文明发言")
-        
-        return "\n".join(message_parts)
-    
-    def generate_recall_and_ban_message(self, user_id: str, current_score: int, 
-                                    detected_words: Dict[str, int], original_message: str, 
-                                    highlighted_message: str, duration: int = 600) -> str:
-        """
-        生成撤回并禁言提示消息
-        
-        Args:
-            user_id: 用户ID
-            current_score: 当前总分数
-            detected_words: 检测到的违禁词
-            original_message: 原始消息
-            highlighted_message: 高亮消息
-            duration: 禁言时长（秒）
-        
-        Returns:
-            格式化提示消息
-        """
-        current_time = self.get_current_time()
-        
-        # 构建消息
-        message_parts = []
-        message_parts.append("🚫 消息撤回+禁言处理")
-        message_parts.append("═" * 35)
-        message_parts.append(f"🕐 处理时间：{current_time}")
-        message_parts.append(f"👤 违规用户：{user_id}")
-        message_parts.append(f"📊 累计分数：{current_score}/{self.threshold}")
-        message_parts.append(f"⏰ 禁言时长：{duration}秒")
-        message_parts.append("")
-        
-        # 违禁词详情
-        if detected_words:
-            message_parts.append("📋 检测到的违禁词：")
-            for word, count in detected_words.items():
-                message_parts.append(f"  • {word} × {count}")
-            message_parts.append("")
-        
-        message_parts.append("💬 原始消息内容：")
-        # 处理长消息，避免消息过长
-        if len(original_message) > 200:
-            message_parts.append(f"   {original_message[:200]}...（消息过长已截断）")
-        else:
-            message_parts.append(f"   {original_message}")
-        
-        message_parts.append("")
-        message_parts.append("🔍 违规词汇高亮：")
-        if len(highlighted_message) > 200:
-            message_parts.append(f"   {highlighted_message[:200]}...（消息过长已截断）")
-        else:
-            message_parts.append(f"   {highlighted_message}")
-        
-        message_parts.append("═" * 35)
-        message_parts.append("💡 消息已自动撤回，请遵守群规文明发言")
-        
-        return "\n".join(message_parts)
-
-    def generate_recall_warning_message(self, user_id: str, current_score: int, 
-                                    detected_words: Dict[str, int], weight: int, 
-                                    original_message: str) -> str:
-        """
-        生成撤回警告消息（未达到禁言阈值时）
-        """
-        current_time = self.get_current_time()
-        
-        message_parts = []
-        message_parts.append("⚠️ 消息撤回警告")
-        message_parts.append("─" * 28)
-        message_parts.append(f"🕐 时间：{current_time}")
-        message_parts.append(f"👤 用户：{user_id}")
-        message_parts.append(f"📊 当前分数：{current_score}/{self.threshold} (+{weight})")
-        message_parts.append("")
-        
-        if detected_words:
-            message_parts.append("📋 违规词汇：")
-            for word, count in detected_words.items():
-                message_parts.append(f"  • {word} × {count}")
-            message_parts.append("")
-        
-        message_parts.append("💬 撤回的消息：")
-        if len(original_message) > 150:
-            message_parts.append(f"   {original_message[:150]}...")
-        else:
-            message_parts.append(f"   {original_message}")
-        
-        message_parts.append("─" * 28)
-        message_parts.append("💡 消息已撤回，请注意发言内容")
-        
-        return "\n".join(message_parts)
-    
-    def generate_warning_message(self, user_id: str, current_score: int, 
-                               detected_words: Dict[str, int], weight: int) -> str:
-        """
-        生成警告消息（未达到禁言阈值时）
-        """
-        current_time = self.get_current_time()
-        
-        message_parts = []
-        message_parts.append("⚠️ 违禁词警告")
-        message_parts.append("─" * 25)
-        message_parts.append(f"🕐 时间：{current_time}")
-        message_parts.append(f"👤 用户：{user_id}")
-        message_parts.append(f"📊 当前分数：{current_score}/{self.threshold} (+{weight})")
-        message_parts.append("")
-        
-        if detected_words:
-            message_parts.append("📋 违规词汇：")
-            for word, count in detected_words.items():
-                message_parts.append(f"  • {word} × {count}")
-        
-        message_parts.append("─" * 25)
-        message_parts.append("💡 请注意发言内容，达到阈值将自动禁言")
-        
-        return "\n".join(message_parts)
-
-# 全局检测器实例
-detector = BanWordsDetector()
 
+# 配置数据存储路径（检测器本身的配置见 BanWordsDetector.py）
+BAN_STATUS_FILE = os.path.join(DATA_DIR, "ban_status.json")
 
+# 处理耗时与命中统计：定期以 Prometheus 文本格式写入文件（None 表示不导出）
+METRICS_FILE = os.path.join(DATA_DIR, "metrics.prom")
+METRICS_EXPORT_INTERVAL = 60     # 秒
 
+# /banword import 和 export 读写的词表文件只能放在这个目录内，避免覆盖插件自己的数据文件
+WORDLIST_DIR = os.path.join(DATA_DIR, "wordlists")
 
-def get_detector() -> BanWordsDetector:
-    """获取全局检测器实例"""
-    return detector
+# OneBot 动作（撤回、禁言、踢人）调度：每个机器人账号限速，失败后退避重试
+ACTION_RATE_LIMIT = 5            # 每秒调用次数
+ACTION_BURST = 10                # 允许的突发调用次数
+ACTION_MAX_RETRIES = 2
+ACTION_RETRY_BASE_DELAY = 0.5    # 秒，每次重试翻倍
+ACTION_RETRY_MAX_DELAY = 5       # 秒
 
+# 同一用户在窗口内的多次违规合并为一条警告提示（0 表示每条违规单独回复）
+NOTICE_WINDOW = 10               # 秒
 
+# 刷屏检测：FLOOD_WINDOW 秒内发言超过 FLOOD_LIMIT 条时按 FLOOD_WEIGHT 计分（FLOOD_LIMIT 为 0 表示关闭）
+FLOOD_LIMIT = 10                 # 条
+FLOOD_WINDOW = 10                # 秒
+FLOOD_WEIGHT = 5
+FLOOD_LABEL = "刷屏"             # 在提示的违规词汇中显示的名称
 
+# 重复内容检测：RAID_WINDOW 秒内有 RAID_MIN_USERS 个不同用户发送相同或近似的内容时，
+# 撤回这些消息并按 RAID_WEIGHT 计分。默认关闭，各群用 /banword raid on 开启（RAID_MIN_USERS 为 0 表示全部关闭）
+RAID_MIN_USERS = 3
+RAID_WINDOW = 60                 # 秒
+RAID_WEIGHT = 5
+RAID_MIN_LENGTH = 8              # 短于该长度的消息不参与检测
+RAID_CACHE_SIZE = 512            # 每个群最多缓存的内容指纹数
+RAID_LABEL = "重复内容"
 
+# 热加载：每隔一段时间检查 ban_words.json / ban_status.json 是否被外部修改（编辑器、配置管理工具等），
+# 有变化时只重新解析变化的文件、只重建违禁词有变化的群（仅 JSON 后端，0 表示关闭）
+HOT_RELOAD_INTERVAL = 5          # 秒
 
 @register("juanjuan_copy", "gbasamera", "功能来源于卷卷机器人", "1.0.0")
 class JuanJuan_Copy(Star):
     def __init__(self, context: Context):
+        started = time.perf_counter()
         super().__init__(context)
 
         # 初始化违禁词和状态存储
@@ -338,65 +87,148 @@ class JuanJuan_Copy(Star):
         self.context = context
         # 确保数据目录存在
         os.makedirs(DATA_DIR, exist_ok=True)
-        # 初始化违禁词和状态文件
-        self._init_ban_words_file()
-        self._init_ban_status_file()
+
+        self.detector = get_detector()
+        # 与检测器共用同一个存储后端（JSON 或 SQLite，见 STORAGE_BACKEND）
+        self.storage = self.detector.storage
         # 加载违禁词和状态
         self.ban_words = self._load_ban_words()
         self.banword_status = self._load_ban_status()
+        self.group_settings = self._load_group_settings()
+        self.templates = self._load_templates()
 
-        self.detector = get_detector()
         self.detector.set_ban_words(self.ban_words)
+        self.detector.set_group_settings(self.group_settings)
+        self.detector.set_templates(self.templates)
         self.detector.set_threshold(10)  # 可以设置为可配置的
+        # 外部修改数据文件时热加载；记录每个群违禁词的摘要，只重建内容变化的群
+        self._watcher = FileWatcher(self.storage.watched_files())
+        self._word_digests = group_digests(self.ban_words)
+        self._word_saves = 0
+        self._status_saves = 0
+        self._reload_task = None
+        # 各阶段耗时与命中统计，见 /banword stats
+        self.metrics = Metrics()
+        self._metrics_task = None
+        verdict_cache = self.detector._verdict_cache
+        self.metrics.register("verdict_cache_hits_total", "检测结果缓存命中次数",
+                              lambda: verdict_cache.hits, "counter")
+        self.metrics.register("verdict_cache_misses_total", "检测结果缓存未命中次数",
+                              lambda: verdict_cache.misses, "counter")
+        self.metrics.register("verdict_cache_hit_ratio", "检测结果缓存命中率", lambda: verdict_cache.hit_rate)
+        self.metrics.register("verdict_cache_entries", "检测结果缓存条目数", lambda: len(verdict_cache))
+        snapshot = self.detector._snapshot
+        if snapshot is not None:
+            self.metrics.register("matcher_snapshot_hits_total", "从快照加载匹配器的次数",
+                                  lambda: snapshot.hits, "counter")
+            self.metrics.register("matcher_snapshot_misses_total", "快照中没有、需要重新构建匹配器的次数",
+                                  lambda: snapshot.misses, "counter")
+        self.metrics.register("pattern_scan_timeouts", "当前匹配器中模式规则扫描超出时间预算的次数",
+                              self.detector.pattern_timeouts)
+        # 撤回、禁言、踢人统一经过调度器执行
+        self.dispatcher = ActionDispatcher(
+            rate=ACTION_RATE_LIMIT, burst=ACTION_BURST, max_retries=ACTION_MAX_RETRIES,
+            retry_base_delay=ACTION_RETRY_BASE_DELAY, retry_max_delay=ACTION_RETRY_MAX_DELAY,
+        )
+        # 刷屏检测，与违禁词共用分数和禁言流程
+        self.flood = FloodDetector(FLOOD_LIMIT, FLOOD_WINDOW)
+        # 多个用户复制粘贴同一内容的检测
+        self.raid = RaidDetector(RAID_MIN_USERS, RAID_WINDOW, RAID_MIN_LENGTH, RAID_CACHE_SIZE)
+        # 警告提示按用户合并发送
+        self.notices = NoticeAggregator(NOTICE_WINDOW, self._send_notice)
 
-    def _init_ban_status_file(self):
-        """初始化功能开关状态文件"""
-        if not os.path.exists(BAN_STATUS_FILE):
-            with open(BAN_STATUS_FILE, "w", encoding="utf-8") as f:
-                json.dump({}, f, ensure_ascii=False)
-            logger.info(f"新建功能开关存储文件：{BAN_STATUS_FILE}")
+        # 匹配器按需构建（或从快照加载），这里只统计加载数据和初始化本身的耗时
+        elapsed = (time.perf_counter() - started + self.detector.load_seconds) * 1000
+        snapshot_size = len(snapshot) if snapshot is not None else 0
+        logger.info(
+            f"卷卷违禁词插件启动耗时 {elapsed:.1f}ms（{len(self.ban_words)}个群、{len(self.templates)}个模板，"
+            f"匹配器快照 {snapshot_size} 条，按需加载）"
+        )
 
     def _load_ban_status(self):
         """加载开关状态"""
         try:
-            with open(BAN_STATUS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
+            return self.storage.load_ban_status()
         except Exception as e:
             logger.error(f"加载功能开关失败：{e}")
             return {}
 
-    def _save_ban_status(self):
+    def _save_ban_status(self, group_id: str):
         """保存开关状态"""
+        self._status_saves += 1
         try:
-            with open(BAN_STATUS_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.banword_status, f, ensure_ascii=False, indent=2)
+            self.storage.save_ban_status(self.banword_status, [group_id])
+            self._watcher.mark("ban_status")
         except Exception as e:
             logger.error(f"保存功能开关失败：{e}")
 
-    def _init_ban_words_file(self):
-        """初始化违禁词文件"""
-        if not os.path.exists(BAN_WORDS_FILE):
-            with open(BAN_WORDS_FILE, "w", encoding="utf-8") as f:
-                json.dump({}, f, ensure_ascii=False)
-            logger.info(f"新建违禁词存储文件：{BAN_WORDS_FILE}")
+    def _load_group_settings(self):
+        """加载各群附加设置"""
+        try:
+            return self.storage.load_group_settings()
+        except Exception as e:
+            logger.error(f"加载群设置失败：{e}")
+            return {}
+
+    def _raid_enabled(self, group_id: str) -> bool:
+        """群是否开启了重复内容检测"""
+        return self.raid.enabled and bool((self.group_settings.get(group_id) or {}).get("raid"))
+
+    def _save_group_settings(self, group_id: str):
+        """保存群附加设置"""
+        try:
+            self.storage.save_group_settings(self.group_settings, [group_id])
+        except Exception as e:
+            logger.error(f"保存群设置失败：{e}")
 
     def _load_ban_words(self):
-        """从文件加载违禁词数据"""
+        """从存储加载违禁词数据"""
         try:
-            with open(BAN_WORDS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
+            return self.storage.load_ban_words()
         except Exception as e:
             logger.error(f"加载违禁词文件失败：{e}")
             return {}
 
-    def _save_ban_words(self):
-        """保存违禁词数据"""
+    def _save_ban_words(self, changes):
+        """
+        保存违禁词数据
+
+        Args:
+            changes: 本次变化的 (群号, 违禁词) 列表
+        """
+        changes = list(changes)
+        self._word_saves += 1
+        for group_id in {group_id for group_id, _ in changes}:
+            if group_id in self.ban_words:
+                self._word_digests[group_id] = group_digest(self.ban_words[group_id])
+            else:
+                self._word_digests.pop(group_id, None)
         try:
-            with open(BAN_WORDS_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.ban_words, f, ensure_ascii=False, indent=2)
+            self.storage.save_ban_words(self.ban_words, changes)
+            self._watcher.mark("ban_words")
         except Exception as e:
             logger.error(f"保存违禁词失败：{e}")
 
+    def _load_templates(self):
+        """从存储加载共享词库模板"""
+        try:
+            return self.storage.load_templates()
+        except Exception as e:
+            logger.error(f"加载词库模板失败：{e}")
+            return {}
+
+    def _save_templates(self, changes):
+        """
+        保存共享词库模板
+
+        Args:
+            changes: 本次变化的 (模板名, 违禁词) 列表
+        """
+        try:
+            self.storage.save_templates(self.templates, changes)
+        except Exception as e:
+            logger.error(f"保存词库模板失败：{e}")
+
     def _get_group_status(self, group_id: str) -> bool:
         """获取指定群的开关状态"""
         # 如果群不在状态字典中，默认返回False（关闭状态）
@@ -404,7 +236,86 @@ class JuanJuan_Copy(Star):
 
     async def initialize(self):
         """插件初始化"""
-        pass
+        if METRICS_FILE and METRICS_EXPORT_INTERVAL:
+            self._metrics_task = asyncio.create_task(self._export_metrics_loop())
+        if HOT_RELOAD_INTERVAL and self._watcher.paths:
+            self._reload_task = asyncio.create_task(self._hot_reload_loop())
+
+    async def _export_metrics_loop(self):
+        """定期把统计数据写入 Prometheus 文本文件"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(METRICS_EXPORT_INTERVAL)
+            try:
+                # 统计数据只在事件循环线程中更新，在这里生成文本，线程池只负责写文件
+                text = self.metrics.render_prometheus()
+                await loop.run_in_executor(None, atomic_write_text, METRICS_FILE, text)
+            except Exception as e:
+                logger.error(f"导出统计数据失败：{e}")
+
+    async def _hot_reload_loop(self):
+        """定期检查数据文件是否被外部修改"""
+        while True:
+            await asyncio.sleep(HOT_RELOAD_INTERVAL)
+            try:
+                await self.reload_changed_files()
+            except Exception as e:
+                logger.error(f"热加载数据文件失败：{e}")
+
+    async def reload_changed_files(self):
+        """重新加载被外部修改过的数据文件，只解析变化的文件"""
+        changed = self._watcher.poll()
+        if "ban_words" in changed:
+            await self._reload_ban_words()
+        if "ban_status" in changed:
+            await self._reload_ban_status()
+
+    async def _reload_ban_words(self):
+        """
+        热加载违禁词
+
+        解析和计算摘要在线程池中进行；随后一次性替换整个字典，只重建摘要有变化的群。
+        重建期间这些群继续使用旧匹配器，消息处理不受影响。
+        """
+        saves = self._word_saves
+
+        def parse():
+            ban_words = self.storage.load_ban_words()
+            return ban_words, group_digests(ban_words)
+
+        try:
+            ban_words, digests = await asyncio.get_running_loop().run_in_executor(None, parse)
+        except Exception as e:
+            # 多半是文件正在被写入，写完后修改时间会再次变化，届时重试
+            logger.error(f"热加载违禁词失败：{e}")
+            return
+        if saves != self._word_saves:
+            # 解析期间插件自己保存过违禁词，文件已被内存中的数据覆盖，这次读到的内容作废
+            return
+
+        groups = changed_groups(self._word_digests, digests)
+        self.ban_words = ban_words
+        self.detector.ban_words = ban_words
+        self._word_digests = digests
+        if groups:
+            await asyncio.gather(*(self.detector.refresh_group(group_id) for group_id in groups))
+        logger.info(f"违禁词文件已热加载，{len(groups)}个群的违禁词有变化")
+
+    async def _reload_ban_status(self):
+        """热加载功能开关"""
+        saves = self._status_saves
+        try:
+            ban_status = await asyncio.get_running_loop().run_in_executor(None, self.storage.load_ban_status)
+        except Exception as e:
+            logger.error(f"热加载功能开关失败：{e}")
+            return
+        if saves != self._status_saves:
+            return
+        old = self.banword_status
+        groups = [group_id for group_id in set(old) | set(ban_status) if old.get(group_id) != ban_status.get(group_id)]
+        self.banword_status = ban_status
+        if groups:
+            logger.info(f"功能开关文件已热加载，{len(groups)}个群的开关有变化")
 
     @filter.event_message_type(EventMessageType.GROUP_MESSAGE)
     async def handle_message(self, event: AiocqhttpMessageEvent) -> Optional[MessageEventResult]:
@@ -432,64 +343,103 @@ class JuanJuan_Copy(Star):
             if not message:
                 return None
             
-
+            metrics = self.metrics
+            started = time.perf_counter()
+            
+            # 开启重复内容检测时先归一化，违禁词检测和重复内容检测共用同一份结果
+            raid_enabled = self._raid_enabled(group_id)
+            text = normalize(message) if raid_enabled else None
             
             # 使用检测器进行违禁词检测
-            weight, detected_words, highlighted_message = detector.detect_ban_words(
-                message, group_id, user_id
+            weight, detected_words, spans = self.detector.detect_ban_words(
+                message, group_id, user_id, text
             )
+            # 刷屏检测，触发时与违禁词权重叠加
+            if self.flood.hit(group_id, user_id):
+                weight += FLOOD_WEIGHT
+                detected_words[FLOOD_LABEL] = detected_words.get(FLOOD_LABEL, 0) + 1
+                metrics.inc("floods", group_id)
+            # 重复内容检测，触发时同时处理此前发送同一内容的其他用户
+            raid_backlog = None
+            if raid_enabled:
+                raid_backlog = self.raid.observe(group_id, user_id, str(message_id), text.text)
+                if raid_backlog is not None:
+                    weight += RAID_WEIGHT
+                    detected_words[RAID_LABEL] = detected_words.get(RAID_LABEL, 0) + 1
+                    metrics.inc("raids", group_id)
+            stage_end = time.perf_counter()
+            metrics.observe("detect", group_id, stage_end - started)
+            metrics.inc("messages_scanned", group_id)
             
             # 如果没有检测到违禁词，直接返回
             if weight <= 0:
+                metrics.observe("total", group_id, stage_end - started)
                 return None
+            metrics.inc("hits", group_id)
             
-            # 在检测到违禁词后，执行禁言/警告前添加撤回逻辑
-            if weight > 0:  # 检测到违禁词
-                try:
-                    # 撤回消息
-                    await event.bot.delete_msg(message_id=int(message_id))
-                    logger.info(f"✅ 已撤回用户 {user_id} 的违规消息")
-                    recall_success = True
-                except Exception as e:
-                    logger.error(f"❌ 撤回消息失败：{e}")
-                    recall_success = False
+            # 更新用户分数并检查是否触发禁言（纯本地操作，先做完再并发调用 OneBot）
+            stage_start = time.perf_counter()
+            current_score, trigger_ban = self.detector.update_user_score(group_id, user_id, weight)
+            metrics.observe("score", group_id, time.perf_counter() - stage_start)
+            
+            ban_duration = 600  # 10分钟
+            # 撤回和禁言互不依赖，同时提交给调度器
+            actions = [self._timed_action("recall", group_id, self.dispatcher.recall(event.bot, message_id))]
+            if trigger_ban:
+                actions.append(self._timed_action(
+                    "ban", group_id, self.dispatcher.ban(event.bot, group_id, user_id, ban_duration)
+                ))
+            if raid_backlog:
+                actions.append(self._punish_raid_backlog(event.bot, group_id, raid_backlog, ban_duration))
+            results = await asyncio.gather(*actions)
             
-            # 更新用户分数并检查是否触发禁言
-            current_score, trigger_ban = detector.update_user_score(group_id, user_id, weight)
+            recall_error = results[0]
+            if recall_error is None:
+                logger.info(f"✅ 已撤回用户 {user_id} 的违规消息")
+                metrics.inc("recalls", group_id)
+            else:
+                logger.error(f"❌ 撤回消息失败：{recall_error}")
+                metrics.inc("recall_failures", group_id)
             
             if trigger_ban:
-                # 触发禁言
-                ban_duration = 600  # 10分钟
+                ban_error = results[1]
+                if ban_error is not None:
+                    logger.error(f"禁言用户失败：{ban_error}")
+                    metrics.inc("ban_failures", group_id)
+                    metrics.observe("total", group_id, time.perf_counter() - started)
+                    return event.plain_result(f"❌ 检测到违禁词但禁言操作失败：{ban_error}")
+                metrics.inc("bans", group_id)
+                
+                # 窗口内尚未发出的警告并入禁言提示
+                pending = self.notices.pop(group_id, user_id)
+                if pending is not None:
+                    pending.merge(detected_words, weight, current_score)
+                    detected_words = pending.detected_words
+                
+                # 生成并发送禁言提示消息
+                ban_message = self.detector.generate_ban_message(
+                    user_id, current_score, detected_words, 
+                    message, spans, ban_duration
+                )
                 
-                try:
-                    # 执行禁言
-                    await event.bot.set_group_ban(
-                        group_id=int(group_id),
-                        user_id=int(user_id),
-                        duration=ban_duration
-                    )
-                    
-                    # 生成并发送禁言提示消息
-                    ban_message = detector.generate_ban_message(
-                        user_id, current_score, detected_words, 
-                        message, highlighted_message, ban_duration
-                    )
-                    
-                    # 重置用户分数
-                    detector.reset_user_score(group_id, user_id)
-                    
-                    return event.plain_result(ban_message)
-                    
-                except Exception as e:
-                    logger.error(f"禁言用户失败：{e}")
-                    error_msg = f"❌ 检测到违禁词但禁言操作失败：{e}"
-                    return event.plain_result(error_msg)
+                # 重置用户分数
+                self.detector.reset_user_score(group_id, user_id)
+                metrics.observe("total", group_id, time.perf_counter() - started)
+                
+                return event.plain_result(ban_message)
+            
+            elif NOTICE_WINDOW > 0:
+                # 仅警告，与窗口内的其他违规合并后再发送
+                self.notices.add(group_id, user_id, event.bot, detected_words, weight, current_score)
+                metrics.observe("total", group_id, time.perf_counter() - started)
+                return None
             
             else:
                 # 仅警告，不禁言
-                warning_message = detector.generate_warning_message(
+                warning_message = self.detector.generate_warning_message(
                     user_id, current_score, detected_words, weight
                 )
+                metrics.observe("total", group_id, time.perf_counter() - started)
                 
                 return event.plain_result(warning_message)
         
@@ -499,6 +449,48 @@ class JuanJuan_Copy(Star):
         return None
 
 
+    async def _punish_raid_backlog(self, bot, group_id: str, posts, ban_duration: int):
+        """撤回此前发送重复内容的其他用户的消息，并按 RAID_WEIGHT 计分、必要时禁言"""
+        actions = []
+        for user_id, message_id in posts:
+            actions.append(self._timed_action("recall", group_id, self.dispatcher.recall(bot, message_id)))
+            current_score, trigger_ban = self.detector.update_user_score(group_id, user_id, RAID_WEIGHT)
+            if trigger_ban:
+                actions.append(self._ban_for_raid(bot, group_id, user_id, ban_duration))
+        for error in await asyncio.gather(*actions):
+            if error is not None:
+                logger.error(f"处理重复内容失败：{error}")
+
+    async def _ban_for_raid(self, bot, group_id: str, user_id: str, ban_duration: int) -> Optional[Exception]:
+        error = await self._timed_action("ban", group_id, self.dispatcher.ban(bot, group_id, user_id, ban_duration))
+        if error is None:
+            self.metrics.inc("bans", group_id)
+            self.detector.reset_user_score(group_id, user_id)
+            logger.info(f"✅ 用户 {user_id} 因发送重复内容被禁言")
+        else:
+            self.metrics.inc("ban_failures", group_id)
+        return error
+
+    async def _send_notice(self, notice: PendingNotice):
+        """发送合并后的警告提示"""
+        warning_message = self.detector.generate_warning_message(
+            notice.user_id, notice.score, notice.detected_words, notice.weight, notice.violations
+        )
+        await self.dispatcher.call(
+            notice.bot, "send_group_msg", group_id=int(notice.group_id), message=warning_message
+        )
+
+    async def _timed_action(self, stage: str, group_id: str, future) -> Optional[Exception]:
+        """等待调度器中的动作完成并记录耗时，成功返回 None，失败返回异常"""
+        stage_start = time.perf_counter()
+        try:
+            await future
+            return None
+        except Exception as e:
+            return e
+        finally:
+            self.metrics.observe(stage, group_id, time.perf_counter() - stage_start)
+
     @filter.command_group("banword", alias={"bw"})
     def banword(self):
         """违禁词相关指令"""
@@ -514,13 +506,26 @@ class JuanJuan_Copy(Star):
         "/banword on 开启违禁词功能 \n" \
         "/banword off 关闭违禁词功能 \n" \
         "/banword add <违禁词> <权重> 添加违禁词 \n" \
+        "    违禁词以 re: 开头为正则、wc: 开头为通配符（* 任意几个字符，? 一个字符） \n" \
+        "    正则单次命中超过约 256 个字符时可能漏检 \n" \
         "/banword remove（或rm） <违禁词> 移除违禁词 \n" \
         "/banword unban 用户ID 解除禁言 \n" \
         "/banword t 用户ID 踢出用户 \n" \
         "/banword tl 用户ID 踢出并拉黑用户 \n" \
         "/banword list 查看违禁词列表功能 \n" \
+        "/banword tpl list 查看词库模板及本群订阅 \n" \
+        "/banword tpl sub|unsub <模板> 本群订阅或取消订阅模板 \n" \
+        "/banword tpl add <模板> <违禁词> <权重> 向模板添加违禁词 \n" \
+        "/banword tpl rm <模板> <违禁词> 从模板移除违禁词 \n" \
+        "/banword import <文件> [模板] 从 data/wordlists 下的 txt/csv/jsonl 文件批量导入本群（或模板）违禁词 \n" \
+        "/banword export <文件> [模板] 把本群（或模板）违禁词导出到 data/wordlists 下的文件 \n" \
+        "/banword fuzzy on [最大间隔] 开启分隔符容错匹配（如“违.禁.词”） \n" \
+        "/banword fuzzy off 关闭分隔符容错匹配 \n" \
+        "/banword pinyin on|off 开启或关闭拼音及首字母匹配（如“shabi”“sb”） \n" \
+        "/banword raid on|off 开启或关闭重复内容检测（多人短时间内发送相同内容） \n" \
         "/banword score [用户ID] 查询用户当前违禁词分数（管理员可查询他人） \n" \
-        "/banword reset_score 用户ID 重置用户分数（仅管理员可用） \n"
+        "/banword reset_score 用户ID 重置用户分数（仅管理员可用） \n" \
+        "/banword stats [all] 查看本群（或全部群）的检测统计与各阶段耗时（仅管理员可用） \n"
 
         yield event.plain_result(help_message)
 
@@ -557,7 +562,7 @@ class JuanJuan_Copy(Star):
 
         # 开启功能
         self.banword_status[group_id] = True
-        self._save_ban_status()
+        self._save_ban_status(group_id)
         yield event.plain_result("✅✅✅BanWords功能已开启")
 
     @banword.command("off")
@@ -575,7 +580,7 @@ class JuanJuan_Copy(Star):
 
         # 关闭功能
         self.banword_status[group_id] = False
-        self._save_ban_status()
+        self._save_ban_status(group_id)
         yield event.plain_result("🚫🚫🚫BanWords功能已关闭")
 
     @banword.command("add")
@@ -600,6 +605,10 @@ class JuanJuan_Copy(Star):
         plain_text = event.message_str.strip()
         args = plain_text.split()
 
+        if len(args) < 4:
+            yield event.plain_result("❌ 格式错误，应为：/banword add <违禁词> <权重>")
+            return
+
         word = args[2]
         try:
             weight = int(args[3])
@@ -609,25 +618,31 @@ class JuanJuan_Copy(Star):
         except ValueError:
             yield event.plain_result("❌❌❌权重必须为整数！")
             return
-            
-        if len(args) < 4:
-            yield event.plain_result("❌ 格式错误，应为：/banword add <违禁词> <权重>")
-            return
 
+        # re: / wc: 开头的模式规则在添加时检查是否可能出现灾难性回溯
+        try:
+            validate_rule(word)
+        except ValueError as e:
+            yield event.plain_result(f"❌❌❌规则【{word}】无效：{e}")
+            return
 
         try:
             if group_id not in self.ban_words:
                 self.ban_words[group_id] = {}
             self.ban_words[group_id][word] = weight
-            self._save_ban_words()
-
-            yield event.plain_result(f"✅✅✅成功添加违禁词【{word}】，权重：{weight}")
+            self._save_ban_words([(group_id, word)])
         except Exception as e:
             logger.error(f"添加违禁词失败：{e}")
             yield event.plain_result("❌❌❌添加违禁词失败，请稍后重试。")
+            return
 
-        # 更新检测器中的违禁词数据
-        self.detector.set_ban_words(self.ban_words)
+        # 只重建当前群的匹配器，重建完成后再回复，保证回复时新词已经生效
+        await self.detector.refresh_group(group_id)
+        message = f"✅✅✅成功添加违禁词【{word}】，权重：{weight}"
+        merged = self.detector.merged_words(group_id).get(word)
+        if merged:
+            message += f"\n⚠️与【{'、'.join(merged)}】归一化后相同，匹配时合并为一个违禁词，按其中最大的权重计分"
+        yield event.plain_result(message)
 
     @banword.command("remove", alias={"rm"})
     async def remove(self, event: AstrMessageEvent):
@@ -651,21 +666,323 @@ class JuanJuan_Copy(Star):
         plain_text = event.message_str.strip()
         args = plain_text.split()
 
+        if len(args) < 3:
+            yield event.plain_result("❌ 格式错误，应为：/banword remove <违禁词>")
+            return
+
         word = args[2]
         
         try:
-            if group_id in self.ban_words and word in self.ban_words[group_id]:
-                del self.ban_words[group_id][word]
-                self._save_ban_words()
-                yield event.plain_result(f"✅✅✅成功移除违禁词【{word}】")
+            group_words = self.ban_words.get(group_id, {})
+            if self.detector.inherits_word(group_id, word):
+                # 来自订阅模板的词不能直接删除，记一个权重为 0 的屏蔽标记
+                if group_words.get(word) == 0:
+                    yield event.plain_result(f"❌❌❌模板违禁词【{word}】已在本群屏蔽。")
+                    return
+                self.ban_words.setdefault(group_id, {})[word] = 0
+                self._save_ban_words([(group_id, word)])
+                message = f"✅✅✅已在本群屏蔽模板违禁词【{word}】"
+            elif word in group_words:
+                del group_words[word]
+                self._save_ban_words([(group_id, word)])
+                message = f"✅✅✅成功移除违禁词【{word}】"
             else:
                 yield event.plain_result(f"❌❌❌违禁词【{word}】不存在。")
+                return
         except Exception as e:
             logger.error(f"移除违禁词失败：{e}")
             yield event.plain_result("❌❌❌移除违禁词失败，请稍后重试。")
+            return
 
-        # 更新检测器中的违禁词数据
-        self.detector.set_ban_words(self.ban_words)
+        # 只重建当前群的匹配器，重建完成后再回复
+        await self.detector.refresh_group(group_id)
+        yield event.plain_result(message)
+
+    @banword.command("fuzzy")
+    async def fuzzy(self, event: AstrMessageEvent):
+        """开启或关闭分隔符容错匹配（仅管理员可用）"""
+        group_id = event.get_group_id()
+        
+        if not group_id:
+            yield event.plain_result("此命令仅在群聊中可用。")
+            return
+        
+        if not event.is_admin():
+            yield event.plain_result("❌❌❌你没有权限对BanWords功能进行操作,请联系管理员。")
+            return
+        
+        plain_text = event.message_str.strip()
+        args = plain_text.split()
+        
+        if len(args) < 3 or args[2] not in ("on", "off"):
+            yield event.plain_result("❌ 格式错误，应为：/banword fuzzy on [最大间隔] 或 /banword fuzzy off")
+            return
+        
+        if args[2] == "on":
+            try:
+                max_gap = int(args[3]) if len(args) > 3 else 2
+                if max_gap <= 0:
+                    yield event.plain_result("❌❌❌最大间隔必须为正整数！")
+                    return
+            except ValueError:
+                yield event.plain_result("❌❌❌最大间隔必须为整数！")
+                return
+            self.group_settings.setdefault(group_id, {})["fuzzy_gap"] = max_gap
+            message = f"✅✅✅已开启分隔符容错匹配，违禁词字符之间最多允许{max_gap}个分隔符"
+        else:
+            self.group_settings.get(group_id, {}).pop("fuzzy_gap", None)
+            if not self.group_settings.get(group_id, True):
+                del self.group_settings[group_id]
+            message = "🚫🚫🚫已关闭分隔符容错匹配"
+        
+        self._save_group_settings(group_id)
+        await self.detector.refresh_group(group_id)
+        yield event.plain_result(message)
+
+    @banword.command("pinyin")
+    async def pinyin(self, event: AstrMessageEvent):
+        """开启或关闭拼音及首字母匹配（仅管理员可用）"""
+        group_id = event.get_group_id()
+        
+        if not group_id:
+            yield event.plain_result("此命令仅在群聊中可用。")
+            return
+        
+        if not event.is_admin():
+            yield event.plain_result("❌❌❌你没有权限对BanWords功能进行操作,请联系管理员。")
+            return
+        
+        plain_text = event.message_str.strip()
+        args = plain_text.split()
+        
+        if len(args) < 3 or args[2] not in ("on", "off"):
+            yield event.plain_result("❌ 格式错误，应为：/banword pinyin on 或 /banword pinyin off")
+            return
+        
+        if args[2] == "on":
+            self.group_settings.setdefault(group_id, {})["pinyin"] = True
+            message = "✅✅✅已开启拼音匹配，违禁词的全拼和首字母（如“shabi”“sb”）也会被检测"
+        else:
+            self.group_settings.get(group_id, {}).pop("pinyin", None)
+            if not self.group_settings.get(group_id, True):
+                del self.group_settings[group_id]
+            message = "🚫🚫🚫已关闭拼音匹配"
+        
+        self._save_group_settings(group_id)
+        await self.detector.refresh_group(group_id)
+        yield event.plain_result(message)
+
+    @banword.command("raid")
+    async def raid_detection(self, event: AstrMessageEvent):
+        """开启或关闭重复内容检测（仅管理员可用）"""
+        group_id = event.get_group_id()
+        
+        if not group_id:
+            yield event.plain_result("此命令仅在群聊中可用。")
+            return
+        
+        if not event.is_admin():
+            yield event.plain_result("❌❌❌你没有权限对BanWords功能进行操作,请联系管理员。")
+            return
+        
+        plain_text = event.message_str.strip()
+        args = plain_text.split()
+        
+        if len(args) < 3 or args[2] not in ("on", "off"):
+            yield event.plain_result("❌ 格式错误，应为：/banword raid on 或 /banword raid off")
+            return
+        
+        if args[2] == "on":
+            if not self.raid.enabled:
+                yield event.plain_result("❌❌❌重复内容检测已在插件配置中全局关闭（RAID_MIN_USERS 为 0）")
+                return
+            self.group_settings.setdefault(group_id, {})["raid"] = True
+            message = (f"✅✅✅已开启重复内容检测，{RAID_WINDOW}秒内有{RAID_MIN_USERS}个不同用户"
+                       f"发送相同内容时撤回并计分")
+        else:
+            self.group_settings.get(group_id, {}).pop("raid", None)
+            if not self.group_settings.get(group_id, True):
+                del self.group_settings[group_id]
+            self.raid.clear(group_id)
+            message = "🚫🚫🚫已关闭重复内容检测"
+        
+        self._save_group_settings(group_id)
+        yield event.plain_result(message)
+
+    @banword.command("tpl")
+    async def template(self, event: AstrMessageEvent):
+        """管理共享词库模板及本群订阅（仅管理员可用）"""
+        group_id = event.get_group_id()
+        
+        if not event.is_admin():
+            yield event.plain_result("❌❌❌你没有权限对BanWords功能进行操作,请联系管理员。")
+            return
+        
+        plain_text = event.message_str.strip()
+        args = plain_text.split()
+        action = args[2] if len(args) > 2 else "list"
+        usage = ("❌ 格式错误，应为：/banword tpl list | sub <模板> | unsub <模板> | "
+                 "add <模板> <违禁词> <权重> | rm <模板> <违禁词>")
+        
+        if action == "list":
+            lines = ["词库模板："]
+            for name, words in sorted(self.templates.items()):
+                lines.append(f"  • {name}：{len(words)}个违禁词")
+            if not self.templates:
+                lines.append("  （暂无）")
+            if group_id:
+                lines.append(f"本群订阅：{'、'.join(self.detector.subscribed_templates(group_id)) or '无'}")
+            yield event.plain_result("\n".join(lines))
+            return
+        
+        if action in ("sub", "unsub"):
+            if not group_id:
+                yield event.plain_result("此命令仅在群聊中可用。")
+                return
+            if len(args) < 4:
+                yield event.plain_result(usage)
+                return
+            name = args[3]
+            subscribed = list(self.detector.subscribed_templates(group_id))
+            if action == "sub":
+                if name in subscribed:
+                    yield event.plain_result(f"❌❌❌本群已订阅模板【{name}】")
+                    return
+                subscribed.append(name)
+                message = f"✅✅✅本群已订阅模板【{name}】"
+            else:
+                if name not in subscribed:
+                    yield event.plain_result(f"❌❌❌本群未订阅模板【{name}】")
+                    return
+                subscribed.remove(name)
+                message = f"🚫🚫🚫本群已取消订阅模板【{name}】"
+            self.group_settings.setdefault(group_id, {})["templates"] = subscribed
+            self._save_group_settings(group_id)
+            await self.detector.refresh_group(group_id)
+            yield event.plain_result(message)
+            return
+        
+        if action == "add":
+            if len(args) < 6:
+                yield event.plain_result(usage)
+                return
+            name, word = args[3], args[4]
+            try:
+                weight = int(args[5])
+                if weight <= 0:
+                    yield event.plain_result("❌❌❌权重必须为正整数！")
+                    return
+            except ValueError:
+                yield event.plain_result("❌❌❌权重必须为整数！")
+                return
+            try:
+                validate_rule(word)
+            except ValueError as e:
+                yield event.plain_result(f"❌❌❌规则【{word}】无效：{e}")
+                return
+            self.templates.setdefault(name, {})[word] = weight
+            self._save_templates([(name, word)])
+            message = f"✅✅✅已向模板【{name}】添加违禁词【{word}】，权重：{weight}"
+        elif action in ("rm", "remove"):
+            if len(args) < 5:
+                yield event.plain_result(usage)
+                return
+            name, word = args[3], args[4]
+            words = self.templates.get(name, {})
+            if word not in words:
+                yield event.plain_result(f"❌❌❌模板【{name}】中没有违禁词【{word}】")
+                return
+            del words[word]
+            if not words:
+                del self.templates[name]
+            self._save_templates([(name, word)])
+            message = f"✅✅✅已从模板【{name}】移除违禁词【{word}】"
+        else:
+            yield event.plain_result(usage)
+            return
+        
+        # 订阅了该模板的群共用的匹配器只重建一次
+        await self.detector.refresh_template(name)
+        yield event.plain_result(message)
+
+    def _word_file_target(self, event: AstrMessageEvent):
+        """解析 import / export 的参数，返回 (文件路径, 模板名, 群号, 错误信息)"""
+        args = event.message_str.strip().split()
+        if len(args) < 3:
+            return None, None, None, "❌ 格式错误，应为：/banword import|export <文件> [模板]"
+        # 文件只能位于数据目录下的 wordlists 目录内（解析符号链接后检查，拒绝绝对路径和 ..），
+        # 这样导出时不会覆盖 ban_words.json 等插件自己的数据文件
+        wordlist_dir = os.path.realpath(WORDLIST_DIR)
+        path = os.path.realpath(os.path.join(wordlist_dir, args[2]))
+        if os.path.commonpath([wordlist_dir, path]) != wordlist_dir or path == wordlist_dir:
+            return None, None, None, "❌❌❌文件必须位于插件数据目录的 wordlists 目录内（使用相对路径，不能包含 ..）"
+        name = args[3] if len(args) > 3 else None
+        group_id = event.get_group_id()
+        if name is None and not group_id:
+            return None, None, None, "私聊中请指定模板名。"
+        return path, name, group_id, None
+
+    @banword.command("import")
+    async def import_words(self, event: AstrMessageEvent):
+        """从文件批量导入违禁词（仅管理员可用）"""
+        if not event.is_admin():
+            yield event.plain_result("❌❌❌你没有权限对BanWords功能进行操作,请联系管理员。")
+            return
+        
+        path, name, group_id, error = self._word_file_target(event)
+        if error:
+            yield event.plain_result(error)
+            return
+        if not os.path.isfile(path):
+            yield event.plain_result(f"❌❌❌文件不存在：{path}")
+            return
+        
+        target = self.templates.get(name, {}) if name else self.ban_words.get(group_id, {})
+        # 在线程池中流式解析和校验，只计算变化，不阻塞事件循环
+        try:
+            updates, result = await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(plan_import, dict(target), path, allow_zero=name is None)
+            )
+        except Exception as e:
+            logger.error(f"解析词表文件失败：{e}")
+            yield event.plain_result(f"❌❌❌解析词表文件失败：{e}")
+            return
+        
+        # 一次性应用全部变化：一次写入存储，一次重建匹配器
+        if updates:
+            if name:
+                self.templates.setdefault(name, {}).update(updates)
+                self._save_templates([(name, word) for word in updates])
+                await self.detector.refresh_template(name)
+            else:
+                self.ban_words.setdefault(group_id, {}).update(updates)
+                self._save_ban_words([(group_id, word) for word in updates])
+                await self.detector.refresh_group(group_id)
+        
+        scope = f"模板【{name}】" if name else "本群"
+        yield event.plain_result(f"✅✅✅{scope}违禁词导入完成：\n{result.summary()}")
+
+    @banword.command("export")
+    async def export_word_list(self, event: AstrMessageEvent):
+        """把违禁词导出到文件（仅管理员可用）"""
+        if not event.is_admin():
+            yield event.plain_result("❌❌❌你没有权限对BanWords功能进行操作,请联系管理员。")
+            return
+        
+        path, name, group_id, error = self._word_file_target(event)
+        if error:
+            yield event.plain_result(error)
+            return
+        
+        words = dict(self.templates.get(name, {}) if name else self.ban_words.get(group_id, {}))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            count = await asyncio.get_running_loop().run_in_executor(None, export_words, words, path)
+        except Exception as e:
+            logger.error(f"导出词表失败：{e}")
+            yield event.plain_result(f"❌❌❌导出词表失败：{e}")
+            return
+        yield event.plain_result(f"✅✅✅已导出{count}个违禁词到：{path}")
 
     @banword.command("list")
     async def list_ban_words(self, event: AiocqhttpMessageEvent):
@@ -685,8 +1002,8 @@ class JuanJuan_Copy(Star):
             yield event.plain_result("🚫🚫🚫BanWords功能已关闭，无法查看列表")
             return
 
-        # 获取当前群的违禁词
-        group_ban_words = self.ban_words.get(group_id, {})
+        # 获取当前群实际生效的违禁词（订阅的模板 + 本群增量）
+        group_ban_words = self.detector.effective_words(group_id)
         if not group_ban_words:
             yield event.plain_result("✅✅✅当前群暂无违禁词。")
             return
@@ -701,11 +1018,15 @@ class JuanJuan_Copy(Star):
             # 构建纯文本消息内容
             message_lines = [f"群{group_id}违禁词列表:"]
             message_lines.append("----------------------")
-            message_lines.append("违禁词 | 权重")
+            message_lines.append("违禁词 | 权重 | 来源")
             message_lines.append("------------------------------------------")
             
-            for word, w in group_ban_words.items():
-                message_lines.append(f"{word} | {w}")
+            merged = self.detector.merged_words(group_id)
+            for word, (w, source) in group_ban_words.items():
+                line = f"{word} | {w} | {source}"
+                if word in merged:
+                    line += f" | 与【{'、'.join(merged[word])}】合并计分"
+                message_lines.append(line)
             
             message_lines.append("----------------------")
             message_lines.append(f"共{len(group_ban_words)}个违禁词")
@@ -738,11 +1059,7 @@ class JuanJuan_Copy(Star):
             return
         
         try:
-            await event.bot.set_group_ban(
-                group_id=int(group_id),
-                user_id=int(user_id),
-                duration=0
-            )
+            await self.dispatcher.ban(event.bot, group_id, user_id, 0)
             yield event.plain_result(f"✅✅✅已成功解禁用户{user_id}。")
         except Exception as e:
             logger.error(f"解禁用户失败：{e}")
@@ -762,11 +1079,7 @@ class JuanJuan_Copy(Star):
             return
         
         try:
-            await event.bot.set_group_kick(
-                group_id=int(group_id),
-                user_id=int(user_id),
-                reject_add_request=False
-            )
+            await self.dispatcher.kick(event.bot, group_id, user_id, reject_add_request=False)
             yield event.plain_result(f"✅✅✅已成功踢出用户{user_id}。")
         except Exception as e:
             logger.error(f"踢出用户失败：{e}")
@@ -787,11 +1100,7 @@ class JuanJuan_Copy(Star):
             return
         
         try:
-            await event.bot.set_group_kick(
-                group_id=int(group_id),
-                user_id=int(user),
-                reject_add_request=True
-            )
+            await self.dispatcher.kick(event.bot, group_id, user, reject_add_request=True)
             yield event.plain_result(f"✅✅✅已成功踢出并拉黑用户{user}。")
         except Exception as e:
             logger.error(f"踢出并拉黑用户失败：{e}")
@@ -835,7 +1144,31 @@ class JuanJuan_Copy(Star):
         self.detector.reset_user_score(group_id, target_user)
         yield event.plain_result(f"✅ 已重置用户 {target_user} 的违禁词分数")
 
+    @banword.command("stats")
+    async def stats(self, event: AstrMessageEvent, scope: str = ""):
+        """查看检测统计与各阶段耗时（仅管理员可用）"""
+        group_id = event.get_group_id()
+        
+        if not event.is_admin():
+            yield event.plain_result("❌ 你没有权限执行此操作。")
+            return
+        
+        # 私聊或指定 all 时显示全部群的合计
+        if not group_id or scope == "all":
+            group_id = None
+        yield event.plain_result(self.metrics.summary(group_id))
+
     async def terminate(self):
         """插件卸载"""
+        if self._metrics_task is not None:
+            self._metrics_task.cancel()
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+        # 先发出尚未发送的合并提示，再停止调度器
+        await self.notices.close()
+        self.dispatcher.close()
+        # 停止后台写盘并把剩余的用户分数写入文件。同时清空全局检测器：插件重新加载
+        # （模块没有重新导入）时 get_detector() 会创建新的实例，而不是返回这个已关闭的
+        await asyncio.get_running_loop().run_in_executor(None, close_detector)
         logger.info("卸载卷卷违禁词插件")
 
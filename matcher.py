@@ -0,0 +1,634 @@
+# matcher.py
+import asyncio
+import functools
+import hashlib
+import itertools
+import re
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .normalize import NormalizedText, normalize, normalize_word, table_digest as normalize_table_digest
+from .patterns import (
+    MAX_AMBIGUITY, MAX_PATTERN_LENGTH, MAX_REPEAT_BOUND, MAX_SCAN_LENGTH, SCAN_BUDGET, WILDCARD_MAX_GAP,
+    PatternSet, is_pattern,
+)
+from .pinyin import pinyin_variants, table_digest as pinyin_table_digest
+from .snapshot import MatcherSnapshot, content_key
+
+# 分隔符容错模式下默认忽略的字符（消息已归一化，全角标点已转为半角）
+DEFAULT_SEPARATORS = (
+    " \t\r\n.,;:!?'\"`~@#$%^&*()-_=+[]{}<>/\\|"
+    "·。，、；：！？…—～「」『』《》【】〈〉“”‘’"
+)
+
+
+def _tables_digest() -> str:
+    """
+    构建匹配器时用到的内置数据和参数的摘要，作为快照键的一部分
+
+    归一化表、拼音表、默认分隔符或模式规则的检查与扫描参数变化时，
+    即使违禁词没变，快照中的旧匹配器也不能再用。
+    """
+    pattern_params = (MAX_PATTERN_LENGTH, MAX_REPEAT_BOUND, WILDCARD_MAX_GAP, MAX_AMBIGUITY,
+                      MAX_SCAN_LENGTH, SCAN_BUDGET)
+    data = "\0".join([normalize_table_digest(), pinyin_table_digest(), DEFAULT_SEPARATORS, repr(pattern_params)])
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+_TABLES_DIGEST = _tables_digest()
+
+
+def resolve_overlaps(spans: List[Tuple[int, int, str]]) -> List[Tuple[int, int, str]]:
+    """
+    处理重叠或嵌套的命中位置：较长的命中优先，长度相同时靠左的优先
+
+    Returns:
+        互不重叠、按起始位置排序的命中位置列表
+    """
+    if len(spans) < 2:
+        return list(spans)
+    taken = bytearray(max(end for _, end, _ in spans))
+    kept = []
+    for start, end, word in sorted(spans, key=lambda s: (s[0] - s[1], s[0])):
+        if any(taken[start:end]):
+            continue
+        taken[start:end] = b"\x01" * (end - start)
+        kept.append((start, end, word))
+    kept.sort()
+    return kept
+
+
+def highlight_message(message: str, spans: List[Tuple[int, int, str]], limit: Optional[int] = None) -> str:
+    """
+    根据命中位置从左到右一次拼接出高亮消息
+
+    Args:
+        message: 原始消息
+        spans: 命中位置列表[(起始, 结束, 违禁词)]
+        limit: 只需要前 limit 个字符时传入，拼接到 limit + 1 个字符后立即停止
+
+    Returns:
+        高亮消息（传入 limit 时最多 limit + 1 个字符，调用方据此判断是否需要截断）
+    """
+    parts = []
+    remaining = sys.maxsize if limit is None else limit + 1
+    pos = 0
+    for start, end, word in resolve_overlaps(spans):
+        # 每一段都只截取剩余长度以内的部分，第一个命中之前的长文本也不会整段复制
+        gap = message[pos:min(start, pos + remaining)]
+        # 高亮原文中的片段，而不是归一化后的违禁词
+        marked = f"【{message[start:min(end, start + remaining)]}】"
+        for part in (gap, marked):
+            part = part[:remaining]
+            parts.append(part)
+            remaining -= len(part)
+            if remaining <= 0:
+                return "".join(parts)
+        pos = end
+    parts.append(message[pos:pos + remaining])
+    return "".join(parts)
+
+
+def _is_ascii_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+def _on_word_boundary(text: str, start: int, end: int) -> bool:
+    """text[start:end] 的首尾字母或数字是否没有与相邻的 ASCII 字母或数字连在一起"""
+    if start > 0 and _is_ascii_word_char(text[start]) and _is_ascii_word_char(text[start - 1]):
+        return False
+    if end < len(text) and _is_ascii_word_char(text[end - 1]) and _is_ascii_word_char(text[end]):
+        return False
+    return True
+
+
+class AhoCorasickMatcher:
+    """
+    基于 Aho-Corasick 自动机的多模式匹配器
+
+    每个群根据自己的违禁词字典构建一次，之后每条消息只需从头到尾扫描一遍，
+    耗时与违禁词数量无关。违禁词和消息都先经过同样的归一化（全半角、大小写、
+    零宽字符、繁简），归一化后相同的违禁词合并为第一个，权重取其中最大的，
+    被合并的词记在 merged 中。
+
+    fuzzy_gap > 0 时开启分隔符容错：扫描前把消息中连续不超过 fuzzy_gap 个的分隔符
+    去掉（更长的分隔符串视为断开），违禁词本身也去掉分隔符，
+    这样 "违.禁.词" 也能命中 "违禁词"，且仍然只需线性扫描一遍。
+
+    以 re: / wc: 开头的模式规则不进入自动机，而是合并编译为一个 PatternSet，
+    在归一化后的消息上再扫描一遍（不受分隔符容错影响）。
+
+    pinyin=True 时把每个违禁词的全拼和首字母变体（"傻逼" -> "shabi"、"sb"）也插入同一个
+    自动机，变体的结尾节点直接指向原违禁词，命中变体时计为原违禁词，扫描次数不变。
+    变体只在英文单词边界处生效（前后不是 ASCII 字母或数字），"usb"、"eggs" 不会命中。
+    """
+
+    __slots__ = ("words", "weights", "merged", "fuzzy_gap", "pinyin", "_separator_re", "_depth",
+                 "_goto", "_fail", "_word_at", "_variant", "_out_link", "_patterns", "_pattern_index")
+
+    def __init__(self, ban_words: Dict[str, int], fuzzy_gap: int = 0,
+                 separators: str = DEFAULT_SEPARATORS, pinyin: bool = False):
+        """
+        Args:
+            ban_words: {违禁词: 权重}
+            fuzzy_gap: 违禁词字符之间最多允许插入的分隔符个数，0 表示关闭
+            separators: 分隔符容错模式下忽略的字符
+            pinyin: 是否同时匹配违禁词的拼音及首字母变体
+        """
+        self.fuzzy_gap = fuzzy_gap
+        self.pinyin = pinyin
+        self._separator_re = None
+        if fuzzy_gap > 0 and separators:
+            self._separator_re = re.compile(f"[{re.escape(separators)}]+")
+        self.words: List[str] = []
+        self.weights: List[int] = []
+        self.merged: Dict[str, str] = {}  # {归一化后与前面的词相同的违禁词: 合并到的违禁词}
+        self._depth: List[int] = [0]      # 节点深度，即以该节点结尾的键的长度
+        self._goto: List[Dict[str, int]] = [{}]
+        self._word_at: List[int] = [-1]   # 以该节点结尾的违禁词下标，-1 表示没有
+        self._variant = set()             # 结尾的是拼音变体（而不是违禁词本身）的节点
+        self._fail: List[int] = [0]
+        self._out_link: List[int] = [0]   # 沿失败链最近的一个结尾节点，0 表示没有
+        self._pattern_index: Dict[str, int] = {}   # {模式规则: 下标}
+
+        for word, weight in ban_words.items():
+            if is_pattern(word):
+                if word not in self._pattern_index:
+                    self._pattern_index[word] = len(self.words)
+                    self.words.append(word)
+                    self.weights.append(weight)
+                continue
+            key = self._key(normalize_word(word))
+            if not key:
+                continue
+            index = self._insert(key, len(self.words))
+            if index != len(self.words):
+                # 归一化后与前面的词相同（例如 "AB" 和 "ab"），合并计分并取较大的权重
+                self.merged[word] = self.words[index]
+                self.weights[index] = max(self.weights[index], weight)
+                continue
+            self.words.append(word)
+            self.weights.append(weight)
+
+        if pinyin:
+            # 变体在所有违禁词之后插入，与某个违禁词本身相同的变体让位给该违禁词
+            for index, word in enumerate(self.words):
+                if is_pattern(word):
+                    continue
+                for variant in pinyin_variants(word):
+                    key = self._key(variant)
+                    if key:
+                        self._insert(key, index, variant=True)
+
+        self._patterns = None
+        if self._pattern_index:
+            self._patterns = PatternSet([(index, word) for word, index in self._pattern_index.items()])
+        self._build()
+
+    def _key(self, key: str) -> str:
+        """分隔符容错模式下去掉键中的分隔符"""
+        if self._separator_re is not None:
+            key = self._separator_re.sub("", key)
+        return key
+
+    def _insert(self, key: str, index: int, variant: bool = False) -> int:
+        """
+        把一个词（或拼音变体）插入字典树
+
+        Returns:
+            结尾节点上的违禁词下标，键已经被别的词占用时返回那个词的下标
+        """
+        goto = self._goto
+        node = 0
+        for ch in key:
+            nxt = goto[node].get(ch)
+            if nxt is None:
+                nxt = len(goto)
+                goto[node][ch] = nxt
+                goto.append({})
+                self._word_at.append(-1)
+                self._fail.append(0)
+                self._out_link.append(0)
+                self._depth.append(self._depth[node] + 1)
+            node = nxt
+        # 归一化后重复的键只保留第一个
+        if self._word_at[node] == -1:
+            self._word_at[node] = index
+            if variant:
+                self._variant.add(node)
+        return self._word_at[node]
+
+    def _build(self):
+        """广度优先计算失败指针和输出链"""
+        goto, fail, word_at, out_link = self._goto, self._fail, self._word_at, self._out_link
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                target = goto[state].get(ch, 0)
+                fail[child] = target if target != child else 0
+                f = fail[child]
+                out_link[child] = f if word_at[f] != -1 else out_link[f]
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    @property
+    def pattern_timeouts(self) -> int:
+        """模式扫描超出时间预算的次数"""
+        return self._patterns.timeouts if self._patterns is not None else 0
+
+    def index_of(self, word: str) -> int:
+        """查找与 word 归一化后相同的违禁词（模式规则按原文）下标，不存在时返回 -1"""
+        if is_pattern(word):
+            return self._pattern_index.get(word, -1)
+        key = self._key(normalize_word(word))
+        if not key:
+            return -1
+        goto = self._goto
+        node = 0
+        for ch in key:
+            node = goto[node].get(ch)
+            if node is None:
+                return -1
+        return self._word_at[node]
+
+    def _strip_separators(self, text: str) -> Tuple[str, List[int]]:
+        """
+        去掉分隔符，超过 fuzzy_gap 的分隔符串替换为一个断开符
+
+        Returns:
+            Tuple[处理后的文本, 每个字符在原文本中的位置]
+        """
+        parts: List[str] = []
+        positions: List[int] = []
+        gap = self.fuzzy_gap
+        pos = 0
+        for m in self._separator_re.finditer(text):
+            start, end = m.span()
+            parts.append(text[pos:start])
+            positions.extend(range(pos, start))
+            if end - start > gap:
+                # 自动机中没有 "\0" 的转移，会回到根节点
+                parts.append("\0")
+                positions.append(start)
+            pos = end
+        parts.append(text[pos:])
+        positions.extend(range(pos, len(text)))
+        return "".join(parts), positions
+
+    def iter_matches(self, text: str):
+        """
+        逐个产出匹配结果
+
+        Args:
+            text: 已归一化的文本
+
+        Yields:
+            Tuple[起始位置, 结束位置, 违禁词下标, 是否为拼音变体]（归一化文本中的位置）
+        """
+        goto, fail, word_at, out_link = self._goto, self._fail, self._word_at, self._out_link
+        depth, variant = self._depth, self._variant
+        node = 0
+        for pos, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = node if word_at[node] != -1 else out_link[node]
+            while hit:
+                end = pos + 1
+                yield end - depth[hit], end, word_at[hit], hit in variant
+                hit = out_link[hit]
+
+    def scan(self, message: Union[str, NormalizedText]) -> Tuple[int, Dict[str, int], List[Tuple[int, int, str]]]:
+        """
+        单次扫描消息
+
+        同一个违禁词的多次出现按不重叠计数（与 re.findall 的结果一致），
+        不同违禁词之间互不影响。
+
+        Args:
+            message: 原始消息，或已经归一化过的 NormalizedText
+
+        Returns:
+            Tuple[总权重, 检测到的违禁词字典, 命中位置列表[(原文起始, 原文结束, 违禁词)]]
+        """
+        if not isinstance(message, NormalizedText):
+            message = normalize(message)
+        to_original = message.to_original
+        text = message.text
+        positions = None
+        if self._separator_re is not None:
+            text, positions = self._strip_separators(text)
+        words, weights = self.words, self.weights
+        last_end: Dict[int, int] = {}
+        counts: Dict[int, int] = {}
+        spans: List[Tuple[int, int, str]] = []
+        total_weight = 0
+
+        for start, end, index, variant in self.iter_matches(text):
+            if start < last_end.get(index, 0):
+                continue
+            span = (start, end) if positions is None else (positions[start], positions[end - 1] + 1)
+            # 拼音变体夹在英文单词中间时不算命中，例如 "usb" 中的 "sb"
+            if variant and not _on_word_boundary(message.text, *span):
+                continue
+            last_end[index] = end
+            counts[index] = counts.get(index, 0) + 1
+            total_weight += weights[index]
+            spans.append((*to_original(*span), words[index]))
+
+        if self._patterns is not None:
+            # 同一条规则的多次命中本来就互不重叠
+            for start, end, index in self._patterns.iter_matches(message.text):
+                counts[index] = counts.get(index, 0) + 1
+                total_weight += weights[index]
+                spans.append((*to_original(start, end), words[index]))
+
+        # 按违禁词的添加顺序输出，与逐词检测时的顺序保持一致
+        detected_words = {words[index]: counts[index] for index in sorted(counts)}
+        return total_weight, detected_words, spans
+
+
+class LayeredMatcher:
+    """
+    共享词库匹配器 + 群自己的增量匹配器
+
+    订阅相同词库模板（且匹配参数相同）的群共用同一个编译好的 base 匹配器，
+    每个群只单独编译自己增加或改了权重的少量词（delta）。delta 中出现的词
+    （包括权重为 0 的屏蔽标记）会覆盖 base 中归一化后相同的词。
+    """
+
+    __slots__ = ("base", "delta", "_masked")
+
+    def __init__(self, base: Optional[AhoCorasickMatcher], delta: Optional[AhoCorasickMatcher],
+                 overrides: Iterable[str] = ()):
+        """
+        Args:
+            base: 共享匹配器
+            delta: 群增量匹配器（只含权重为正的词）
+            overrides: 群内出现的所有词（含屏蔽标记），base 中的同名词不再生效
+        """
+        self.base = base
+        self.delta = delta
+        # {被覆盖的 base 违禁词: 其在 base 中的权重}
+        self._masked: Dict[str, int] = {}
+        if base is not None:
+            for word in overrides:
+                index = base.index_of(word)
+                if index >= 0:
+                    self._masked[base.words[index]] = base.weights[index]
+
+    def __len__(self) -> int:
+        size = len(self.delta) if self.delta is not None else 0
+        if self.base is not None:
+            size += len(self.base) - len(self._masked)
+        return size
+
+    def scan(self, message: Union[str, NormalizedText]) -> Tuple[int, Dict[str, int], List[Tuple[int, int, str]]]:
+        """与 AhoCorasickMatcher.scan 相同，合并两层的结果"""
+        if not isinstance(message, NormalizedText):
+            message = normalize(message)
+        if self.base is None:
+            return self.delta.scan(message) if self.delta is not None else (0, {}, [])
+
+        total_weight, detected_words, spans = self.base.scan(message)
+        masked = self._masked
+        if masked and detected_words:
+            for word in [w for w in detected_words if w in masked]:
+                total_weight -= masked[word] * detected_words.pop(word)
+            spans = [span for span in spans if span[2] not in masked]
+        if self.delta is not None:
+            delta_weight, delta_words, delta_spans = self.delta.scan(message)
+            total_weight += delta_weight
+            detected_words.update(delta_words)
+            spans.extend(delta_spans)
+        return total_weight, detected_words, spans
+
+
+class MatcherCache:
+    """
+    按群缓存编译好的匹配器，并为每个群维护一个版本号
+
+    群的违禁词变化时只让该群失效并在线程池中重新构建；新匹配器构建完成前，
+    旧匹配器继续为该群服务，构建完成后一次性替换。
+
+    传入 snapshot（MatcherSnapshot）时，构建前先按违禁词内容的摘要查找持久化的匹配器，
+    找不到才真正构建，构建结果再放回快照，重启后内容没变的群不必重新编译。
+    """
+
+    def __init__(self, snapshot: Optional[MatcherSnapshot] = None):
+        self._entries: Dict[str, Tuple[int, AhoCorasickMatcher]] = {}
+        self._versions: Dict[str, int] = {}
+        self.snapshot = snapshot
+
+    def version(self, group_id: str) -> int:
+        """获取群当前的违禁词版本号"""
+        return self._versions.get(group_id, 0)
+
+    def invalidate(self, group_id: str) -> int:
+        """使群的匹配器失效，返回新的版本号"""
+        version = self._versions.get(group_id, 0) + 1
+        self._versions[group_id] = version
+        return version
+
+    def clear(self):
+        """使所有群的匹配器失效"""
+        for group_id in set(self._versions) | set(self._entries):
+            self.invalidate(group_id)
+        self._entries = {}
+
+    def get(self, group_id: str, ban_words: Dict[str, int], options: Optional[Dict] = None) -> AhoCorasickMatcher:
+        """
+        获取群的匹配器
+
+        已有匹配器（即使正在后台重建）直接返回；首次使用时同步构建。
+
+        Args:
+            group_id: 群组ID
+            ban_words: 该群的违禁词字典
+            options: 构建匹配器的额外参数（如 fuzzy_gap）
+        """
+        return self.get_versioned(group_id, ban_words, options)[1]
+
+    def pattern_timeouts(self) -> int:
+        """已缓存的匹配器中模式扫描超出时间预算的总次数（匹配器重建后重新计数）"""
+        return sum(matcher.pattern_timeouts for _, matcher in self._entries.values())
+
+    def peek(self, group_id: str) -> Optional[Tuple[int, AhoCorasickMatcher]]:
+        """获取已构建的 (版本号, 匹配器)，尚未构建时返回 None，不会触发构建"""
+        return self._entries.get(group_id)
+
+    def get_versioned(self, group_id: str, ban_words: Dict[str, int],
+                      options: Optional[Dict] = None) -> Tuple[int, AhoCorasickMatcher]:
+        """
+        获取群的匹配器及其构建时的版本号
+
+        后台重建期间返回的是旧匹配器和旧版本号，用版本号作为检测结果缓存的键时不会串用。
+        """
+        entry = self._entries.get(group_id)
+        if entry is not None:
+            return entry
+        version = self.version(group_id)
+        matcher = self._build(ban_words, options, group_id)
+        self._swap(group_id, version, matcher)
+        return version, matcher
+
+    async def rebuild(self, group_id: str, ban_words: Dict[str, int], options: Optional[Dict] = None) -> bool:
+        """
+        在线程池中重建群的匹配器
+
+        Args:
+            group_id: 群组ID
+            ban_words: 该群最新的违禁词字典
+            options: 构建匹配器的额外参数（如 fuzzy_gap）
+
+        Returns:
+            是否替换成功（构建期间又有新的修改时返回 False，交给更新的那次重建）
+        """
+        version = self.invalidate(group_id)
+        words = dict(ban_words)
+        loop = asyncio.get_running_loop()
+        build = functools.partial(self._build, words, options, group_id)
+        matcher = await loop.run_in_executor(None, build)
+        return self._swap(group_id, version, matcher)
+
+    def _build(self, ban_words: Dict[str, int], options: Optional[Dict] = None,
+               owner: Optional[str] = None) -> AhoCorasickMatcher:
+        """构建匹配器，有快照时优先从快照加载；owner 为使用该匹配器的群号（或共享匹配器的缓存键）"""
+        if self.snapshot is None:
+            return AhoCorasickMatcher(ban_words, **(options or {}))
+        key = content_key(ban_words, options, _TABLES_DIGEST)
+        matcher = self.snapshot.get(key, owner)
+        if matcher is None:
+            matcher = AhoCorasickMatcher(ban_words, **(options or {}))
+            self.snapshot.put(key, matcher, owner)
+        return matcher
+
+    def _swap(self, group_id: str, version: int, matcher: AhoCorasickMatcher) -> bool:
+        """版本号仍然是最新时替换匹配器"""
+        if self.version(group_id) != version:
+            return False
+        self._entries[group_id] = (version, matcher)
+        return True
+
+
+class VerdictCache:
+    """
+    检测结果缓存
+
+    表情转文字、“+1”、复制粘贴的段子等重复消息很多，命中缓存时跳过归一化和扫描。
+    键为 (群号, 匹配器版本号, 原始消息)：群的违禁词变化后版本号改变，旧结果自然不再命中，
+    并按 LRU 淘汰；另外每条结果最多保留 ttl 秒。
+
+    键使用原始消息而不是归一化后的文本，因为命中位置是原文坐标，
+    归一化结果相同的两条原文（如全角/半角不同）位置可能不同。
+    """
+
+    def __init__(self, capacity: int = 4096, ttl: float = 600.0, max_length: int = 200):
+        """
+        Args:
+            capacity: 最多缓存的结果数，为 0 时关闭缓存
+            ttl: 每条结果的有效期（秒）
+            max_length: 超过该长度的消息不缓存（重复出现的通常是短消息）
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_length = max_length
+        self._entries: "OrderedDict[Tuple[str, int, str], Tuple[float, Tuple]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def cacheable(self, message: str) -> bool:
+        return self.capacity > 0 and len(message) <= self.max_length
+
+    def get(self, group_id: str, version: int, message: str) -> Optional[Tuple]:
+        """查找缓存的 (总权重, 违禁词字典, 命中位置元组)，调用方不得修改返回的字典"""
+        key = (group_id, version, message)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, group_id: str, version: int, message: str, result: Tuple):
+        self._entries[(group_id, version, message)] = (time.monotonic() + self.ttl, result)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+# 批量检测时每个工作进程持有的匹配器，由进程池的 initializer 设置一次
+_worker_matchers: Dict[str, AhoCorasickMatcher] = {}
+
+
+def _init_batch_worker(matchers: Dict[str, AhoCorasickMatcher]):
+    global _worker_matchers
+    _worker_matchers = matchers
+
+
+def _scan_batch(records: List[Tuple[str, str, str]]) -> List[Tuple]:
+    results = []
+    for group_id, user_id, message in records:
+        matcher = _worker_matchers.get(group_id)
+        if matcher is None:
+            # 键为 None 的是未单独配置的群使用的默认匹配器
+            matcher = _worker_matchers.get(None)
+        if matcher is None:
+            results.append((group_id, user_id, 0, {}, []))
+        else:
+            results.append((group_id, user_id, *matcher.scan(message)))
+    return results
+
+
+def iter_scan_parallel(records: Iterable[Tuple[str, str, str]], matchers: Dict[str, AhoCorasickMatcher],
+                       workers: int, chunk_size: int = 1000) -> Iterator[Tuple]:
+    """
+    用进程池批量检测，按输入顺序逐条产出结果
+
+    编译好的匹配器只在进程启动时发送给每个工作进程一次，之后只传输消息本身。
+    同时在途的分块数量有上限，输入可以是很大的流，不会一次读入内存。
+
+    Args:
+        records: (群号, 用户ID, 消息) 的可迭代对象
+        matchers: {群号: 匹配器}，键为 None 的匹配器用于其余的群
+        workers: 工作进程数
+        chunk_size: 每个任务包含的消息条数
+
+    Yields:
+        Tuple[群号, 用户ID, 总权重, 检测到的违禁词字典, 命中位置列表]
+    """
+    iterator = iter(records)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                             initargs=(matchers,)) as pool:
+        pending = deque()
+        while True:
+            while len(pending) < workers * 2:
+                chunk = list(itertools.islice(iterator, chunk_size))
+                if not chunk:
+                    break
+                pending.append(pool.submit(_scan_batch, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
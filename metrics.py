@@ -0,0 +1,195 @@
+# metrics.py
+import bisect
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .storage import atomic_write_text
+
+# 耗时直方图的桶上界（秒）
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+METRIC_PREFIX = "juanjuan_banword"
+
+# 计数器名称及说明
+COUNTERS = {
+    "messages_scanned": "参与违禁词检测的消息数",
+    "hits": "命中违禁词的消息数",
+    "floods": "触发刷屏检测的次数",
+    "raids": "判定为重复内容刷屏的消息数",
+    "recalls": "撤回成功次数",
+    "recall_failures": "撤回失败次数",
+    "bans": "禁言成功次数",
+    "ban_failures": "禁言失败次数",
+}
+
+# 各阶段名称及说明
+STAGES = {
+    "detect": "违禁词与刷屏检测",
+    "recall": "撤回消息（delete_msg）",
+    "score": "更新用户分数",
+    "ban": "禁言（set_group_ban）",
+    "total": "handle_message 整体",
+}
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+class Histogram:
+    """固定桶的耗时直方图，observe 只做一次二分查找和两次加法"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # 最后一个桶为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: "Histogram"):
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, q: float) -> float:
+        """按桶估算分位数，返回命中桶的上界（落在 +Inf 桶时返回最大的有限上界）"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, c in enumerate(self.counts):
+            cumulative += c
+            if cumulative >= rank:
+                return self.bounds[min(i, len(self.bounds) - 1)]
+        return self.bounds[-1]
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+class Metrics:
+    """
+    按群统计的计数器和各阶段耗时直方图
+
+    只在事件循环线程中更新，不加锁。
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._counters: Dict[Tuple[str, str], int] = {}
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        # 由其他模块维护、导出时才读取的全局指标 {名称: (说明, 类型, 取值函数)}
+        self._callbacks: Dict[str, Tuple[str, str, Callable[[], float]]] = {}
+
+    def register(self, name: str, description: str, fn: Callable[[], float], kind: str = "gauge"):
+        """
+        登记一个导出时才读取的全局指标（如缓存命中次数），不占用热路径
+
+        Args:
+            kind: Prometheus 类型，"gauge" 或 "counter"
+        """
+        self._callbacks[name] = (description, kind, fn)
+
+    def inc(self, name: str, group_id: str, value: int = 1):
+        key = (name, group_id)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, stage: str, group_id: str, seconds: float):
+        key = (stage, group_id)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    def counter(self, name: str, group_id: Optional[str] = None) -> int:
+        """获取计数器的值，group_id 为 None 时返回所有群的合计"""
+        if group_id is not None:
+            return self._counters.get((name, group_id), 0)
+        return sum(v for (n, _), v in self._counters.items() if n == name)
+
+    def histogram(self, stage: str, group_id: Optional[str] = None) -> Histogram:
+        """获取阶段耗时直方图，group_id 为 None 时返回所有群合并后的结果"""
+        if group_id is not None:
+            return self._histograms.get((stage, group_id)) or Histogram()
+        merged = Histogram()
+        for (s, _), histogram in self._histograms.items():
+            if s == stage:
+                merged.merge(histogram)
+        return merged
+
+    def summary(self, group_id: Optional[str] = None) -> str:
+        """生成 /banword stats 的文本"""
+        scope = f"群{group_id}" if group_id else "全部群"
+        uptime = int(time.time() - self.started_at)
+        lines = [f"📈 违禁词统计（{scope}，运行 {uptime // 3600}小时{uptime % 3600 // 60}分）"]
+        lines.append("─" * 25)
+        for name, description in COUNTERS.items():
+            lines.append(f"{description}：{self.counter(name, group_id)}")
+        if self._callbacks:
+            lines.append("─" * 25)
+            for description, _, fn in self._callbacks.values():
+                lines.append(f"{description}：{_format_value(fn())}")
+        lines.append("─" * 25)
+        lines.append("阶段耗时（次数 / 平均 / p50 / p95 / p99，毫秒）：")
+        for stage, description in STAGES.items():
+            h = self.histogram(stage, group_id)
+            if not h.count:
+                continue
+            lines.append(
+                f"{description}：{h.count} / {h.mean * 1000:.2f} / {h.quantile(0.5) * 1000:.2f}"
+                f" / {h.quantile(0.95) * 1000:.2f} / {h.quantile(0.99) * 1000:.2f}"
+            )
+        return "\n".join(lines)
+
+    def render_prometheus(self) -> str:
+        """按 Prometheus 文本格式导出全部指标（与更新一样只能在事件循环线程中调用）"""
+        lines: List[str] = []
+        for name, description in COUNTERS.items():
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} counter")
+            for (n, group_id), value in sorted(self._counters.items()):
+                if n == name:
+                    lines.append(f'{metric}{{group="{group_id}"}} {value}')
+
+        for name, (description, kind, fn) in self._callbacks.items():
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {fn()}")
+
+        metric = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines.append(f"# HELP {metric} 消息处理各阶段耗时")
+        lines.append(f"# TYPE {metric} histogram")
+        for (stage, group_id), h in sorted(self._histograms.items()):
+            labels = f'stage="{stage}",group="{group_id}"'
+            cumulative = 0
+            for bound, c in zip(h.bounds, h.counts):
+                cumulative += c
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {h.count}')
+            lines.append(f"{metric}_sum{{{labels}}} {h.sum}")
+            lines.append(f"{metric}_count{{{labels}}} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str):
+        """
+        把 Prometheus 文本原子写入文件（供 node_exporter textfile collector 读取）
+
+        生成文本需要在事件循环线程中进行；不想在事件循环中等待写盘时，
+        先调用 render_prometheus()，再把得到的文本交给线程池写入。
+        """
+        atomic_write_text(path, self.render_prometheus())
@@ -0,0 +1,148 @@
+# normalize.py
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+# 常用繁体字 -> 简体字（每两个字符一组：繁体在前，简体在后），随插件分发，无需联网或额外依赖
+_T2S_PAIRS = (
+    "萬万 與与 專专 業业 叢丛 東东 絲丝 兩两 嚴严 喪丧 個个 豐丰 臨临 為为 麗丽 舉举 麼么 義义 烏乌 樂乐 喬乔 習习 鄉乡 書书 買买 亂乱 爭争 "
+    "於于 虧亏 雲云 亞亚 產产 畝亩 親亲 億亿 僅仅 從从 侖仑 倉仓 儀仪 們们 價价 眾众 衆众 優优 會会 傘伞 偉伟 傳传 傷伤 倫伦 偽伪 體体 餘余 "
+    "傭佣 俠侠 侶侣 偵侦 側侧 僑侨 儂侬 係系 債债 傾倾 償偿 儼俨 兒儿 黨党 蘭兰 關关 興兴 茲兹 養养 獸兽 內内 岡冈 冊册 寫写 軍军 農农 馮冯 "
+    "衝冲 決决 況况 凍冻 淨净 淒凄 涼凉 減减 湊凑 凜凛 幾几 鳳凤 憑凭 凱凯 擊击 鑿凿 劃划 劉刘 則则 剛刚 創创 刪删 別别 劍剑 劑剂 勸劝 辦办 "
+    "務务 動动 勵励 勁劲 勞劳 勢势 勳勋 勻匀 區区 醫医 華华 協协 單单 賣卖 盧卢 鹵卤 臥卧 衛卫 卻却 廠厂 廳厅 曆历 歷历 厲厉 壓压 厭厌 廁厕 "
+    "廂厢 廈厦 廚厨 縣县 參参 雙双 發发 髮发 變变 敘叙 疊叠 葉叶 號号 嘆叹 嚇吓 呂吕 嗎吗 噸吨 聽听 啟启 吳吴 嘔呕 員员 嗆呛 嗚呜 詠咏 嚨咙 "
+    "響响 啞哑 噠哒 嘩哗 喲哟 嘮唠 喚唤 嘖啧 嘯啸 噴喷 嘍喽 噓嘘 囑嘱 嚕噜 囂嚣 囉啰 團团 園园 圍围 圖图 圓圆 聖圣 場场 壞坏 塊块 堅坚 壇坛 "
+    "壩坝 墳坟 墜坠 壟垄 壘垒 墾垦 墊垫 塹堑 墮堕 壺壶 殼壳 聲声 處处 備备 復复 複复 夠够 頭头 誇夸 夾夹 奪夺 奮奋 獎奖 妝妆 婦妇 媽妈 婁娄 "
+    "嬌娇 娛娱 嫻娴 嬰婴 嬸婶 孫孙 學学 寧宁 寶宝 實实 寵宠 審审 憲宪 宮宫 寬宽 賓宾 寢寝 對对 尋寻 導导 壽寿 將将 爾尔 塵尘 嘗尝 堯尧 尷尴 "
+    "屍尸 盡尽 儘尽 層层 屜屉 屆届 屬属 屢屡 嶼屿 歲岁 豈岂 崗岗 島岛 嶺岭 峽峡 崢峥 巒峦 嶄崭 巔巅 鞏巩 幣币 帥帅 師师 帳帐 賬账 簾帘 幟帜 "
+    "帶带 幫帮 莊庄 慶庆 廬庐 庫库 應应 廟庙 龐庞 廢废 開开 異异 棄弃 張张 彌弥 彎弯 彈弹 強强 歸归 當当 噹当 錄录 彥彦 徹彻 徑径 憶忆 懺忏 "
+    "憂忧 懷怀 態态 慫怂 憐怜 總总 戀恋 懇恳 惡恶 噁恶 惱恼 悅悦 懸悬 憫悯 驚惊 懼惧 慘惨 懲惩 愜惬 慚惭 慣惯 憤愤 願愿 懾慑 戰战 戲戏 戶户 "
+    "拋抛 撫抚 搶抢 護护 報报 擔担 擬拟 攏拢 擁拥 攔拦 擰拧 撥拨 擇择 掛挂 摯挚 撻挞 挾挟 撓挠 擋挡 掙挣 擠挤 揮挥 撈捞 損损 撿捡 換换 搗捣 "
+    "據据 擄掳 擲掷 摻掺 攬揽 攙搀 擱搁 摟搂 攪搅 攜携 攝摄 擺摆 搖摇 攤摊 撐撑 擾扰 敵敌 斂敛 數数 齋斋 鬥斗 斬斩 斷断 無无 舊旧 時时 曠旷 "
+    "曇昙 晝昼 顯显 晉晋 曬晒 曉晓 暈晕 暉晖 暫暂 術术 樸朴 機机 殺杀 雜杂 權权 條条 來来 楊杨 傑杰 極极 構构 樞枢 棗枣 槍枪 楓枫 梟枭 櫃柜 "
+    "檸柠 柵栅 標标 棧栈 棟栋 欄栏 樹树 棲栖 樣样 檔档 橋桥 樺桦 槳桨 樁桩 夢梦 檢检 樓楼 欖榄 檳槟 橫横 櫻樱 櫥橱 簷檐 歡欢 歐欧 殲歼 殘残 "
+    "殯殡 毆殴 毀毁 畢毕 斃毙 氈毡 氣气 氫氢 匯汇 彙汇 漢汉 湯汤 溝沟 沒没 瀝沥 淪沦 滄沧 滬沪 濘泞 淚泪 瀉泻 潑泼 澤泽 潔洁 灑洒 窪洼 淺浅 "
+    "漿浆 澆浇 濁浊 測测 濟济 瀏浏 渾浑 濃浓 濤涛 澇涝 渦涡 滌涤 潤润 澗涧 漲涨 澀涩 澱淀 淵渊 漬渍 漸渐 漁渔 滲渗 溫温 遊游 灣湾 濕湿 潰溃 "
+    "濺溅 滿满 濾滤 濫滥 濱滨 灘滩 瀟潇 潛潜 瀾澜 瀕濒 滅灭 燈灯 靈灵 災灾 燦灿 爐炉 燉炖 點点 煉炼 鍊炼 熾炽 爍烁 爛烂 燭烛 煙烟 煩烦 燒烧 "
+    "燴烩 燙烫 熱热 煥焕 愛爱 爺爷 牽牵 犧牺 狀状 猶犹 狽狈 獰狞 獨独 狹狭 獅狮 獄狱 獵猎 豬猪 貓猫 獻献 瑪玛 環环 現现 璽玺 瓏珑 瑣琐 瓊琼 "
+    "瑤瑶 電电 畫画 暢畅 療疗 瘡疮 瘋疯 癢痒 癡痴 癒愈 癱瘫 癮瘾 皺皱 盞盏 鹽盐 監监 蓋盖 盜盗 盤盘 睜睁 瞞瞒 矚瞩 矯矫 礦矿 碼码 磚砖 硯砚 "
+    "礎础 碩硕 確确 鹼碱 礙碍 磯矶 禮礼 禍祸 祿禄 禪禅 離离 禿秃 種种 積积 稱称 穢秽 穩稳 穀谷 窮穷 竊窃 竅窍 窯窑 竄窜 窩窝 窺窥 豎竖 競竞 "
+    "篤笃 筍笋 筆笔 籠笼 築筑 篩筛 箏筝 籌筹 簽签 簡简 籃篮 籬篱 類类 粵粤 糞粪 糧粮 緊紧 糾纠 紅红 纖纤 約约 級级 紀纪 緯纬 純纯 紗纱 綱纲 "
+    "納纳 縱纵 紛纷 紙纸 紋纹 紡纺 紐纽 線线 練练 組组 紳绅 細细 織织 終终 絆绊 紹绍 經经 綁绑 絨绒 結结 繞绕 繪绘 給给 絡络 絕绝 絞绞 統统 "
+    "絹绢 繡绣 繼继 績绩 緒绪 續续 綺绮 繩绳 維维 綿绵 繃绷 綢绸 綜综 綻绽 綠绿 綴缀 緬缅 纜缆 緝缉 緞缎 緩缓 締缔 縷缕 編编 緣缘 縛缚 縫缝 "
+    "纏缠 縮缩 網网 羅罗 罰罚 罷罢 羈羁 翹翘 聞闻 聯联 聰聪 聳耸 職职 肅肃 腸肠 膚肤 腎肾 腫肿 脹胀 脅胁 膽胆 勝胜 朧胧 膠胶 脈脉 髒脏 臍脐 "
+    "腦脑 膿脓 腳脚 脫脱 臉脸 臘腊 醃腌 膩腻 騰腾 艦舰 艙舱 艷艳 藝艺 節节 蕪芜 蘆芦 葦苇 蒼苍 蘋苹 莖茎 薦荐 莢荚 蕎荞 薈荟 蕩荡 榮荣 葷荤 "
+    "熒荧 蔭荫 藥药 萊莱 蓮莲 蒔莳 獲获 瑩莹 鶯莺 蘿萝 螢萤 營营 縈萦 蕭萧 薩萨 蔥葱 蔣蒋 藍蓝 薊蓟 驀蓦 薔蔷 藹蔼 蘊蕴 蘚藓 虜虏 慮虑 蟲虫 "
+    "蝦虾 雖虽 螞蚂 蠶蚕 蝕蚀 蟻蚁 蠅蝇 蟬蝉 蠍蝎 蠟蜡 蠻蛮 銜衔 補补 襯衬 襖袄 襪袜 襲袭 裝装 褲裤 見见 觀观 規规 覓觅 視视 覽览 覺觉 覬觊 "
+    "覷觑 觸触 計计 訂订 認认 譏讥 討讨 讓让 訓训 議议 訊讯 記记 講讲 諱讳 訝讶 許许 論论 訟讼 諷讽 設设 訪访 訣诀 證证 評评 詛诅 識识 詐诈 "
+    "訴诉 診诊 詞词 譯译 試试 詩诗 誠诚 話话 誕诞 詭诡 詢询 該该 詳详 詫诧 誡诫 誣诬 語语 誤误 誘诱 說说 誦诵 請请 諸诸 諾诺 讀读 誹诽 課课 "
+    "誰谁 調调 諒谅 談谈 誼谊 謀谋 諜谍 謊谎 諧谐 謂谓 諭谕 諮谘 諺谚 謎谜 謝谢 謠谣 謗谤 謙谦 謹谨 謾谩 譜谱 譴谴 譚谭 貝贝 貞贞 負负 貢贡 "
+    "財财 責责 賢贤 敗败 貨货 質质 販贩 貪贪 貧贫 貶贬 購购 貯贮 貫贯 貳贰 賤贱 貼贴 貴贵 貸贷 貿贸 費费 賀贺 賊贼 賈贾 賄贿 賃赁 賂赂 贓赃 "
+    "資资 賦赋 賭赌 贖赎 賞赏 賜赐 賠赔 賴赖 賺赚 賽赛 贊赞 讚赞 贈赠 贏赢 趙赵 趕赶 趨趋 躍跃 跡迹 蹟迹 踐践 蹤踪 軀躯 車车 軌轨 軒轩 轉转 "
+    "輪轮 軟软 轟轰 軸轴 輕轻 載载 轎轿 較较 輔辅 輛辆 輩辈 輝辉 輯辑 輸输 轄辖 辭辞 辯辩 遼辽 達达 遷迁 過过 邁迈 運运 還还 這这 進进 遠远 "
+    "違违 連连 遲迟 適适 選选 遜逊 遞递 邏逻 遺遗 遙遥 鄧邓 郵邮 鄰邻 鬱郁 鄭郑 醞酝 醬酱 釀酿 釋释 裏里 裡里 鑒鉴 針针 釘钉 釣钓 鈍钝 鈔钞 "
+    "鐘钟 鍾钟 鋼钢 鑰钥 欽钦 鈞钧 鉤钩 鈕钮 錢钱 鉗钳 鑽钻 鐵铁 鈴铃 鉛铅 銅铜 鋁铝 銘铭 鏈链 銷销 鎖锁 鋤锄 鍋锅 銹锈 鋒锋 鋪铺 銳锐 錯错 "
+    "錦锦 鍵键 鋸锯 錘锤 鍛锻 鎮镇 鏡镜 鑲镶 長长 門门 閃闪 閉闭 問问 闖闯 閑闲 閒闲 間间 悶闷 閘闸 鬧闹 閨闺 閱阅 閣阁 闊阔 隊队 陽阳 陰阴 "
+    "陣阵 階阶 際际 陸陆 隴陇 陳陈 險险 隨随 隱隐 隸隶 難难 雛雏 雞鸡 靂雳 霧雾 靚靓 靜静 韓韩 韋韦 頁页 頂顶 項项 順顺 須须 頑顽 顧顾 頓顿 "
+    "頒颁 頌颂 預预 領领 頗颇 頸颈 頰颊 頻频 頹颓 穎颖 顆颗 題题 顏颜 額额 顛颠 顫颤 風风 颱台 臺台 檯台 颳刮 飄飘 飛飞 飢饥 饑饥 飯饭 飲饮 "
+    "飼饲 飽饱 飾饰 餃饺 餅饼 餓饿 館馆 饅馒 饒饶 饞馋 餵喂 馬马 馴驯 馳驰 驅驱 駁驳 驢驴 駛驶 駐驻 駝驼 駕驾 罵骂 駱骆 駭骇 騎骑 驗验 騙骗 "
+    "騷骚 驟骤 骯肮 髏髅 鬢鬓 魚鱼 魯鲁 鮮鲜 鯉鲤 鯨鲸 鱷鳄 鳥鸟 鴉鸦 鴨鸭 鴿鸽 鵝鹅 鵬鹏 鶴鹤 鷹鹰 鸚鹦 鴻鸿 麥麦 麵面 黃黄 黴霉 齊齐 齒齿 "
+    "齡龄 龍龙 龜龟 國国 後后 幹干 隻只 鬆松 廣广 邊边 夥伙 醜丑 蘇苏 劇剧 傢家 薑姜 鹹咸 嚮向 捲卷 週周 纔才 佈布 併并 準准 託托 迴回 徵征 "
+    "慾欲 佔占 鬍胡 範范 樑梁 註注 繫系 製制 羣群 囪囱 "
+)
+
+# 零宽字符、软连字符、双向控制符、变体选择符等不可见字符，检测前直接删除
+_INVISIBLE_CHARS = (
+    "\u00ad\u034f\u061c\u115f\u1160\u17b4\u17b5\u180e"
+    "\u200b\u200c\u200d\u200e\u200f\u202a\u202b\u202c\u202d\u202e"
+    "\u2060\u2061\u2062\u2063\u2064\u2066\u2067\u2068\u2069"
+    "\u3164\ufe00\ufe01\ufe02\ufe03\ufe04\ufe05\ufe06\ufe07"
+    "\ufe08\ufe09\ufe0a\ufe0b\ufe0c\ufe0d\ufe0e\ufe0f\ufeff\uffa0"
+)
+_INVISIBLE_RE = re.compile(f"[{_INVISIBLE_CHARS}]+")
+
+
+def _build_table() -> Dict[int, Optional[str]]:
+    """
+    构建 str.translate 使用的归一化表（导入时只构建一次）
+
+    依次处理：删除不可见字符 -> 全角转半角 -> 转小写 -> 繁体转简体。
+    除删除外都是一个字符对应一个字符，保证位置可以映射回原文。
+    """
+    t2s = {pair[0]: pair[1] for pair in _T2S_PAIRS.split()}
+    table: Dict[int, Optional[str]] = {}
+    for code in range(0x10000):
+        ch = chr(code)
+        if 0xFF01 <= code <= 0xFF5E:
+            mapped = chr(code - 0xFEE0)
+        elif code == 0x3000:
+            mapped = " "
+        else:
+            mapped = ch
+        lower = mapped.lower()
+        if len(lower) == 1:
+            mapped = lower
+        mapped = t2s.get(mapped, mapped)
+        if mapped != ch:
+            table[code] = mapped
+    for ch in _INVISIBLE_CHARS:
+        table[ord(ch)] = None
+    return table
+
+
+_TABLE = _build_table()
+
+
+def table_digest() -> str:
+    """归一化表的摘要，表的内容（插件升级、Python 的 Unicode 版本不同）变化时随之变化"""
+    data = repr(sorted(_TABLE.items())).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class NormalizedText:
+    """
+    归一化后的消息
+
+    text 为归一化后的文本；offsets[i] 为 text 第 i 个字符在原文中的位置，
+    原文没有被删除任何字符时 offsets 为 None（位置一一对应）。
+    """
+
+    __slots__ = ("original", "text", "offsets")
+
+    def __init__(self, original: str, text: str, offsets: Optional[List[int]]):
+        self.original = original
+        self.text = text
+        self.offsets = offsets
+
+    def to_original(self, start: int, end: int) -> Tuple[int, int]:
+        """把归一化文本中的 [start, end) 映射回原文位置"""
+        offsets = self.offsets
+        if offsets is None or end <= start:
+            return start, end
+        return offsets[start], offsets[end - 1] + 1
+
+
+def normalize_word(word: str) -> str:
+    """归一化违禁词（构建匹配器时使用）"""
+    return word.translate(_TABLE)
+
+
+def normalize(message: str) -> NormalizedText:
+    """
+    归一化消息，每条消息只执行一次
+
+    Returns:
+        NormalizedText，附带从归一化文本到原文的位置映射
+    """
+    text = message.translate(_TABLE)
+    if len(text) == len(message):
+        return NormalizedText(message, text, None)
+
+    # 有不可见字符被删除，按被删除的片段分段生成位置映射
+    offsets: List[int] = []
+    pos = 0
+    for m in _INVISIBLE_RE.finditer(message):
+        offsets.extend(range(pos, m.start()))
+        pos = m.end()
+    offsets.extend(range(pos, len(message)))
+    return NormalizedText(message, text, offsets)
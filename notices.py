@@ -0,0 +1,94 @@
+# notices.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from astrbot.api import logger
+
+
+class PendingNotice:
+    """一个用户在当前窗口内累计的违规记录"""
+
+    __slots__ = ("group_id", "user_id", "detected_words", "weight", "violations", "score", "bot", "_timer")
+
+    def __init__(self, group_id: str, user_id: str, bot: Any):
+        self.group_id = group_id
+        self.user_id = user_id
+        self.detected_words: Dict[str, int] = {}
+        self.weight = 0
+        self.violations = 0
+        self.score = 0
+        self.bot = bot
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def merge(self, detected_words: Dict[str, int], weight: int, score: int):
+        for word, count in detected_words.items():
+            self.detected_words[word] = self.detected_words.get(word, 0) + count
+        self.weight += weight
+        self.violations += 1
+        self.score = score
+
+
+class NoticeAggregator:
+    """
+    按 (群号, 用户ID) 合并违规提示
+
+    窗口内的第一条违规开始计时，窗口结束时把这段时间内的违规合并成一条提示发出，
+    违规词次数累加，分数取最后一次的值。撤回等处理不受影响，仍然立即执行。
+    """
+
+    def __init__(self, window: float, send_fn: Callable[[PendingNotice], Awaitable[None]]):
+        """
+        Args:
+            window: 合并窗口（秒）
+            send_fn: 发送合并后提示的协程函数
+        """
+        self.window = window
+        self._send_fn = send_fn
+        self._pending: Dict[Tuple[str, str], PendingNotice] = {}
+        self._tasks = set()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, group_id: str, user_id: str, bot: Any, detected_words: Dict[str, int],
+            weight: int, score: int) -> PendingNotice:
+        """记录一次违规，窗口内第一次违规时安排发送"""
+        key = (group_id, user_id)
+        notice = self._pending.get(key)
+        if notice is None:
+            notice = self._pending[key] = PendingNotice(group_id, user_id, bot)
+            notice._timer = asyncio.get_running_loop().call_later(self.window, self._fire, key)
+        notice.bot = bot
+        notice.merge(detected_words, weight, score)
+        return notice
+
+    def pop(self, group_id: str, user_id: str) -> Optional[PendingNotice]:
+        """取出尚未发送的记录并取消定时发送（例如用户被禁言时并入禁言提示）"""
+        notice = self._pending.pop((group_id, user_id), None)
+        if notice is not None and notice._timer is not None:
+            notice._timer.cancel()
+        return notice
+
+    def _fire(self, key: Tuple[str, str]):
+        notice = self._pending.pop(key, None)
+        if notice is None:
+            return
+        task = asyncio.get_running_loop().create_task(self._send(notice))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, notice: PendingNotice):
+        try:
+            await self._send_fn(notice)
+        except Exception as e:
+            logger.error(f"发送群{notice.group_id}用户{notice.user_id}的违规提示失败：{e}")
+
+    async def close(self):
+        """立即发出所有尚未发送的提示，并等待发送完成"""
+        for key in list(self._pending):
+            notice = self.pop(*key)
+            task = asyncio.get_running_loop().create_task(self._send(notice))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
@@ -0,0 +1,425 @@
+# patterns.py
+import re
+import time
+from typing import Dict, Iterator, List, Tuple
+
+try:
+    from re import _compiler as _sre_compile, _parser as _sre_parse
+except ImportError:  # Python < 3.11
+    import sre_compile as _sre_compile
+    import sre_parse as _sre_parse
+
+from .normalize import normalize_word
+
+# 模式规则与普通违禁词存放在同一个 {违禁词: 权重} 字典中，以前缀区分：
+# "re:" 后面是正则表达式，"wc:" 后面是通配符（* 匹配任意几个字符，? 匹配一个字符）
+REGEX_PREFIX = "re:"
+WILDCARD_PREFIX = "wc:"
+
+# 规则本身的最大长度
+MAX_PATTERN_LENGTH = 200
+# {m,n} 形式的量词允许的最大上限
+MAX_REPEAT_BOUND = 100
+# 通配符 * 最多匹配的字符数
+WILDCARD_MAX_GAP = 8
+# 同一串联中可以争抢相同字符的有界量词，其可选次数之积的上限（例如最多 3 个通配符 *）
+MAX_AMBIGUITY = 1000
+# 模式扫描只检查归一化后消息的前若干个字符，保证单次扫描的最坏耗时有上限
+MAX_SCAN_LENGTH = 1000
+# 模式扫描按窗口推进，每个窗口之后检查一次时间预算。每次搜索只看到窗口之后再多 SCAN_WINDOW 个字符，
+# 所以单个命中的长度有上限：不超过 SCAN_WINDOW 的命中一定能找到，更长的（例如 a.*b 跨越很长一段）
+# 要从起点所在窗口的开头算起不超过 2 × SCAN_WINDOW（约 256）个字符，否则会漏检
+SCAN_WINDOW = 128
+# 每条消息的模式扫描时间预算（秒），超出后停止扫描，已找到的命中仍然有效
+SCAN_BUDGET = 0.005
+
+_REPEATS = {_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT}
+if hasattr(_sre_parse, "POSSESSIVE_REPEAT"):
+    _REPEATS.add(_sre_parse.POSSESSIVE_REPEAT)
+_BACKREFS = {_sre_parse.GROUPREF, _sre_parse.GROUPREF_EXISTS}
+_SINGLE_CHARS = {_sre_parse.LITERAL, _sre_parse.NOT_LITERAL, _sre_parse.ANY, _sre_parse.IN}
+_ATOMIC_GROUP = getattr(_sre_parse, "ATOMIC_GROUP", None)
+_LEADING_FLAGS = re.compile(r"\(\?([aiLmsux]+)\)")
+# 判断字符集是否相交时使用的采样字符，另外加上规则中出现的字面字符和范围端点
+_SAMPLE_CHARS = "".join(map(chr, range(128))) + "\u00a0\u3000\u00b5\u00df\u0663\u4e00\u9fa5中文字"
+
+
+def is_pattern(word: str) -> bool:
+    """是否为模式规则"""
+    return word.startswith(REGEX_PREFIX) or word.startswith(WILDCARD_PREFIX)
+
+
+def rule_key(word: str) -> str:
+    """
+    判断两条规则是否相同时使用的键
+
+    普通违禁词按归一化结果比较；模式规则区分大小写（\\d 和 \\D 含义不同），按原文比较。
+    """
+    return word if is_pattern(word) else normalize_word(word)
+
+
+def _wildcard_to_regex(body: str) -> str:
+    # 首尾的 * 对子串匹配没有意义，连续的 * 合并为一个
+    body = re.sub(r"\*+", "*", body.strip("*"))
+    parts = []
+    for ch in body:
+        if ch == "*":
+            parts.append(f".{{0,{WILDCARD_MAX_GAP}}}?")
+        elif ch == "?":
+            parts.append(".")
+        else:
+            parts.append(re.escape(ch))
+    return "".join(parts)
+
+
+def _scope_inline_flags(source: str) -> str:
+    """
+    把开头的全局内联标志改写为只作用于本规则的分组，例如 (?i)foo -> (?i:foo)
+
+    合并编译时每条规则包在一个命名分组里，全局标志不在整个正则的开头会报错。
+    """
+    flags = ""
+    m = _LEADING_FLAGS.match(source)
+    while m:
+        flags += m.group(1)
+        source = source[m.end():]
+        m = _LEADING_FLAGS.match(source)
+    if not flags:
+        return source
+    # 分组结束的 ) 另起一行，避免 (?x) 模式下被规则末尾的 # 注释吃掉
+    return f"(?{flags}:{source}\n)" if "x" in flags else f"(?{flags}:{source})"
+
+
+def _check_tree(items, in_repeat: bool = False):
+    """
+    遍历正则的语法树，拒绝可能出现灾难性回溯的结构
+
+    - 可以重复多次的量词里又套了可以重复多次的量词，例如 (a+)+
+    - 可以重复多次的量词里有分支，例如 (a|ab)*
+    - 可以重复多次、但本身可以匹配空串的量词，例如 (a?)*
+    - 反向引用（无法保证线性时间）
+    """
+    for op, av in items:
+        if op in _BACKREFS:
+            raise ValueError("不支持反向引用")
+        if op in _REPEATS:
+            low, high, body = av
+            if high != _sre_parse.MAXREPEAT and high > MAX_REPEAT_BOUND:
+                raise ValueError(f"量词上限不能超过{MAX_REPEAT_BOUND}")
+            repeats = high > 1
+            if repeats and in_repeat:
+                raise ValueError("不允许嵌套的量词，例如 (a+)+")
+            if repeats and body.getwidth()[0] == 0:
+                raise ValueError("量词内的内容不能匹配空字符串")
+            _check_tree(body, in_repeat or repeats)
+        elif op == _sre_parse.BRANCH:
+            if in_repeat:
+                raise ValueError("量词内不允许使用 | 分支，例如 (a|ab)*")
+            for branch in av[1]:
+                _check_tree(branch, in_repeat)
+        elif op == _sre_parse.SUBPATTERN:
+            _check_tree(av[-1], in_repeat)
+        elif op in (_sre_parse.ASSERT, _sre_parse.ASSERT_NOT):
+            _check_tree(av[1], in_repeat)
+        elif op == getattr(_sre_parse, "ATOMIC_GROUP", None):
+            _check_tree(av, in_repeat)
+
+
+class _OverlapChecker:
+    """
+    检查同一串联中的可变长度量词是否会争抢相同的字符
+
+    两个可变长度的量词之间如果没有一个必须出现、且与二者都不相交的字符把它们隔开，
+    例如 \\d+\\d+、\\s*\\s*!、.*a.*，正则引擎在匹配失败时要尝试所有的分配方式，
+    耗时随消息长度多项式增长。无上限的量词不允许出现这种情况；
+    上限较小的量词（例如通配符 *）允许，但可选次数之积不能超过 MAX_AMBIGUITY。
+
+    例外：两个无上限的量词之间隔着一个与二者都不相交的可选单字符时（例如 qq\\s*[:：]?\\s*\\d+），
+    如果规则以必须出现的字符开头，允许出现一对。这时只有开头字符出现的位置才会展开尝试，
+    每次尝试的分配方式与二者共同可匹配的那段字符长度的平方相关，而扫描窗口限制了这段长度。
+
+    字符集是否相交按采样字符近似判断。
+    """
+
+    def __init__(self, tree):
+        self.state = tree.state
+        sample = set(_SAMPLE_CHARS)
+        self._collect_literals(tree, sample)
+        self.sample = "".join(sorted(sample))
+        self._chars: Dict[str, frozenset] = {}
+        self._anchored = self._starts_with_char(tree)
+        self._bridged: List[tuple] = []   # [(无上限量词, 它后面与它不相交的可选单字符的字符集)]
+        self._paired = False
+
+    def _collect_literals(self, items, sample: set):
+        for op, av in items:
+            if op in (_sre_parse.LITERAL, _sre_parse.NOT_LITERAL):
+                sample.add(chr(av))
+            elif op == _sre_parse.IN:
+                for sub_op, sub_av in av:
+                    if sub_op == _sre_parse.RANGE:
+                        sample.update((chr(sub_av[0]), chr(sub_av[1])))
+                    elif sub_op == _sre_parse.LITERAL:
+                        sample.add(chr(sub_av))
+            else:
+                for child in self._children(op, av):
+                    self._collect_literals(child, sample)
+
+    @staticmethod
+    def _children(op, av) -> list:
+        """复合节点包含的子序列"""
+        if op in _REPEATS:
+            return [av[2]]
+        if op == _sre_parse.SUBPATTERN:
+            return [av[-1]]
+        if op == _sre_parse.BRANCH:
+            return list(av[1])
+        if op in (_sre_parse.ASSERT, _sre_parse.ASSERT_NOT):
+            return [av[1]]
+        if op == _ATOMIC_GROUP:
+            return [av]
+        return []
+
+    def _item_chars(self, op, av) -> frozenset:
+        """单个字符节点能匹配的采样字符"""
+        key = f"{op}:{av!r}"
+        chars = self._chars.get(key)
+        if chars is None:
+            compiled = _sre_compile.compile(_sre_parse.SubPattern(self.state, [(op, av)]), re.IGNORECASE)
+            chars = self._chars[key] = frozenset(ch for ch in self.sample if compiled.fullmatch(ch))
+        return chars
+
+    def chars(self, items) -> frozenset:
+        """items 中任意位置可能匹配的字符（断言内的除外）"""
+        result = set()
+        for op, av in items:
+            if op in _SINGLE_CHARS:
+                result |= self._item_chars(op, av)
+            elif op not in (_sre_parse.ASSERT, _sre_parse.ASSERT_NOT):
+                for child in self._children(op, av):
+                    result |= self.chars(child)
+        return frozenset(result)
+
+    @staticmethod
+    def _starts_with_char(items) -> bool:
+        """串联是否以必须出现的单个字符开头"""
+        for op, av in items:
+            if op in _SINGLE_CHARS:
+                return True
+            if op in (_sre_parse.SUBPATTERN, _ATOMIC_GROUP):
+                return _OverlapChecker._starts_with_char(_OverlapChecker._children(op, av)[0])
+            return False
+        return False
+
+    @staticmethod
+    def _is_elastic(items) -> bool:
+        """items 中是否有可变长度的量词"""
+        for op, av in items:
+            if op in _REPEATS and av[1] > av[0]:
+                return True
+            if op not in (_sre_parse.ASSERT, _sre_parse.ASSERT_NOT) and any(
+                    _OverlapChecker._is_elastic(child) for child in _OverlapChecker._children(op, av)):
+                return True
+        return False
+
+    def check(self, items):
+        """检查一个串联，发现问题时抛出 ValueError"""
+        self._walk(items, [])
+
+    def _walk(self, items, pending: list) -> list:
+        """
+        Args:
+            items: 串联中的节点
+            pending: 尚未被隔开的可变长度量词 [(字符集, 是否无上限, 可选次数)]
+
+        Returns:
+            处理完 items 之后尚未被隔开的量词
+        """
+        for op, av in items:
+            if op in _SINGLE_CHARS:
+                pending = self._separate(pending, self._item_chars(op, av))
+            elif op in _REPEATS:
+                low, high, body = av
+                if high == low:
+                    if low:
+                        pending = self._walk(body, pending)
+                    continue
+                self.check(body)
+                chars = self.chars(body)
+                unbounded = high == _sre_parse.MAXREPEAT or high - low > WILDCARD_MAX_GAP
+                pending = self._add(pending, chars, unbounded, 1 if unbounded else high - low + 1)
+                if low:
+                    pending = self._separate(pending, chars, keep=pending[-1])
+                elif high == 1 and body.getwidth() == (1, 1):
+                    # 可选的单个字符，记下它前面与它不相交的无上限量词
+                    self._bridged += [(entry, chars) for entry in pending[:-1] if entry[1] and not entry[0] & chars]
+            elif op == _sre_parse.BRANCH:
+                for branch in av[1]:
+                    self.check(branch)
+                chars = self.chars([(op, av)])
+                if self._is_elastic([(op, av)]):
+                    # 分支内有量词时不再细分，按无上限的量词处理
+                    pending = self._add(pending, chars, True, 1)
+                elif all(branch.getwidth()[0] > 0 for branch in av[1]):
+                    pending = self._separate(pending, chars)
+            elif op in (_sre_parse.SUBPATTERN, _ATOMIC_GROUP):
+                pending = self._walk(self._children(op, av)[0], pending)
+            elif op in (_sre_parse.ASSERT, _sre_parse.ASSERT_NOT):
+                self.check(av[1])
+        return pending
+
+    @staticmethod
+    def _separate(pending: list, chars: frozenset, keep=None) -> list:
+        """一个必须出现的字符把与它不相交的量词隔开"""
+        return [entry for entry in pending if entry is keep or entry[0] & chars]
+
+    def _add(self, pending: list, chars: frozenset, unbounded: bool, size: int) -> list:
+        ambiguity = size
+        for entry in pending:
+            other_chars, other_unbounded, other_size = entry
+            if not other_chars & chars:
+                continue
+            if unbounded and other_unbounded and self._may_pair(entry, chars):
+                self._paired = True
+                continue
+            if unbounded or other_unbounded:
+                raise ValueError("相邻的量词可以匹配相同的字符（例如 \\d+\\d+、.*a.*），可能导致大量回溯")
+            ambiguity *= other_size
+        if ambiguity > MAX_AMBIGUITY:
+            raise ValueError("可以匹配相同字符的量词或通配符 * 过多，可能导致大量回溯")
+        return pending + [(chars, unbounded, size)]
+
+    def _may_pair(self, entry: tuple, chars: frozenset) -> bool:
+        """两个无上限的量词能否作为隔着可选单字符的一对放行（见类说明）"""
+        if self._paired or not self._anchored:
+            return False
+        # 中间的可选字符也要与后一个量词不相交
+        return any(bridged is entry and not bridge & chars for bridged, bridge in self._bridged)
+
+def compile_rule(word: str) -> str:
+    """
+    把模式规则转换为正则表达式源码，并检查是否安全
+
+    Args:
+        word: 以 re: 或 wc: 开头的规则
+
+    Returns:
+        正则表达式源码（匹配时忽略大小写，针对归一化后的消息）
+
+    Raises:
+        ValueError: 规则无效或可能出现灾难性回溯
+    """
+    if len(word) > MAX_PATTERN_LENGTH:
+        raise ValueError(f"规则超过{MAX_PATTERN_LENGTH}个字符")
+    if word.startswith(WILDCARD_PREFIX):
+        source = _wildcard_to_regex(word[len(WILDCARD_PREFIX):])
+    else:
+        source = word[len(REGEX_PREFIX):]
+    if not source:
+        raise ValueError("规则为空")
+    source = _scope_inline_flags(source)
+    try:
+        tree = _sre_parse.parse(source)
+        # 合并成一个大正则时每条规则包在一个命名分组里，这里提前确认可以这样组合
+        compiled = re.compile(f"(?P<p0>{source})", re.IGNORECASE)
+    except re.error as e:
+        raise ValueError(f"正则表达式无效：{e}")
+    if compiled.groupindex.keys() != {"p0"}:
+        raise ValueError("不支持命名分组")
+    _check_tree(tree)
+    _OverlapChecker(tree).check(tree)
+    if compiled.fullmatch(""):
+        raise ValueError("规则不能匹配空字符串")
+    return source
+
+
+def validate_rule(word: str):
+    """添加规则前调用，普通违禁词直接通过，无效的模式规则抛出 ValueError"""
+    if is_pattern(word):
+        compile_rule(word)
+
+
+class PatternSet:
+    """
+    一组模式规则合并编译成的单个正则
+
+    所有规则拼接成 (?P<p0>...)|(?P<p1>...)|... 的一个分支，每条消息只需扫描一遍，
+    而不是每条规则各扫描一遍；从 match.lastgroup 得知命中的是哪条规则。
+    同一位置多条规则都能匹配时取排在前面的一条。
+
+    规则在添加时已经过回溯检查（见 _check_tree、_OverlapChecker），每个起始位置的尝试
+    耗时与消息长度至多线性相关。扫描只检查前 max_length 个字符，并按 SCAN_WINDOW 分窗口推进，
+    每个窗口之后检查一次 SCAN_BUDGET 时间预算（没有任何命中的消息也会检查），
+    超时则停止扫描并计入 timeouts。
+
+    窗口带来单个命中的长度上限：长度不超过 SCAN_WINDOW 的命中一定能找到；
+    无上限的规则（例如 a.*b）命中超过约 2 × SCAN_WINDOW 个字符时会漏检，见 SCAN_WINDOW。
+    """
+
+    __slots__ = ("indexes", "rejected", "budget", "max_length", "timeouts", "_regex", "_overlap")
+
+    def __init__(self, rules: List[Tuple[int, str]], budget: float = SCAN_BUDGET,
+                 max_length: int = MAX_SCAN_LENGTH):
+        """
+        Args:
+            rules: [(规则在匹配器中的下标, 规则)]
+            budget: 每条消息的扫描时间预算（秒），0 表示不限制
+            max_length: 每条消息最多扫描的字符数
+        """
+        self.indexes: List[int] = []
+        self.rejected: Dict[str, str] = {}   # 无效规则（例如直接修改了数据文件）不参与匹配
+        self.budget = budget
+        self.max_length = max_length
+        self.timeouts = 0
+        sources = []
+        for index, word in rules:
+            try:
+                source = compile_rule(word)
+            except ValueError as e:
+                self.rejected[word] = str(e)
+                continue
+            sources.append(f"(?P<p{len(self.indexes)}>{source})")
+            self.indexes.append(index)
+        self._regex = None
+        self._overlap = 0
+        if sources:
+            source = "|".join(sources)
+            self._regex = re.compile(source, re.IGNORECASE)
+            # 每个窗口向后多看的字符数：规则的最大匹配长度（无上限时取 SCAN_WINDOW）
+            self._overlap = min(_sre_parse.parse(source).getwidth()[1], SCAN_WINDOW)
+
+    def __len__(self) -> int:
+        return len(self.indexes)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """
+        逐个产出匹配结果，同一条规则的多次出现互不重叠
+
+        Yields:
+            Tuple[起始位置, 结束位置, 规则在匹配器中的下标]
+        """
+        if self._regex is None:
+            return
+        regex, indexes = self._regex, self.indexes
+        length = min(len(text), self.max_length)
+        deadline = time.perf_counter() + self.budget if self.budget > 0 else None
+        pos = 0
+        while pos < length:
+            window_end = min(length, pos + SCAN_WINDOW)
+            endpos = min(length, window_end + self._overlap)
+            m = regex.search(text, pos, endpos)
+            if m is None:
+                pos = window_end
+            else:
+                start = m.start()
+                if endpos < length and (start >= window_end or m.end() >= endpos - 1):
+                    # 命中在窗口之外或触到了搜索范围末尾：在完整范围内重新匹配，避免被截短或误判 $、(?!...)
+                    m = regex.match(text, start, length)
+                if m is not None and start < m.end():
+                    yield start, m.end(), indexes[int(m.lastgroup[1:])]
+                    pos = m.end()
+                else:
+                    pos = start + 1
+            if deadline is not None and time.perf_counter() > deadline:
+                self.timeouts += 1
+                return
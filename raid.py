@@ -0,0 +1,181 @@
+# raid.py
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from .scores import compact_id
+
+_HASH_MASK = (1 << 64) - 1
+
+# MinHash 草图大小：取所有字符二元组哈希中最小的 MINHASH_K 个（bottom-k MinHash）
+MINHASH_K = 16
+# 查找近似内容时最多核对的候选数。刷屏内容总是最近出现的，按从新到旧的顺序核对即可
+MAX_CANDIDATES = 64
+
+
+def minhash(text: str) -> FrozenSet[int]:
+    """
+    计算文本的 bottom-k MinHash 草图（字符二元组集合中哈希最小的 k 个值）
+
+    草图只在进程内比较，特征哈希直接使用内置 hash()；排序在 C 层完成，
+    对短消息比 SimHash 稳定得多。
+    """
+    text = "".join(text.split())
+    if len(text) < 2:
+        return frozenset((hash(text) & _HASH_MASK,))
+    hashes = {hash(text[i:i + 2]) & _HASH_MASK for i in range(len(text) - 1)}
+    return frozenset(sorted(hashes)[:MINHASH_K])
+
+
+def similarity(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    """用两个草图（的集合形式）估算原文字符二元组集合的 Jaccard 相似度"""
+    union = sorted(a | b)[:MINHASH_K]
+    return sum(1 for value in union if value in a and value in b) / len(union)
+
+
+class _Fingerprint:
+    """一段内容在窗口内的发送者记录"""
+
+    __slots__ = ("sketch", "senders", "triggered")
+
+    def __init__(self, sketch: FrozenSet[int]):
+        self.sketch = sketch
+        # {用户ID: (最后发送时间, 消息ID)}，按发送时间排序
+        self.senders: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.triggered = False
+
+
+class _GroupCache:
+    """单个群的指纹 LRU 缓存及 MinHash 草图索引"""
+
+    __slots__ = ("entries", "index")
+
+    def __init__(self):
+        self.entries: "OrderedDict[str, _Fingerprint]" = OrderedDict()
+        # {草图中的哈希值: {指纹键: None}}，dict 保持插入顺序，可以从新到旧遍历
+        self.index: Dict[int, Dict[str, None]] = {}
+
+    def add(self, key: str, entry: _Fingerprint):
+        self.entries[key] = entry
+        for value in entry.sketch:
+            self.index.setdefault(value, {})[key] = None
+
+    def remove_oldest(self):
+        key, entry = self.entries.popitem(last=False)
+        for value in entry.sketch:
+            keys = self.index.get(value)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del self.index[value]
+
+    def find_similar(self, sketch: FrozenSet[int], min_similarity: float) -> Optional[str]:
+        checked = set()
+        for value in sketch:
+            for key in reversed(self.index.get(value, {})):
+                if key in checked:
+                    continue
+                if len(checked) >= MAX_CANDIDATES:
+                    return None
+                checked.add(key)
+                other = self.entries[key].sketch
+                # 估算值不会超过 |A∩B| / max(|A|, |B|)，先用集合交集快速排除
+                if len(other & sketch) < min_similarity * max(len(other), len(sketch)):
+                    continue
+                if similarity(other, sketch) >= min_similarity:
+                    return key
+        return None
+
+
+class RaidDetector:
+    """
+    跨用户重复内容（复制粘贴刷广告）检测
+
+    每个群维护一个容量有限的指纹 LRU：先按内容的精确哈希查找，找不到时用 MinHash
+    草图索引查找近似内容。同一内容在 window 秒内被 min_users 个不同用户发送时判定为刷屏攻击，
+    之后窗口内再发送该内容的用户都会被立即判定。
+    """
+
+    def __init__(self, min_users: int = 3, window: float = 60.0, min_length: int = 8,
+                 capacity: int = 512, min_similarity: float = 0.6, max_senders: int = 64):
+        """
+        Args:
+            min_users: 触发判定的不同用户数，为 0 时关闭检测
+            window: 统计窗口（秒）
+            min_length: 短于该长度的消息不参与检测（避免“哈哈哈”之类误判）
+            capacity: 每个群最多缓存的指纹数
+            min_similarity: 估算的 Jaccard 相似度不低于该值视为近似内容
+            max_senders: 每个指纹最多记录的发送者数
+        """
+        self.min_users = min_users
+        self.window = window
+        self.min_length = min_length
+        self.capacity = capacity
+        self.min_similarity = min_similarity
+        self.max_senders = max_senders
+        self._groups: Dict = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.min_users > 0
+
+    def observe(self, group_id: str, user_id: str, message_id: str, text: str,
+                now: Optional[float] = None) -> Optional[List[Tuple[str, str]]]:
+        """
+        记录一条消息
+
+        Args:
+            text: 归一化后的消息文本
+
+        Returns:
+            未判定为刷屏攻击时返回 None；判定时返回此前发送同一内容、
+            尚未处理的其他用户 [(用户ID, 消息ID)]（可能为空列表）
+        """
+        if self.min_users <= 0 or len(text) < self.min_length:
+            return None
+        now = time.monotonic() if now is None else now
+        gid = compact_id(group_id)
+        cache = self._groups.get(gid)
+        if cache is None:
+            cache = self._groups[gid] = _GroupCache()
+
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        entry = cache.entries.get(key)
+        if entry is None:
+            sketch = minhash(text)
+            similar = cache.find_similar(sketch, self.min_similarity)
+            if similar is not None:
+                key, entry = similar, cache.entries[similar]
+            else:
+                entry = _Fingerprint(sketch)
+                cache.add(key, entry)
+                if len(cache.entries) > self.capacity:
+                    cache.remove_oldest()
+        cache.entries.move_to_end(key)
+
+        senders = entry.senders
+        while senders:
+            oldest_user, (ts, _) = next(iter(senders.items()))
+            if now - ts < self.window:
+                break
+            del senders[oldest_user]
+        if not senders:
+            entry.triggered = False
+        senders.pop(user_id, None)
+        senders[user_id] = (now, message_id)
+        if len(senders) > self.max_senders:
+            senders.popitem(last=False)
+
+        if entry.triggered:
+            return []
+        if len(senders) < self.min_users:
+            return None
+        entry.triggered = True
+        return [(uid, mid) for uid, (_, mid) in senders.items() if uid != user_id]
+
+    def clear(self, group_id: Optional[str] = None):
+        if group_id is None:
+            self._groups.clear()
+        else:
+            self._groups.pop(compact_id(group_id), None)
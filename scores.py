@@ -0,0 +1,215 @@
+# scores.py
+import math
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+
+class ScoreDecay:
+    """
+    用户分数的时间衰减模型
+
+    每个用户只保存 (分数, 最后更新时间)，读取或更新时按经过的时间即时计算衰减，
+    不需要为每个用户挂定时器，开销与用户数量无关。
+
+    支持的模式：
+    - "none": 不衰减（默认，与原来的行为一致）
+    - "exponential": 指数衰减，每经过 half_life 秒分数减半
+    - "linear": 线性衰减，每小时扣除 points_per_hour 分，最低为 0
+    """
+
+    MODES = ("none", "exponential", "linear")
+    # 指数衰减永远不会到 0，低于该值视为已清零
+    EPSILON = 0.01
+
+    def __init__(self, mode: str = "none", half_life: float = 24 * 3600, points_per_hour: float = 1.0):
+        self.mode = "none"
+        self.half_life = half_life
+        self.points_per_hour = points_per_hour
+        self.configure(mode, half_life, points_per_hour)
+
+    def configure(self, mode: str, half_life: Optional[float] = None, points_per_hour: Optional[float] = None):
+        """修改衰减模式和参数"""
+        if mode not in self.MODES:
+            raise ValueError(f"未知的衰减模式：{mode}")
+        if half_life is not None:
+            if half_life <= 0:
+                raise ValueError("半衰期必须为正数")
+            self.half_life = half_life
+        if points_per_hour is not None:
+            if points_per_hour < 0:
+                raise ValueError("每小时衰减分数不能为负数")
+            self.points_per_hour = points_per_hour
+        self.mode = mode
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "none"
+
+    def apply(self, score: float, last_update: float, now: float) -> float:
+        """计算 score 从 last_update 衰减到 now 之后的值"""
+        if self.mode == "none" or score <= 0:
+            return score
+        elapsed = now - last_update
+        if elapsed <= 0:
+            return score
+        if self.mode == "exponential":
+            score = score * math.pow(0.5, elapsed / self.half_life)
+        else:
+            score = score - self.points_per_hour * elapsed / 3600
+        return score if score >= self.EPSILON else 0
+
+    def encode(self, score: float, last_update: float) -> Any:
+        """
+        转换为持久化格式
+
+        不衰减时只保存分数本身，与旧版 user_scores.json 完全兼容；
+        启用衰减时保存 [分数, 最后更新时间]。
+        """
+        if self.mode == "none":
+            return score
+        return [round(score, 4), round(last_update, 3)]
+
+    @staticmethod
+    def decode(value: Any, now: Optional[float] = None) -> Tuple[float, float]:
+        """
+        从持久化格式读取 (分数, 最后更新时间)
+
+        旧格式只有分数，最后更新时间按读取时刻计算。
+        """
+        if isinstance(value, (list, tuple)):
+            return value[0], value[1]
+        return value, time.time() if now is None else now
+
+
+def compact_id(value: str) -> Union[int, str]:
+    """
+    把群号/QQ号转换为整数以节省内存
+
+    只转换规范的十进制数字串（没有前导 0），保证 str(compact_id(x)) == x，
+    其余情况原样返回字符串。
+    """
+    if isinstance(value, int):
+        return value
+    if value.isascii() and value.isdigit() and (value[0] != "0" or value == "0"):
+        return int(value)
+    return value
+
+
+class ScoreRecord:
+    """单个用户的分数记录"""
+
+    __slots__ = ("score", "last_update")
+
+    def __init__(self, score: float, last_update: float):
+        self.score = score
+        self.last_update = last_update
+
+
+class ScoreTable:
+    """
+    用户分数表
+
+    按群分组存储 {群号: {用户ID: ScoreRecord}}，群号和用户ID尽量以整数保存，
+    避免每次查询都拼接 "群号_用户ID" 字符串。持久化格式仍是原来的
+    {"群号_用户ID": 分数} 扁平字典，load / dump 负责转换。
+    """
+
+    def __init__(self):
+        self._groups: Dict[Union[int, str], Dict[Union[int, str], ScoreRecord]] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def make_key(group_id, user_id) -> str:
+        """生成持久化使用的用户键"""
+        return f"{group_id}_{user_id}"
+
+    @staticmethod
+    def split_key(user_key: str) -> Tuple[str, str]:
+        """把 "群号_用户ID" 拆回 (群号, 用户ID)"""
+        group_id, _, user_id = user_key.partition("_")
+        return group_id, user_id
+
+    def get(self, group_id: str, user_id: str) -> Optional[ScoreRecord]:
+        users = self._groups.get(compact_id(group_id))
+        if users is None:
+            return None
+        return users.get(compact_id(user_id))
+
+    def set(self, group_id: str, user_id: str, score: float, last_update: float) -> Tuple:
+        """
+        写入分数
+
+        Returns:
+            (群号, 用户ID) 的紧凑形式，可作为脏键使用
+        """
+        gid, uid = compact_id(group_id), compact_id(user_id)
+        users = self._groups.get(gid)
+        if users is None:
+            users = self._groups[gid] = {}
+        record = users.get(uid)
+        if record is None:
+            users[uid] = ScoreRecord(score, last_update)
+            self._size += 1
+        else:
+            record.score = score
+            record.last_update = last_update
+        return gid, uid
+
+    def remove(self, gid, uid) -> bool:
+        """按紧凑形式的键删除一条记录"""
+        users = self._groups.get(gid)
+        if users is None or uid not in users:
+            return False
+        del users[uid]
+        self._size -= 1
+        if not users:
+            del self._groups[gid]
+        return True
+
+    def items(self):
+        """遍历 (群号, 用户ID, ScoreRecord)，群号和用户ID为紧凑形式"""
+        for gid, users in self._groups.items():
+            for uid, record in users.items():
+                yield gid, uid, record
+
+    def evict(self, should_evict: Callable[[ScoreRecord], bool]) -> List[Tuple]:
+        """
+        删除满足条件的记录
+
+        Returns:
+            被删除的 (群号, 用户ID) 列表
+        """
+        evicted = [(gid, uid) for gid, uid, record in self.items() if should_evict(record)]
+        for gid, uid in evicted:
+            self.remove(gid, uid)
+        return evicted
+
+    def load(self, user_scores: Dict[str, Any], decode: Callable[[Any, float], Tuple[float, float]],
+             now: Optional[float] = None):
+        """从 {"群号_用户ID": 持久化值} 加载"""
+        now = time.time() if now is None else now
+        for user_key, value in user_scores.items():
+            group_id, user_id = self.split_key(user_key)
+            score, last_update = decode(value, now)
+            self.set(group_id, user_id, score, last_update)
+
+    def dump(self, encode: Callable[[float, float], Any], keys: Optional[Iterable[Tuple]] = None) -> Dict[str, Any]:
+        """
+        导出为 {"群号_用户ID": 持久化值}
+
+        Args:
+            encode: 把 (分数, 最后更新时间) 转换为持久化值
+            keys: 只导出这些紧凑键（不存在的会被跳过），为 None 时导出全部
+        """
+        if keys is None:
+            return {self.make_key(gid, uid): encode(r.score, r.last_update) for gid, uid, r in self.items()}
+        result = {}
+        for gid, uid in keys:
+            users = self._groups.get(gid)
+            record = users.get(uid) if users is not None else None
+            if record is not None:
+                result[self.make_key(gid, uid)] = encode(record.score, record.last_update)
+        return result
@@ -0,0 +1,249 @@
+# snapshot.py
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from .storage import WriteBehindWriter, atomic_write_bytes
+
+# 文件头：魔数 + 格式版本 + 索引长度。匹配器的内部结构变化时增加 SNAPSHOT_VERSION，旧文件整体作废
+SNAPSHOT_MAGIC = b"JJMS"
+SNAPSHOT_VERSION = 4
+_HEADER = struct.Struct("<4sIQ")
+
+
+def content_key(ban_words: Dict[str, int], options: Optional[Dict] = None, tables: str = "") -> str:
+    """
+    违禁词字典和构建参数的内容摘要，作为快照的键
+
+    Args:
+        ban_words: {违禁词: 权重}
+        options: 构建匹配器的参数
+        tables: 构建时用到的内置数据表（归一化表、拼音表、默认分隔符等）的摘要
+    """
+    data = json.dumps([SNAPSHOT_VERSION, tables, ban_words, options or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=20).hexdigest()
+
+
+class MatcherSnapshot:
+    """
+    编译好的匹配器的持久化缓存
+
+    文件格式：文件头、JSON 索引 {"entries": {键: [偏移, 长度, 最后使用时间]}, "owners": {使用者: 键}}，
+    之后依次是各匹配器的 pickle 数据。启动时只读取文件头和索引，数据部分用 mmap 映射，
+    某个群第一次用到匹配器时才反序列化对应的那一段；键是违禁词内容的摘要，内容变化后键不同，
+    自然需要重新构建。
+
+    使用者是群号（或共享匹配器的缓存键），每个使用者只记录当前使用的一个键：
+    新构建的匹配器按使用者暂存（同一使用者再次重建时直接替换，不额外占用内存），
+    save() 时才序列化并写入文件（原子替换）。被替换掉的旧版本、不再被任何使用者引用
+    或超过 max_age 秒没有用到的条目都不会写入。构建可能发生在线程池中，所有方法都是线程安全的。
+
+    指定 save_interval 时由后台线程在 put() 之后延迟保存：一段时间内的多次重建只写一次文件，
+    进程被强制结束时最多丢失最近 save_interval 秒内构建的匹配器。
+    """
+
+    def __init__(self, path: str, max_age: float = 7 * 24 * 3600, save_interval: Optional[float] = None):
+        """
+        Args:
+            path: 快照文件路径
+            max_age: 条目多久没有用到就不再保存（秒）
+            save_interval: put() 之后延迟多久在后台保存（秒），None 表示只在 close() 时保存
+        """
+        self.path = path
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._writer = None
+        if save_interval is not None:
+            # 脏键是使用者，数量阈值设得足够大，只按时间间隔合并保存
+            self._writer = WriteBehindWriter(
+                lambda owners: self.save(), save_interval, max_dirty=1 << 30, name="matcher-snapshot-writer"
+            )
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._base = 0
+        self._index: Dict[str, list] = {}
+        self._owners: Dict[str, str] = {}                 # {使用者: 当前使用的键}
+        self._pending: Dict[str, Tuple[str, Any]] = {}    # {使用者: (键, 等待写入的匹配器)}
+        self._dirty = False
+        self._open()
+
+    def __len__(self) -> int:
+        return len(set(self._index) | {key for key, _ in self._pending.values()})
+
+    def _open(self):
+        """读取文件头和索引，文件不存在、损坏或版本不同时当作空缓存"""
+        self._index = {}
+        self._owners = {}
+        if not os.path.exists(self.path):
+            return
+        try:
+            self._file = open(self.path, "rb")
+            header = self._file.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise ValueError("文件头不完整")
+            magic, version, index_length = _HEADER.unpack(header)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(f"格式版本不匹配（{version}）")
+            index = json.loads(self._file.read(index_length).decode("utf-8"))
+            self._index = dict(index["entries"])
+            self._owners = dict(index["owners"])
+            self._base = _HEADER.size + index_length
+            if self._index:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"匹配器快照不可用，将重新构建：{e}")
+            self._close_file()
+            self._index = {}
+            self._owners = {}
+            self._dirty = True
+
+    def _close_file(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read(self, entry: list) -> bytes:
+        offset, length = entry[0], entry[1]
+        start = self._base + offset
+        return self._map[start:start + length]
+
+    def _claim(self, owner: Optional[str], key: str):
+        """记录使用者当前使用的键，它之前暂存的其他版本随之作废"""
+        if owner is None or self._owners.get(owner) == key:
+            return
+        self._owners[owner] = key
+        pending = self._pending.get(owner)
+        if pending is not None and pending[0] != key:
+            del self._pending[owner]
+        self._dirty = True
+
+    def get(self, key: str, owner: Optional[str] = None) -> Optional[Any]:
+        """
+        按键取出匹配器，不存在或无法反序列化时返回 None
+
+        Args:
+            key: 违禁词内容的摘要
+            owner: 使用者（群号或共享匹配器的缓存键），命中时记为该使用者当前使用的键
+        """
+        with self._lock:
+            for pending_key, matcher in self._pending.values():
+                if pending_key == key:
+                    self._claim(owner, key)
+                    self.hits += 1
+                    return matcher
+            entry = self._index.get(key)
+            if entry is None or self._map is None:
+                self.misses += 1
+                return None
+            data = self._read(entry)
+            entry[2] = time.time()
+            self._dirty = True
+        try:
+            matcher = pickle.loads(data)
+        except Exception as e:
+            print(f"匹配器快照条目损坏，将重新构建：{e}")
+            with self._lock:
+                self._index.pop(key, None)
+                self.misses += 1
+            return None
+        with self._lock:
+            self._claim(owner, key)
+            self.hits += 1
+        return matcher
+
+    def put(self, key: str, matcher: Any, owner: Optional[str] = None):
+        """暂存新构建的匹配器，在下次 save() 时写入文件；同一使用者之前暂存的版本被替换"""
+        owner = key if owner is None else owner
+        with self._lock:
+            self._pending[owner] = (key, matcher)
+            self._owners[owner] = key
+            self._dirty = True
+        if self._writer is not None:
+            self._writer.mark_dirty(owner)
+
+    def save(self):
+        """把仍被使用的匹配器写回文件（只在有变化时写入）"""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                pending = dict(self._pending.values())
+            # 序列化可能较慢，在锁外进行，不阻塞 get() 和 put()
+            pickled = {key: (matcher, pickle.dumps(matcher, protocol=pickle.HIGHEST_PROTOCOL))
+                       for key, matcher in pending.items()}
+            with self._lock:
+                self._write(pickled)
+
+    def _write(self, pickled: Dict[str, Tuple[Any, bytes]]):
+        """
+        写入文件，调用时持有 _lock
+
+        Args:
+            pickled: {键: (匹配器, 已序列化的数据)}，序列化之后又暂存的匹配器在这里补做序列化
+        """
+        if not self._dirty:
+            return
+        now = time.time()
+        pending = {key: matcher for key, matcher in self._pending.values()}
+        blobs: Dict[str, bytes] = {}
+        used: Dict[str, float] = {}
+        for key in dict.fromkeys(self._owners.values()):
+            if key in pending:
+                done = pickled.get(key)
+                if done is not None and done[0] is pending[key]:
+                    blobs[key] = done[1]
+                else:
+                    blobs[key] = pickle.dumps(pending[key], protocol=pickle.HIGHEST_PROTOCOL)
+                used[key] = now
+                continue
+            entry = self._index.get(key)
+            if entry is not None and self._map is not None and now - entry[2] <= self.max_age:
+                blobs[key] = self._read(entry)
+                used[key] = entry[2]
+        owners = {owner: key for owner, key in self._owners.items() if key in blobs}
+        # Windows 上被映射的文件无法替换，先关闭映射
+        self._close_file()
+
+        entries = {}
+        offset = 0
+        for key, data in blobs.items():
+            entries[key] = [offset, len(data), used[key]]
+            offset += len(data)
+        index_bytes = json.dumps({"entries": entries, "owners": owners},
+                                 separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+        header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(index_bytes))
+        current_owners = self._owners
+        written = False
+        try:
+            atomic_write_bytes(self.path, [header, index_bytes, *blobs.values()])
+            written = True
+        finally:
+            # 重新映射文件；写入失败时暂存的匹配器和使用者记录留到下次保存
+            self._open()
+            if written:
+                self._pending.clear()
+                self._dirty = False
+            else:
+                self._owners = current_owners
+                self._dirty = True
+
+    def close(self):
+        """停止后台保存，保存并释放文件映射"""
+        if self._writer is not None:
+            self._writer.close()
+        self.save()
+        with self._lock:
+            self._close_file()
@@ -0,0 +1,596 @@
+# storage.py
+import json
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+
+def _umask() -> int:
+    # 只能通过设置来读取 umask，读取后立即恢复
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# 新建文件的默认权限，与直接 open() 创建的文件相同
+_DEFAULT_FILE_MODE = 0o666 & ~_umask()
+
+
+def _target_mode(path: str) -> int:
+    """目标文件已存在时沿用它的权限，否则使用默认权限"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return _DEFAULT_FILE_MODE
+
+
+def _atomic_write(path: str, write: Callable[[Any], None], suffix: str, binary: bool = False):
+    """
+    先写同目录下的临时文件，再用 rename 替换目标文件
+
+    mkstemp 创建的临时文件权限为 0600，替换前改成目标文件原来的权限（没有时为默认权限），
+    避免每次保存都把数据文件变成只有属主可读。
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=suffix, dir=directory)
+    try:
+        with (os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8")) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, _target_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: str, data: Any, indent: Optional[int] = 2):
+    """
+    原子地写入 JSON 文件：先写同目录下的临时文件，再用 rename 替换
+
+    写入过程中崩溃时，原文件保持不变，不会出现写了一半的文件。
+    """
+    _atomic_write(path, lambda f: json.dump(data, f, ensure_ascii=False, indent=indent), ".json")
+
+
+def atomic_write_text(path: str, text: str):
+    """原子地写入文本文件，做法同 atomic_write_json"""
+    _atomic_write(path, lambda f: f.write(text), ".tmp")
+
+
+def atomic_write_bytes(path: str, chunks: Iterable[bytes]):
+    """原子地依次写入若干段二进制数据，做法同 atomic_write_json"""
+    def write(f):
+        for chunk in chunks:
+            f.write(chunk)
+
+    _atomic_write(path, write, ".tmp", binary=True)
+
+
+class WriteBehindWriter:
+    """
+    延迟合并写入器
+
+    修改时只把键标记为脏，由后台线程在以下任一条件满足时统一写盘：
+    - 距上次写盘超过 interval 秒
+    - 脏键数量达到 max_dirty
+    多次修改同一个键只会写一次；写盘失败的键会保留到下次重试。
+    """
+
+    def __init__(self, flush_fn: Callable[[Set[Hashable]], None],
+                 interval: float = 5.0, max_dirty: int = 100, name: str = "write-behind"):
+        """
+        Args:
+            flush_fn: 实际写盘的函数，参数为本次需要写入的脏键集合，在后台线程中调用
+            interval: 定时写盘的间隔（秒）
+            max_dirty: 脏键数量达到该值时立即写盘
+            name: 后台线程名
+        """
+        self._flush_fn = flush_fn
+        self.interval = interval
+        self.max_dirty = max_dirty
+        self._name = name
+        self._dirty: Set[Hashable] = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def set_policy(self, interval: Optional[float] = None, max_dirty: Optional[int] = None):
+        """调整写盘间隔和脏键数量阈值"""
+        if interval is not None:
+            self.interval = interval
+        if max_dirty is not None:
+            self.max_dirty = max_dirty
+        self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        """尚未写盘的脏键数量"""
+        return len(self._dirty)
+
+    def mark_dirty(self, key: Hashable):
+        """标记一个键需要写盘"""
+        with self._lock:
+            self._dirty.add(key)
+            count = len(self._dirty)
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+        if count >= self.max_dirty:
+            self._wakeup.set()
+
+    def flush(self):
+        """立即把所有脏键写盘（在调用方线程中执行）"""
+        with self._flush_lock:
+            with self._lock:
+                keys, self._dirty = self._dirty, set()
+            if not keys:
+                return
+            try:
+                self._flush_fn(keys)
+            except Exception as e:
+                print(f"延迟写入失败：{e}")
+                with self._lock:
+                    self._dirty |= keys
+
+    def close(self):
+        """停止后台线程并做最后一次写盘"""
+        self._closed = True
+        self._wakeup.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=max(self.interval, 1.0) * 2)
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._closed:
+                break
+            self.flush()
+
+
+class ScoreJournal:
+    """
+    用户分数追加日志
+
+    每次分数变化追加一行 {"k": 用户键, "d": 变化量, "v": 变化后的分数}。
+    记录的是变化后的分数，重放是幂等的，重复重放同一段日志不会把分数加多。
+
+    压缩流程：rotate() 把当前日志改名为 .old 并开始新日志 -> 调用方写入快照
+    -> discard_rotated() 删除 .old。任何一步中途崩溃，启动时快照 + .old + 当前日志
+    依次重放都能得到正确结果。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rotated_path = path + ".old"
+        self._lock = threading.Lock()
+        self._file = None
+        self.entries = 0   # 自上次压缩以来追加的条数
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self._file
+
+    def append(self, user_key: str, delta: Any, value: Any):
+        """追加一条分数变化并刷入操作系统缓冲区"""
+        line = json.dumps({"k": user_key, "d": delta, "v": value}, ensure_ascii=False)
+        with self._lock:
+            f = self._open()
+            f.write(line + "\n")
+            f.flush()
+            self.entries += 1
+
+    def replay(self, user_scores: Dict[str, Any]) -> int:
+        """
+        把 .old 和当前日志依次重放到 user_scores 上
+
+        Returns:
+            重放的条数
+        """
+        count = 0
+        for path in (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 崩溃时最后一行可能只写了一半
+                        continue
+                    user_scores[entry["k"]] = entry["v"]
+                    count += 1
+        self.entries = count
+        return count
+
+    def rotate(self):
+        """把当前日志移到 .old，之后的追加写入新文件"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if not os.path.exists(self.path):
+                return
+            if os.path.exists(self.rotated_path):
+                # 上一次压缩没有完成，把当前日志接到 .old 后面
+                with open(self.path, "r", encoding="utf-8") as src, \
+                        open(self.rotated_path, "a", encoding="utf-8") as dst:
+                    dst.write(src.read())
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self.rotated_path)
+            self.entries = 0
+
+    def discard_rotated(self):
+        """快照写入成功后删除 .old"""
+        try:
+            os.remove(self.rotated_path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class BaseStorage:
+    """
+    存储后端接口
+
+    内存中始终保存完整的数据字典，保存时同时传入完整字典和本次变化的键，
+    由后端决定整体重写（JSON）还是只写变化的行（SQLite）。
+    """
+
+    # 保存时是否需要完整字典；为 False 时调用方只需传入变化的那部分
+    needs_full_snapshot = True
+
+    def load_ban_words(self) -> Dict[str, Dict[str, int]]:
+        """加载违禁词 {群号: {违禁词: 权重}}"""
+        raise NotImplementedError
+
+    def save_ban_words(self, ban_words: Dict[str, Dict[str, int]],
+                       changes: Iterable[Tuple[str, str]]):
+        """
+        保存违禁词
+
+        Args:
+            ban_words: 完整的违禁词字典
+            changes: 本次变化的 (群号, 违禁词)，字典中已不存在的表示删除
+        """
+        raise NotImplementedError
+
+    def load_templates(self) -> Dict[str, Dict[str, int]]:
+        """加载共享词库模板 {模板名: {违禁词: 权重}}"""
+        raise NotImplementedError
+
+    def save_templates(self, templates: Dict[str, Dict[str, int]],
+                       changes: Iterable[Tuple[str, str]]):
+        """保存共享词库模板，changes 为本次变化的 (模板名, 违禁词)"""
+        raise NotImplementedError
+
+    def load_ban_status(self) -> Dict[str, bool]:
+        """加载各群功能开关"""
+        raise NotImplementedError
+
+    def save_ban_status(self, ban_status: Dict[str, bool], changes: Iterable[str]):
+        """保存功能开关，changes 为本次变化的群号"""
+        raise NotImplementedError
+
+    def load_group_settings(self) -> Dict[str, Dict[str, Any]]:
+        """加载各群的附加设置 {群号: {设置项: 值}}"""
+        raise NotImplementedError
+
+    def save_group_settings(self, group_settings: Dict[str, Dict[str, Any]], changes: Iterable[str]):
+        """保存各群的附加设置，changes 为本次变化的群号"""
+        raise NotImplementedError
+
+    def load_user_scores(self) -> Dict[str, Any]:
+        """加载用户分数 {"群号_用户ID": 分数}"""
+        raise NotImplementedError
+
+    def save_user_scores(self, user_scores: Dict[str, Any], changes: Iterable[str]):
+        """保存用户分数，changes 为本次变化的用户键"""
+        raise NotImplementedError
+
+    def watched_files(self) -> Dict[str, str]:
+        """可能被外部直接修改、需要热加载的文件 {名称: 路径}，没有时返回空字典"""
+        return {}
+
+    def close(self):
+        """关闭后端"""
+        pass
+
+
+class JsonStorage(BaseStorage):
+    """JSON 文件存储（默认），每次保存整体重写对应文件"""
+
+    needs_full_snapshot = True
+
+    def __init__(self, data_dir: str, create_files: bool = True):
+        """
+        Args:
+            data_dir: 数据目录
+            create_files: 违禁词和开关文件不存在时是否新建空文件
+        """
+        self.ban_words_file = os.path.join(data_dir, "ban_words.json")
+        self.ban_status_file = os.path.join(data_dir, "ban_status.json")
+        self.group_settings_file = os.path.join(data_dir, "group_settings.json")
+        self.templates_file = os.path.join(data_dir, "word_templates.json")
+        self.user_scores_file = os.path.join(data_dir, "user_scores.json")
+        if create_files:
+            os.makedirs(data_dir, exist_ok=True)
+            for path in (self.ban_words_file, self.ban_status_file):
+                if not os.path.exists(path):
+                    atomic_write_json(path, {}, indent=None)
+                    print(f"新建存储文件：{path}")
+
+    def watched_files(self):
+        return {"ban_words": self.ban_words_file, "ban_status": self.ban_status_file}
+
+    @staticmethod
+    def _load(path: str) -> Dict:
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def load_ban_words(self):
+        return self._load(self.ban_words_file)
+
+    def save_ban_words(self, ban_words, changes):
+        atomic_write_json(self.ban_words_file, ban_words)
+
+    def load_templates(self):
+        return self._load(self.templates_file)
+
+    def save_templates(self, templates, changes):
+        atomic_write_json(self.templates_file, templates)
+
+    def load_ban_status(self):
+        return self._load(self.ban_status_file)
+
+    def save_ban_status(self, ban_status, changes):
+        atomic_write_json(self.ban_status_file, ban_status)
+
+    def load_group_settings(self):
+        return self._load(self.group_settings_file)
+
+    def save_group_settings(self, group_settings, changes):
+        atomic_write_json(self.group_settings_file, group_settings)
+
+    def load_user_scores(self):
+        return self._load(self.user_scores_file)
+
+    def save_user_scores(self, user_scores, changes):
+        atomic_write_json(self.user_scores_file, user_scores)
+
+
+class SqliteStorage(BaseStorage):
+    """
+    SQLite 存储（WAL 模式），每次保存只对变化的行做 upsert / delete
+
+    连接会被事件循环线程和后台写盘线程共用，所有操作都在锁内进行。
+    """
+
+    needs_full_snapshot = False
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS ban_words (
+            group_id TEXT NOT NULL,
+            word     TEXT NOT NULL,
+            weight   INTEGER NOT NULL,
+            PRIMARY KEY (group_id, word)
+        );
+        CREATE TABLE IF NOT EXISTS word_templates (
+            name   TEXT NOT NULL,
+            word   TEXT NOT NULL,
+            weight INTEGER NOT NULL,
+            PRIMARY KEY (name, word)
+        );
+        CREATE TABLE IF NOT EXISTS ban_status (
+            group_id TEXT PRIMARY KEY,
+            enabled  INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS group_settings (
+            group_id TEXT PRIMARY KEY,
+            settings TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS user_scores (
+            user_key TEXT PRIMARY KEY,
+            score    TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key   TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def _write(self, statements: List[Tuple[str, Tuple]]):
+        """在一个事务中执行多条写语句"""
+        if not statements:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def set_meta(self, key: str, value: str):
+        self._write([("INSERT INTO meta (key, value) VALUES (?, ?) "
+                      "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))])
+
+    def load_ban_words(self):
+        ban_words: Dict[str, Dict[str, int]] = {}
+        for group_id, word, weight in self._query("SELECT group_id, word, weight FROM ban_words ORDER BY rowid"):
+            ban_words.setdefault(group_id, {})[word] = weight
+        return ban_words
+
+    def save_ban_words(self, ban_words, changes):
+        statements = []
+        for group_id, word in changes:
+            weight = ban_words.get(group_id, {}).get(word)
+            if weight is None:
+                statements.append(("DELETE FROM ban_words WHERE group_id = ? AND word = ?", (group_id, word)))
+            else:
+                statements.append((
+                    "INSERT INTO ban_words (group_id, word, weight) VALUES (?, ?, ?) "
+                    "ON CONFLICT(group_id, word) DO UPDATE SET weight = excluded.weight",
+                    (group_id, word, weight),
+                ))
+        self._write(statements)
+
+    def load_templates(self):
+        templates: Dict[str, Dict[str, int]] = {}
+        for name, word, weight in self._query("SELECT name, word, weight FROM word_templates ORDER BY rowid"):
+            templates.setdefault(name, {})[word] = weight
+        return templates
+
+    def save_templates(self, templates, changes):
+        statements = []
+        for name, word in changes:
+            weight = templates.get(name, {}).get(word)
+            if weight is None:
+                statements.append(("DELETE FROM word_templates WHERE name = ? AND word = ?", (name, word)))
+            else:
+                statements.append((
+                    "INSERT INTO word_templates (name, word, weight) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name, word) DO UPDATE SET weight = excluded.weight",
+                    (name, word, weight),
+                ))
+        self._write(statements)
+
+    def load_ban_status(self):
+        return {group_id: bool(enabled) for group_id, enabled in self._query("SELECT group_id, enabled FROM ban_status")}
+
+    def save_ban_status(self, ban_status, changes):
+        statements = []
+        for group_id in changes:
+            if group_id in ban_status:
+                statements.append((
+                    "INSERT INTO ban_status (group_id, enabled) VALUES (?, ?) "
+                    "ON CONFLICT(group_id) DO UPDATE SET enabled = excluded.enabled",
+                    (group_id, int(bool(ban_status[group_id]))),
+                ))
+            else:
+                statements.append(("DELETE FROM ban_status WHERE group_id = ?", (group_id,)))
+        self._write(statements)
+
+    def load_group_settings(self):
+        return {group_id: json.loads(settings)
+                for group_id, settings in self._query("SELECT group_id, settings FROM group_settings")}
+
+    def save_group_settings(self, group_settings, changes):
+        statements = []
+        for group_id in changes:
+            if group_id in group_settings:
+                statements.append((
+                    "INSERT INTO group_settings (group_id, settings) VALUES (?, ?) "
+                    "ON CONFLICT(group_id) DO UPDATE SET settings = excluded.settings",
+                    (group_id, json.dumps(group_settings[group_id], ensure_ascii=False)),
+                ))
+            else:
+                statements.append(("DELETE FROM group_settings WHERE group_id = ?", (group_id,)))
+        self._write(statements)
+
+    def load_user_scores(self):
+        return {user_key: json.loads(score) for user_key, score in self._query("SELECT user_key, score FROM user_scores")}
+
+    def save_user_scores(self, user_scores, changes):
+        statements = []
+        for user_key in changes:
+            if user_key in user_scores:
+                statements.append((
+                    "INSERT INTO user_scores (user_key, score) VALUES (?, ?) "
+                    "ON CONFLICT(user_key) DO UPDATE SET score = excluded.score",
+                    (user_key, json.dumps(user_scores[user_key])),
+                ))
+            else:
+                statements.append(("DELETE FROM user_scores WHERE user_key = ?", (user_key,)))
+        self._write(statements)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json_to_sqlite(data_dir: str, storage: SqliteStorage) -> bool:
+    """
+    一次性把旧的 JSON 数据导入 SQLite
+
+    迁移完成后在 meta 表中记录标记，之后不会重复导入；JSON 文件保留不动，方便回退。
+
+    Returns:
+        本次是否执行了迁移
+    """
+    if storage.get_meta("migrated_from_json"):
+        return False
+    source = JsonStorage(data_dir, create_files=False)
+
+    ban_words = source.load_ban_words()
+    storage.save_ban_words(ban_words, [(g, w) for g, words in ban_words.items() for w in words])
+    templates = source.load_templates()
+    storage.save_templates(templates, [(n, w) for n, words in templates.items() for w in words])
+    ban_status = source.load_ban_status()
+    storage.save_ban_status(ban_status, list(ban_status))
+    group_settings = source.load_group_settings()
+    storage.save_group_settings(group_settings, list(group_settings))
+    user_scores = source.load_user_scores()
+    storage.save_user_scores(user_scores, list(user_scores))
+
+    storage.set_meta("migrated_from_json", str(int(time.time())))
+    return True
+
+
+def create_storage(backend: str, data_dir: str) -> BaseStorage:
+    """
+    按名称创建存储后端
+
+    Args:
+        backend: "json"（默认）或 "sqlite"
+        data_dir: 数据目录
+    """
+    if backend == "sqlite":
+        storage = SqliteStorage(os.path.join(data_dir, "banwords.db"))
+        if migrate_json_to_sqlite(data_dir, storage):
+            print(f"已将 JSON 数据迁移到 SQLite：{storage.db_path}")
+        return storage
+    if backend != "json":
+        raise ValueError(f"未知的存储后端：{backend}")
+    return JsonStorage(data_dir)
@@ -0,0 +1,37 @@
+# tests/conftest.py
+"""
+插件目录本身就是一个包（模块之间用相对导入），目录名又不是合法的模块名，
+这里把它以 juanjuan_copy 的名字加载进来，测试中统一 `from juanjuan_copy.xxx import ...`。
+
+依赖 AstrBot 的模块（main、dispatcher、notices）只在装有 AstrBot 的环境中测试。
+"""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "juanjuan_copy"
+
+if PACKAGE not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        PACKAGE, os.path.join(ROOT, "__init__.py"), submodule_search_locations=[ROOT]
+    )
+    _module = importlib.util.module_from_spec(_spec)
+    sys.modules[PACKAGE] = _module
+    _spec.loader.exec_module(_module)
+
+
+@pytest.fixture
+def detector_module(tmp_path, monkeypatch):
+    """把 BanWordsDetector 模块的数据路径指向临时目录"""
+    from juanjuan_copy import BanWordsDetector as module
+
+    monkeypatch.setattr(module, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(module, "BAN_WORDS_FILE", str(tmp_path / "ban_words.json"))
+    monkeypatch.setattr(module, "USER_SCORE_FILE", str(tmp_path / "user_scores.json"))
+    monkeypatch.setattr(module, "SCORE_JOURNAL_FILE", str(tmp_path / "user_scores.journal"))
+    monkeypatch.setattr(module, "MATCHER_SNAPSHOT_FILE", str(tmp_path / "matchers.cache"))
+    monkeypatch.setattr(module, "detector", None)
+    return module
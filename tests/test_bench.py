@@ -0,0 +1,29 @@
+# tests/test_bench.py
+import pytest
+
+pytest.importorskip("astrbot")
+
+from juanjuan_copy import main  # noqa: E402
+from juanjuan_copy.tools import bench  # noqa: E402
+from juanjuan_copy.tools.replay import use_data_dir  # noqa: E402
+
+
+def test_detect_cases_bypass_verdict_cache(detector_module, tmp_path, monkeypatch):
+    # use_data_dir 直接改写路径常量，先登记 main 中的原值以便测试结束后恢复（检测器模块由 fixture 负责）
+    for name in ["DATA_DIR", "BAN_STATUS_FILE", "METRICS_FILE"]:
+        monkeypatch.setattr(main, name, getattr(main, name))
+    use_data_dir(str(tmp_path))
+    monkeypatch.setattr(bench, "QUICK_WORD_COUNTS", [10])
+    monkeypatch.setattr(bench, "QUICK_MESSAGE_LENGTHS", [10, 1000])
+    monkeypatch.setattr(bench, "QUICK_SCRIPTS", ["cjk"])
+    monkeypatch.setattr(bench, "QUICK_HIT_RATES", [0.1])
+    detector = main.get_detector()
+    cache = detector._verdict_cache
+
+    results = bench.BenchRunner(quick=True, name_filter="detect", min_time=0.001).run()
+    names = [result["name"] for result in results]
+    assert names == ["detect_ban_words", "detect_ban_words_cached", "detect_ban_words"]
+    # 只有 detect_ban_words_cached 用到了缓存，且除第一次外全部命中
+    assert cache.misses == 1 and cache.hits > 0
+    assert detector._verdict_cache is cache
+    detector.close()
@@ -0,0 +1,121 @@
+# tests/test_detector.py
+import asyncio
+import glob
+import importlib
+import importlib.util
+import os
+import shutil
+import sys
+
+from conftest import ROOT
+
+
+def test_import_does_not_touch_data_dir(tmp_path):
+    # 从一份没有 data/ 的副本导入，导入本身不应创建任何数据文件
+    for path in glob.glob(os.path.join(ROOT, "*.py")):
+        shutil.copy(path, tmp_path)
+    name = "juanjuan_copy_fresh"
+    spec = importlib.util.spec_from_file_location(
+        name, str(tmp_path / "__init__.py"), submodule_search_locations=[str(tmp_path)]
+    )
+    sys.modules[name] = importlib.util.module_from_spec(spec)
+    try:
+        module = importlib.import_module(f"{name}.BanWordsDetector")
+        assert module.detector is None
+        assert not (tmp_path / "data").exists()
+    finally:
+        for key in [k for k in sys.modules if k == name or k.startswith(name + ".")]:
+            del sys.modules[key]
+
+
+def test_get_detector_is_lazy_and_uses_data_dir(detector_module, tmp_path):
+    assert detector_module.detector is None
+    detector = detector_module.get_detector()
+    assert detector_module.get_detector() is detector
+    assert os.path.exists(tmp_path / "ban_words.json")
+    detector.close()
+
+
+def test_detect_and_score(detector_module):
+    detector = detector_module.get_detector()
+    detector.set_threshold(3)
+    detector.set_ban_words({"1": {"违禁": 2}})
+    weight, detected, spans = detector.detect_ban_words("有违禁词违禁", "1", "9")
+    assert (weight, detected) == (4, {"违禁": 2})
+    assert len(spans) == 2
+    assert detector.update_user_score("1", "9", weight) == (4, True)
+    detector.close()
+
+
+def test_scores_survive_crash_through_journal(detector_module):
+    detector = detector_module.get_detector()
+    detector.set_threshold(10)
+    detector.update_user_score("1", "9", 3)
+    detector.update_user_score("1", "9", 4)
+    # 不调用 close()，模拟快照写入之前进程退出；新的实例从日志重放
+    restarted = detector_module.BanWordsDetector()
+    assert restarted.get_user_score("1", "9") == 7
+    restarted.close()
+    detector.close()
+
+
+def test_detect_many_parallel_matches_serial(detector_module):
+    detector = detector_module.get_detector()
+    detector.set_templates({"global": {"广告": 1}})
+    detector.set_ban_words({"1": {"违禁": 2}, "2": {"外挂": 3}})
+    records = [(str(n % 4), str(n), f"第{n}条违禁外挂广告") for n in range(50)]
+    serial = list(detector.detect_many(records))
+    assert list(detector.detect_many(records, workers=2, chunk_size=7)) == serial
+    assert serial[1][2:4] == (3, {"广告": 1, "违禁": 1})
+    detector.close()
+
+
+def test_verdict_cache_invalidated_on_add_and_remove(detector_module):
+    detector = detector_module.get_detector()
+    detector.set_ban_words({"1": {"违禁": 2}})
+    assert detector.detect_ban_words("广告违禁", "1", "9")[0] == 2
+    assert detector.detect_ban_words("广告违禁", "1", "9")[0] == 2
+    assert detector._verdict_cache.hits == 1
+
+    detector.ban_words["1"]["广告"] = 3
+    asyncio.run(detector.refresh_group("1"))
+    assert detector.detect_ban_words("广告违禁", "1", "9")[:2] == (5, {"违禁": 1, "广告": 1})
+
+    del detector.ban_words["1"]["违禁"]
+    asyncio.run(detector.refresh_group("1"))
+    assert detector.detect_ban_words("广告违禁", "1", "9")[:2] == (3, {"广告": 1})
+
+    detector.set_ban_words({"1": {"违禁": 1}})
+    assert detector.detect_ban_words("广告违禁", "1", "9")[:2] == (1, {"违禁": 1})
+    detector.close()
+
+
+def test_templates_shared_with_group_overrides(detector_module):
+    detector = detector_module.get_detector()
+    detector.set_templates({"global": {"广告": 2, "加微信": 3}})
+    detector.set_ban_words({"1": {"广告": 0, "外挂": 4}, "2": {"加微信": 5}})
+    assert detector.detect_ban_words("广告加微信外挂", "1", "9")[:2] == (7, {"加微信": 1, "外挂": 1})
+    assert detector.detect_ban_words("广告加微信外挂", "2", "9")[:2] == (7, {"广告": 1, "加微信": 1})
+    assert detector.detect_ban_words("广告加微信外挂", "3", "9")[:2] == (5, {"广告": 1, "加微信": 1})
+    assert detector.effective_words("1") == {"加微信": (3, "global"), "外挂": (4, "本群")}
+    detector.close()
+
+
+def test_recall_messages_truncate_long_text(detector_module):
+    detector = detector_module.get_detector()
+    detector.set_ban_words({"1": {"违禁": 2}})
+    message = "违禁" + "x" * 300
+    weight, detected, spans = detector.detect_ban_words(message, "1", "9")
+    text = detector.generate_recall_and_ban_message("9", 12, detected, message, spans, 600)
+    assert "【违禁】" in text and "（消息过长已截断）" in text
+    text = detector.generate_recall_warning_message("9", 2, detected, weight, message)
+    assert message[:150] + "..." in text
+    detector.close()
+
+
+def test_close_detector_resets_global(detector_module):
+    detector = detector_module.get_detector()
+    detector_module.close_detector()
+    assert detector_module.detector is None
+    assert detector_module.get_detector() is not detector
+    detector_module.close_detector()
@@ -0,0 +1,82 @@
+# tests/test_dispatcher.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("astrbot")
+
+from juanjuan_copy.dispatcher import ActionDispatcher  # noqa: E402
+from juanjuan_copy.notices import NoticeAggregator  # noqa: E402
+
+
+class FlakyBot:
+    self_id = "bot"
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = []
+
+    async def delete_msg(self, message_id):
+        self.calls.append(message_id)
+        await asyncio.sleep(0.01)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("timeout")
+        return {"ok": message_id}
+
+
+def test_recall_deduplicated_and_remembered():
+    async def run():
+        dispatcher = ActionDispatcher()
+        bot = FlakyBot()
+        first, second = dispatcher.recall(bot, 1), dispatcher.recall(bot, "1")
+        assert second is first
+        await first
+        assert await dispatcher.recall(bot, 1) == {"ok": 1}
+        return bot.calls
+
+    assert asyncio.run(run()) == [1]
+
+
+def test_retries_then_gives_up():
+    async def run():
+        dispatcher = ActionDispatcher(max_retries=2, retry_base_delay=0.001)
+        bot = FlakyBot(failures=2)
+        assert await dispatcher.call(bot, "delete_msg", message_id=1) == {"ok": 1}
+        bot = FlakyBot(failures=5)
+        with pytest.raises(RuntimeError):
+            await dispatcher.call(bot, "delete_msg", message_id=2)
+        return len(bot.calls)
+
+    assert asyncio.run(run()) == 3
+
+
+def test_rate_limited_per_account():
+    async def run():
+        dispatcher = ActionDispatcher(rate=100, burst=2)
+        bot = FlakyBot()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*[dispatcher.call(bot, "delete_msg", message_id=n) for n in range(7)])
+        return loop.time() - start
+
+    assert asyncio.run(run()) >= 0.04
+
+
+def test_notices_coalesced_per_user():
+    sent = []
+
+    async def send(notice):
+        sent.append((notice.user_id, notice.detected_words, notice.weight, notice.violations, notice.score))
+
+    async def run():
+        notices = NoticeAggregator(0.05, send)
+        notices.add("1", "9", None, {"违禁": 1}, 2, 2)
+        notices.add("1", "9", None, {"违禁": 1, "广告": 1}, 5, 7)
+        notices.add("1", "8", None, {"广告": 1}, 3, 3)
+        assert notices.pop("1", "8") is not None
+        await asyncio.sleep(0.1)
+        await notices.close()
+
+    asyncio.run(run())
+    assert sent == [("9", {"违禁": 2, "广告": 1}, 7, 2, 7)]
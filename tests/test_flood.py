@@ -0,0 +1,31 @@
+# tests/test_flood.py
+import time
+
+from juanjuan_copy.flood import FloodDetector
+
+
+def test_triggers_when_limit_exceeded_within_window():
+    flood = FloodDetector(limit=3, window=10)
+    assert [flood.hit("1", "9", now=t) for t in (0, 1, 2, 3)] == [False, False, False, True]
+    # 触发后重新计数，需要再发满 limit + 1 条
+    assert [flood.hit("1", "9", now=t) for t in (4, 5, 6, 7)] == [False, False, False, True]
+
+
+def test_slow_senders_and_other_users_not_counted():
+    flood = FloodDetector(limit=3, window=10)
+    assert not any(flood.hit("1", "9", now=t * 4) for t in range(10))
+    assert not any(flood.hit("1", str(user), now=0) for user in range(10, 20))
+
+
+def test_idle_users_swept():
+    flood = FloodDetector(limit=3, window=10, sweep_interval=0)
+    now = time.monotonic()
+    flood.hit("1", "9", now=now)
+    flood.hit("1", "8", now=now + 15)
+    assert len(flood) == 1
+
+
+def test_disabled_when_limit_is_zero():
+    flood = FloodDetector(limit=0)
+    assert not any(flood.hit("1", "9", now=0) for _ in range(100))
+    assert len(flood) == 0
@@ -0,0 +1,121 @@
+# tests/test_matcher.py
+import asyncio
+import random
+import re
+
+from juanjuan_copy.matcher import (
+    AhoCorasickMatcher, LayeredMatcher, MatcherCache, highlight_message, resolve_overlaps,
+)
+from juanjuan_copy.normalize import normalize, normalize_word
+
+
+def _findall_counts(words, text):
+    """逐词 re.findall 的参考实现（与 Aho-Corasick 之前的做法相同）"""
+    counts = {}
+    for word in words:
+        found = re.findall(re.escape(normalize_word(word)), normalize(text).text)
+        if found:
+            counts[word] = len(found)
+    return counts
+
+
+def test_matches_findall_on_random_input():
+    rng = random.Random(0)
+    alphabet = "ab违禁"
+    for _ in range(300):
+        words = {}
+        for _ in range(rng.randint(1, 6)):
+            words["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4)))] = rng.randint(1, 5)
+        text = "".join(rng.choice(alphabet + "x") for _ in range(rng.randint(0, 40)))
+        weight, detected, spans = AhoCorasickMatcher(words).scan(text)
+        expected = _findall_counts(words, text)
+        assert detected == expected
+        assert weight == sum(words[w] * n for w, n in expected.items())
+        assert len(spans) == sum(expected.values())
+
+
+def test_overlapping_words_counted_independently():
+    weight, detected, _ = AhoCorasickMatcher({"abc": 1, "bc": 2, "c": 3}).scan("abcabc")
+    assert detected == {"abc": 2, "bc": 2, "c": 2}
+    assert weight == 12
+
+
+def test_spans_point_into_original_message():
+    message = "前面ＳＢ后面"
+    _, detected, spans = AhoCorasickMatcher({"sb": 1}).scan(message)
+    assert detected == {"sb": 1}
+    start, end, word = spans[0]
+    assert message[start:end] == "ＳＢ" and word == "sb"
+
+
+def test_detected_words_keep_insertion_order():
+    _, detected, _ = AhoCorasickMatcher({"乙": 1, "甲": 1}).scan("甲乙")
+    assert list(detected) == ["乙", "甲"]
+
+
+
+def test_normalized_duplicates_merged_with_max_weight():
+    matcher = AhoCorasickMatcher({"AB": 1, "ab": 2, "ｃ": 3, "C": 1})
+    assert matcher.merged == {"ab": "AB", "C": "ｃ"}
+    assert matcher.scan("ab c")[:2] == (5, {"AB": 1, "ｃ": 1})
+
+def test_resolve_overlaps_prefers_longer_span():
+    assert resolve_overlaps([(0, 2, "ab"), (0, 3, "abc"), (2, 4, "cd")]) == [(0, 3, "abc")]
+
+
+def test_highlight_marks_original_text():
+    message = "前面ＳＢ后面"
+    _, _, spans = AhoCorasickMatcher({"sb": 1}).scan(message)
+    assert highlight_message(message, spans) == "前面【ＳＢ】后面"
+
+
+def test_highlight_limit_clamps_leading_gap():
+    message = "x" * 300 + "违禁" + "y" * 10
+    _, _, spans = AhoCorasickMatcher({"违禁": 1}).scan(message)
+    assert len(highlight_message(message, spans, limit=200)) == 201
+    assert highlight_message(message, spans, limit=200) == message[:201]
+
+
+def test_highlight_limit_never_exceeds_limit_plus_one():
+    message = "违禁" * 200
+    _, _, spans = AhoCorasickMatcher({"违禁": 1}).scan(message)
+    full = highlight_message(message, spans)
+    for limit in (0, 1, 5, 199, 200):
+        assert highlight_message(message, spans, limit=limit) == full[:limit + 1]
+    short = "a违禁b"
+    _, _, spans = AhoCorasickMatcher({"违禁": 1}).scan(short)
+    assert highlight_message(short, spans, limit=200) == "a【违禁】b"
+
+
+def test_matcher_cache_drops_stale_rebuild():
+    cache = MatcherCache()
+    assert cache.get("1", {"旧": 1}).scan("旧")[0] == 1
+
+    async def race():
+        slow = cache.rebuild("1", {"中间": 1})
+        fast = cache.rebuild("1", {"新": 1})
+        return await asyncio.gather(slow, fast)
+
+    assert asyncio.run(race()) == [False, True]
+    assert cache.get("1", {}).scan("旧中间新")[1] == {"新": 1}
+    assert cache.version("1") == 2
+
+
+def test_fuzzy_gap_skips_short_separator_runs():
+    matcher = AhoCorasickMatcher({"违禁词": 1}, fuzzy_gap=2)
+    message = "这是违.禁 词吗"
+    _, detected, spans = matcher.scan(message)
+    assert detected == {"违禁词": 1}
+    assert message[spans[0][0]:spans[0][1]] == "违.禁 词"
+    assert matcher.scan("违...禁词")[1] == {}
+    assert AhoCorasickMatcher({"违禁词": 1}).scan("违.禁词")[1] == {}
+
+
+def test_layered_matcher_masks_overridden_base_words():
+    base = AhoCorasickMatcher({"广告": 2, "加微信": 3})
+    delta = AhoCorasickMatcher({"加微信": 5})
+    layered = LayeredMatcher(base, delta, {"ＡＤ": 0, "广告": 0, "加微信": 5})
+    weight, detected, spans = layered.scan("广告加微信")
+    assert (weight, detected) == (5, {"加微信": 1})
+    assert [word for _, _, word in spans] == ["加微信"]
+    assert len(layered) == 1
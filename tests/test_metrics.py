@@ -0,0 +1,37 @@
+# tests/test_metrics.py
+from juanjuan_copy.metrics import Histogram, Metrics
+
+
+def test_histogram_quantiles_use_bucket_bounds():
+    histogram = Histogram((0.001, 0.01, 0.1))
+    for value in [0.0005] * 90 + [0.05] * 10:
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 0.001
+    assert histogram.quantile(0.95) == 0.1
+    histogram.observe(5.0)
+    assert histogram.quantile(1.0) == 0.1
+
+
+def test_counters_and_histograms_per_group_and_total():
+    metrics = Metrics()
+    metrics.inc("hits", "1")
+    metrics.inc("hits", "2", 2)
+    metrics.observe("detect", "1", 0.002)
+    metrics.observe("detect", "2", 0.004)
+    assert metrics.counter("hits", "1") == 1
+    assert metrics.counter("hits") == 3
+    assert metrics.histogram("detect").count == 2
+    assert "命中违禁词的消息数：1" in metrics.summary("1")
+
+
+def test_prometheus_export(tmp_path):
+    metrics = Metrics()
+    metrics.inc("bans", "1")
+    metrics.observe("total", "1", 0.003)
+    metrics.register("verdict_cache_hits", "缓存命中", lambda: 7, kind="counter")
+    path = tmp_path / "metrics.prom"
+    metrics.export(str(path))
+    text = path.read_text(encoding="utf-8")
+    assert 'juanjuan_banword_bans_total{group="1"} 1' in text
+    assert "juanjuan_banword_verdict_cache_hits 7" in text
+    assert 'juanjuan_banword_stage_duration_seconds_count{stage="total",group="1"} 1' in text
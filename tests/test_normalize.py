@@ -0,0 +1,26 @@
+# tests/test_normalize.py
+from juanjuan_copy.normalize import normalize, normalize_word, table_digest
+
+
+def test_width_case_and_traditional_folded():
+    assert normalize("ＡＢＣ測試　Ok").text == "abc测试 ok"
+    assert normalize_word("違禁ＷＯＲＤ") == "违禁word"
+
+
+def test_invisible_chars_removed_with_offsets():
+    message = "违​禁﻿词"
+    text = normalize(message)
+    assert text.text == "违禁词"
+    assert text.to_original(0, 3) == (0, 5)
+    assert text.to_original(1, 2) == (2, 3)
+
+
+def test_offsets_omitted_when_nothing_removed():
+    text = normalize("ＳＢ")
+    assert text.offsets is None
+    assert text.to_original(0, 2) == (0, 2)
+
+
+def test_table_digest_is_stable():
+    assert table_digest() == table_digest()
+    assert len(table_digest()) == 32
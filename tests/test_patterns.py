@@ -0,0 +1,109 @@
+# tests/test_patterns.py
+import random
+import re
+import time
+
+import pytest
+
+from juanjuan_copy.matcher import AhoCorasickMatcher
+from juanjuan_copy.patterns import SCAN_WINDOW, PatternSet, compile_rule, rule_key, validate_rule
+
+
+@pytest.mark.parametrize("rule", [
+    r"re:(a+)+",
+    r"re:(a|ab)*",
+    r"re:(a?)*",
+    r"re:(\w)\1",
+    r"re:\d+\d+\d+x",
+    r"re:\s*\s*\s*!",
+    r"re:\s*[:：]?\s*\d",
+    r"re:qq\s*[:]?\s*[:]?\s*\d",
+    r"re:.*a.*b",
+    r"re:(?:\d+|x)\d+",
+    r"re:\d{1,100}\d{1,100}x",
+    r"re:a{1,1000}",
+    r"re:a*",
+    r"re:(?P<name>a)",
+    r"re:[",
+    "wc:a*b*c*d*e",
+])
+def test_unsafe_or_invalid_rules_rejected(rule):
+    with pytest.raises(ValueError):
+        validate_rule(rule)
+
+
+@pytest.mark.parametrize("rule", [
+    r"re:1[3-9]\d{9}",
+    r"re:\d{6,}",
+    r"re:\d+x",
+    r"re:[a-z]+\d+[a-z]+",
+    r"re:\w+@\w+\.com",
+    r"re:v\s*x",
+    r"re:a.*b",
+    "wc:加*微*信",
+    "wc:a*b*c*d",
+    r"re:qq\s*[:：]?\s*\d{5,}",
+    r"re:(?i)foo",
+])
+def test_safe_rules_accepted(rule):
+    compile_rule(rule)
+
+
+def test_leading_inline_flags_scoped_to_rule():
+    patterns = PatternSet(list(enumerate([r"re:(?i)foo", r"re:(?x) b a r  # 注释"])), budget=0)
+    assert [index for _, _, index in patterns.iter_matches("FOO bar")] == [0, 1]
+
+
+def test_plain_words_skip_validation_and_normalize_keys():
+    validate_rule("普通词(")
+    assert rule_key("ＡＢ") == "ab"
+    assert rule_key(r"re:\D") == r"re:\D"
+
+
+def _reference(rules, text):
+    sources = [compile_rule(rule) for rule in rules]
+    regex = re.compile("|".join(f"(?P<p{i}>{s})" for i, s in enumerate(sources)), re.IGNORECASE)
+    return [(m.start(), m.end(), int(m.lastgroup[1:])) for m in regex.finditer(text)]
+
+
+def test_windowed_scan_matches_finditer():
+    rules = [r"re:\d{3,}", r"re:ab+c", r"re:x\d*y", r"re:\d+$", r"re:q(?!\d)", "wc:a*c"]
+    patterns = PatternSet(list(enumerate(rules)), budget=0, max_length=10 ** 9)
+    rng = random.Random(1)
+    for _ in range(200):
+        text = "".join(rng.choice("abcxyq0123 ") for _ in range(rng.randint(0, 600)))
+        assert list(patterns.iter_matches(text)) == _reference(rules, text)
+
+
+
+def test_single_match_length_limited_by_scan_window():
+    patterns = PatternSet([(0, "re:a.*b")], budget=0)
+    for offset in range(SCAN_WINDOW):
+        text = "x" * offset + "a" + "." * (SCAN_WINDOW - 2) + "b"
+        assert list(patterns.iter_matches(text)) == [(offset, offset + SCAN_WINDOW, 0)]
+    # 超过 2 × SCAN_WINDOW 的命中按文档说明会漏检
+    assert list(patterns.iter_matches("a" + "." * 2 * SCAN_WINDOW + "b")) == []
+
+def test_scan_is_capped_and_fast_on_adversarial_input():
+    rules = [r"re:\d+x", r"re:\s+y", r"re:a.*z", "wc:1*1*1*x"] * 5
+    patterns = PatternSet(list(enumerate(rules)), budget=0)
+    start = time.perf_counter()
+    assert list(patterns.iter_matches("1" * 100000)) == []
+    assert list(patterns.iter_matches(" " * 100000)) == []
+    assert time.perf_counter() - start < 1.0
+
+
+def test_budget_interrupts_scan_without_matches():
+    rules = [r"re:\d+x", r"re:[0-9a-f]+g", r"re:\w+z"] * 10
+    patterns = PatternSet(list(enumerate(rules)), budget=0.001)
+    start = time.perf_counter()
+    list(patterns.iter_matches("1" * 1000))
+    assert patterns.timeouts == 1
+    assert time.perf_counter() - start < 0.5
+
+
+def test_invalid_rules_in_data_are_skipped_by_matcher():
+    matcher = AhoCorasickMatcher({r"re:\d+\d+x": 1, r"re:1[3-9]\d{9}": 3, "词": 1})
+    weight, detected, spans = matcher.scan("电话13812345678词")
+    assert detected == {r"re:1[3-9]\d{9}": 1, "词": 1}
+    assert weight == 4
@@ -0,0 +1,52 @@
+# tests/test_pinyin.py
+import pytest
+
+from juanjuan_copy.matcher import AhoCorasickMatcher
+from juanjuan_copy.pinyin import char_pinyin, pinyin_variants
+
+WORDS = {"傻逼": 5, "广告": 2}
+
+
+def test_variants():
+    assert char_pinyin("广") == "guang"
+    assert pinyin_variants("傻逼") == ["shabi", "sb"]
+    # 繁体先转简体
+    assert pinyin_variants("廣告") == ["guanggao", "gg"]
+    # 能查到拼音的汉字太少时不生成变体
+    assert pinyin_variants("傻b") == []
+
+
+@pytest.mark.parametrize("message", [
+    "你是sb吗",
+    "SB",
+    "shabi!",
+    "真是 s b",
+    "看广告gg",
+])
+def test_variants_hit_standalone(message):
+    matcher = AhoCorasickMatcher(WORDS, fuzzy_gap=1, pinyin=True)
+    assert matcher.scan(message)[0] > 0
+
+
+@pytest.mark.parametrize("message", [
+    "plug in the usb cable",
+    "see jsbin.com for the demo",
+    "I like eggs",
+    "ggplot2 and sbt",
+    "noshabiz",
+])
+def test_variants_do_not_hit_inside_english_words(message):
+    matcher = AhoCorasickMatcher(WORDS, fuzzy_gap=1, pinyin=True)
+    assert matcher.scan(message) == (0, {}, [])
+
+
+def test_variant_hits_count_as_original_word():
+    matcher = AhoCorasickMatcher(WORDS, pinyin=True)
+    weight, detected, spans = matcher.scan("傻逼 sb usb shabi")
+    assert detected == {"傻逼": 3}
+    assert weight == 15
+    assert [span[:2] for span in spans] == [(0, 2), (3, 5), (10, 15)]
+
+
+def test_pinyin_off_by_default():
+    assert AhoCorasickMatcher(WORDS).scan("sb") == (0, {}, [])
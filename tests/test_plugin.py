@@ -0,0 +1,232 @@
+# tests/test_plugin.py
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("astrbot")
+
+from juanjuan_copy import main  # noqa: E402
+from juanjuan_copy.storage import atomic_write_json  # noqa: E402
+from juanjuan_copy.tools.replay import ReplayEvent, StubBot, replay  # noqa: E402
+
+
+class CommandEvent:
+    """命令处理函数用到的事件接口"""
+
+    def __init__(self, group_id: str, text: str, admin: bool = True):
+        self.message_str = text
+        self._group_id = group_id
+        self._admin = admin
+
+    def get_group_id(self):
+        return self._group_id
+
+    def get_sender_id(self):
+        return "1"
+
+    def is_admin(self):
+        return self._admin
+
+    def plain_result(self, text):
+        return text
+
+
+def command(generator):
+    async def collect():
+        return [item async for item in generator]
+    return asyncio.run(collect())
+
+
+@pytest.fixture
+def plugin(detector_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "BAN_STATUS_FILE", str(tmp_path / "ban_status.json"))
+    monkeypatch.setattr(main, "METRICS_FILE", str(tmp_path / "metrics.prom"))
+    monkeypatch.setattr(main, "WORDLIST_DIR", str(tmp_path / "wordlists"))
+    instance = main.JuanJuan_Copy(context=None)
+    instance.banword_status["5"] = True
+    yield instance
+    asyncio.run(instance.terminate())
+
+
+def _send(plugin, bot, messages):
+    async def run():
+        for message_id, (user_id, text) in enumerate(messages, 1):
+            await plugin.handle_message(ReplayEvent(bot, "5", user_id, text, message_id))
+        await asyncio.sleep(0.1)
+    asyncio.run(run())
+
+
+RAID = [(user, "大家快来看这个链接好东西") for user in "abcd"]
+
+
+def test_raid_detection_is_opt_in(plugin):
+    bot = StubBot()
+    _send(plugin, bot, RAID)
+    assert bot.calls == []
+
+    assert "已开启" in command(plugin.raid_detection(CommandEvent("5", "/banword raid on")))[0]
+    _send(plugin, bot, RAID)
+    assert [action for action, _ in bot.calls].count("delete_msg") == 4
+
+    command(plugin.raid_detection(CommandEvent("5", "/banword raid off")))
+    assert "5" not in plugin.group_settings
+
+
+def test_raid_reuses_normalized_text(plugin, monkeypatch):
+    calls = []
+    original = main.normalize
+    monkeypatch.setattr(main, "normalize", lambda text: calls.append(text) or original(text))
+    command(plugin.raid_detection(CommandEvent("5", "/banword raid on")))
+    _send(plugin, StubBot(), RAID[:2])
+    assert len(calls) == 2
+
+
+def test_raid_command_requires_admin(plugin):
+    assert "没有权限" in command(plugin.raid_detection(CommandEvent("5", "/banword raid on", admin=False)))[0]
+
+
+@pytest.mark.parametrize(
+    "target",
+    ["../outside.txt", "/tmp/outside.txt", "sub/../../outside.txt", "link/x.txt", ".", "../ban_words.json"],
+)
+def test_import_export_paths_confined_to_wordlist_dir(plugin, tmp_path, target):
+    (tmp_path / "wordlists").mkdir()
+    (tmp_path / "wordlists" / "link").symlink_to(tmp_path)
+    reply = command(plugin.export_word_list(CommandEvent("5", f"/banword export {target}")))[0]
+    assert "数据目录" in reply
+    reply = command(plugin.import_words(CommandEvent("5", f"/banword import {target}")))[0]
+    assert "数据目录" in reply
+
+
+def test_export_then_import_inside_wordlist_dir(plugin, tmp_path):
+    plugin.ban_words["5"] = {"违禁": 2, r"re:\d{6,}": 3}
+    assert "已导出2个" in command(plugin.export_word_list(CommandEvent("5", "/banword export lists/w.txt")))[0]
+    assert (tmp_path / "wordlists" / "lists" / "w.txt").exists()
+    plugin.ban_words["5"] = {}
+    assert "新增 2 个" in command(plugin.import_words(CommandEvent("5", "/banword import lists/w.txt")))[0]
+    assert plugin.ban_words["5"] == {"违禁": 2, r"re:\d{6,}": 3}
+
+
+def test_add_and_remove_rebuild_only_that_group(plugin):
+    plugin.banword_status["6"] = True
+    plugin.ban_words["6"] = {"别的": 1}
+    plugin.detector.set_ban_words(plugin.ban_words)
+    plugin.detector.detect_ban_words("别的", "6", "1")
+    other = plugin.detector._matcher_cache.peek("6")
+
+    command(plugin.add(CommandEvent("5", "/banword add 违禁 3"), "违禁", 3))
+    assert plugin.detector.detect_ban_words("有违禁", "5", "1")[0] == 3
+    command(plugin.remove(CommandEvent("5", "/banword remove 违禁")))
+    assert plugin.detector.detect_ban_words("有违禁", "5", "1")[0] == 0
+    assert plugin.detector._matcher_cache.peek("6") is other
+
+
+
+def test_add_validates_arguments_before_parsing(plugin):
+    assert command(plugin.add(CommandEvent("5", "/banword add 违禁"), "违禁", 0)) == [
+        "❌ 格式错误，应为：/banword add <违禁词> <权重>"
+    ]
+    assert "格式错误" in command(plugin.remove(CommandEvent("5", "/banword remove")))[0]
+    assert "违禁" not in plugin.ban_words.get("5", {})
+
+
+def test_add_and_remove_reply_after_rebuild(plugin, monkeypatch):
+    rebuilt = []
+    refresh_group = plugin.detector.refresh_group
+
+    async def record(group_id):
+        await refresh_group(group_id)
+        rebuilt.append(group_id)
+
+    monkeypatch.setattr(plugin.detector, "refresh_group", record)
+
+    async def first_reply(generator):
+        reply = await generator.__anext__()
+        done = list(rebuilt)
+        await generator.aclose()
+        rebuilt.clear()
+        return reply, done
+
+    reply, done = asyncio.run(first_reply(plugin.add(CommandEvent("5", "/banword add 违禁 3"), "违禁", 3)))
+    assert "成功添加" in reply and done == ["5"]
+    reply, done = asyncio.run(first_reply(plugin.remove(CommandEvent("5", "/banword remove 违禁"))))
+    assert "成功移除" in reply and done == ["5"]
+
+
+
+def test_add_and_list_report_merged_spellings(plugin):
+    sent = []
+
+    class Bot:
+        async def send_private_msg(self, user_id, message):
+            sent.append(message)
+
+    command(plugin.add(CommandEvent("5", "/banword add AB 1"), "AB", 1))
+    reply = command(plugin.add(CommandEvent("5", "/banword add ab 2"), "ab", 2))[0]
+    assert "与【AB】归一化后相同" in reply
+    assert plugin.detector.detect_ban_words("ab", "5", "1")[0] == 2
+
+    event = CommandEvent("5", "/banword list")
+    event.bot = Bot()
+    command(plugin.list_ban_words(event))
+    assert "AB | 1 | 本群 | 与【ab】合并计分" in sent[0]
+    assert "ab | 2 | 本群 | 与【AB】合并计分" in sent[0]
+
+def test_replay_reports_stage_latencies(plugin):
+    corpus = [{"group_id": 5, "user_id": n % 3, "message": "违禁" if n % 4 == 0 else "你好"} for n in range(20)]
+    report = asyncio.run(replay(corpus, {"5": {"违禁": 1}}, 0, StubBot()))
+    assert report["messages"] == 20
+    assert report["stages"]["detect"]["count"] == 20
+    assert report["stages"]["bot.delete_msg"]["count"] == 5
+
+
+def test_stats_counts_hits(plugin):
+    plugin.ban_words["5"] = {"违禁": 1}
+    plugin.detector.set_ban_words(plugin.ban_words)
+    _send(plugin, StubBot(), [("a", "违禁"), ("b", "正常")])
+    summary = command(plugin.stats(CommandEvent("5", "/banword stats")))[0]
+    assert "参与违禁词检测的消息数：2" in summary
+    assert "命中违禁词的消息数：1" in summary
+
+
+def test_external_edit_hot_reloaded(plugin, tmp_path):
+    atomic_write_json(str(tmp_path / "ban_words.json"), {"5": {"外挂": 4}})
+    asyncio.run(plugin.reload_changed_files())
+    assert plugin.detector.detect_ban_words("卖外挂", "5", "1")[0] == 4
+
+
+def test_plugin_uses_shared_detector(plugin, detector_module):
+    assert plugin.detector is detector_module.get_detector()
+    assert not hasattr(main, "BanWordsDetector")
+
+
+def test_reload_after_terminate_gets_fresh_detector(plugin, detector_module):
+    plugin.ban_words["5"] = {"违禁": 2}
+    plugin._save_ban_words([("5", "违禁")])
+    asyncio.run(plugin.terminate())
+    assert detector_module.detector is None
+
+    reloaded = main.JuanJuan_Copy(context=None)
+    assert reloaded.detector is not plugin.detector
+    assert reloaded.detector.detect_ban_words("违禁", "5", "1")[0] == 2
+    reloaded.detector.update_user_score("5", "1", 1)
+    asyncio.run(reloaded.terminate())
+
+
+def test_metrics_rendered_on_event_loop(plugin, tmp_path, monkeypatch):
+    threads = []
+    render = plugin.metrics.render_prometheus
+    monkeypatch.setattr(plugin.metrics, "render_prometheus", lambda: threads.append(threading.get_ident()) or render())
+    monkeypatch.setattr(main, "METRICS_EXPORT_INTERVAL", 0.01)
+
+    async def run():
+        task = asyncio.create_task(plugin._export_metrics_loop())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert threads and set(threads) == {loop_thread}
+    assert "juanjuan_banword_hits_total" in (tmp_path / "metrics.prom").read_text(encoding="utf-8")
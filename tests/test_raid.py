@@ -0,0 +1,41 @@
+# tests/test_raid.py
+from juanjuan_copy.raid import RaidDetector, minhash, similarity
+
+
+SPAM = "加我微信领取免费福利资料"
+
+
+def test_triggers_on_min_users_and_reports_earlier_senders():
+    raid = RaidDetector(min_users=3, window=60)
+    assert raid.observe("1", "a", "m1", SPAM, now=0) is None
+    assert raid.observe("1", "b", "m2", SPAM, now=1) is None
+    assert raid.observe("1", "c", "m3", SPAM, now=2) == [("a", "m1"), ("b", "m2")]
+    assert raid.observe("1", "d", "m4", SPAM, now=3) == []
+
+
+def test_same_user_and_other_groups_do_not_count():
+    raid = RaidDetector(min_users=3)
+    for n in range(5):
+        assert raid.observe("1", "a", str(n), SPAM, now=n) is None
+    assert raid.observe("2", "b", "x", SPAM, now=0) is None
+    assert raid.observe("3", "c", "y", SPAM, now=0) is None
+
+
+def test_window_expiry_and_short_messages():
+    raid = RaidDetector(min_users=2, window=10)
+    raid.observe("1", "a", "m1", SPAM, now=0)
+    assert raid.observe("1", "b", "m2", SPAM, now=20) is None
+    assert raid.observe("1", "a", "m3", "哈哈哈", now=0) is None
+    assert raid.observe("1", "b", "m4", "哈哈哈", now=0) is None
+
+
+def test_near_duplicates_detected():
+    raid = RaidDetector(min_users=2, min_similarity=0.6)
+    raid.observe("1", "a", "m1", SPAM + "快来", now=0)
+    assert raid.observe("1", "b", "m2", SPAM + "速来", now=1) == [("a", "m1")]
+    assert raid.observe("1", "c", "m3", "今天的会议改到下午三点开", now=2) is None
+
+
+def test_minhash_similarity():
+    assert similarity(minhash(SPAM), minhash(SPAM)) == 1.0
+    assert similarity(minhash(SPAM), minhash("今天的会议改到下午三点开")) < 0.2
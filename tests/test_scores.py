@@ -0,0 +1,58 @@
+# tests/test_scores.py
+import pytest
+
+from juanjuan_copy.scores import ScoreDecay, ScoreTable, compact_id
+
+
+def test_exponential_decay_halves_each_half_life():
+    decay = ScoreDecay("exponential", half_life=100)
+    assert decay.apply(8, 0, 100) == pytest.approx(4)
+    assert decay.apply(8, 0, 300) == pytest.approx(1)
+    assert decay.apply(8, 0, 10000) == 0
+
+
+def test_linear_decay_floors_at_zero():
+    decay = ScoreDecay("linear", points_per_hour=2)
+    assert decay.apply(5, 0, 3600) == pytest.approx(3)
+    assert decay.apply(5, 0, 36000) == 0
+
+
+def test_no_decay_keeps_legacy_format():
+    decay = ScoreDecay()
+    assert decay.apply(5, 0, 10 ** 9) == 5
+    assert decay.encode(5, 123.0) == 5
+    assert ScoreDecay.decode(5, now=7.0) == (5, 7.0)
+    assert ScoreDecay.decode([5, 3.0]) == (5, 3.0)
+
+
+def test_invalid_decay_settings_rejected():
+    with pytest.raises(ValueError):
+        ScoreDecay("weekly")
+    with pytest.raises(ValueError):
+        ScoreDecay("exponential", half_life=0)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("123", 123), ("0", 0), ("0123", "0123"), ("abc", "abc"), ("１２", "１２"), ("", ""), ("-1", "-1"),
+])
+def test_compact_id_round_trips(value, expected):
+    assert compact_id(value) == expected
+    assert str(compact_id(value)) == value
+
+
+def test_score_table_load_dump_round_trip():
+    scores = {"1_9": 3, "1_8": 0, "group_user": 2, "01_9": 1}
+    table = ScoreTable()
+    table.load(scores, ScoreDecay.decode, now=10.0)
+    assert len(table) == 4
+    assert table.get("1", "9").score == 3
+    assert table.dump(lambda score, _: score) == scores
+
+
+def test_score_table_evict_and_partial_dump():
+    table = ScoreTable()
+    table.set("1", "9", 3, 0)
+    key = table.set("1", "8", 0, 0)
+    assert table.evict(lambda record: record.score == 0) == [key]
+    assert len(table) == 1
+    assert table.dump(lambda score, _: score, [key, (1, 9)]) == {"1_9": 3}
@@ -0,0 +1,99 @@
+# tests/test_snapshot.py
+import asyncio
+import json
+import time
+
+from juanjuan_copy.matcher import AhoCorasickMatcher, MatcherCache
+from juanjuan_copy.snapshot import _HEADER, SNAPSHOT_MAGIC, MatcherSnapshot, content_key
+
+
+def _index(path):
+    with open(path, "rb") as f:
+        _, _, length = _HEADER.unpack(f.read(_HEADER.size))
+        return json.loads(f.read(length).decode("utf-8"))
+
+
+def test_rebuilds_keep_one_pending_matcher_per_owner(tmp_path):
+    snapshot = MatcherSnapshot(str(tmp_path / "m.cache"))
+    for n in range(20):
+        words = {f"词{n}": 1}
+        snapshot.put(content_key(words), AhoCorasickMatcher(words), owner="1")
+    snapshot.put(content_key({"别的": 1}), AhoCorasickMatcher({"别的": 1}), owner="2")
+    assert len(snapshot) == 2
+
+    snapshot.save()
+    index = _index(tmp_path / "m.cache")
+    assert set(index["owners"]) == {"1", "2"}
+    assert set(index["entries"]) == {content_key({"词19": 1}), content_key({"别的": 1})}
+    snapshot.close()
+
+
+def test_superseded_versions_dropped_on_save(tmp_path):
+    path = str(tmp_path / "m.cache")
+    snapshot = MatcherSnapshot(path)
+    old, new = {"旧": 1}, {"新": 1}
+    snapshot.put(content_key(old), AhoCorasickMatcher(old), owner="1")
+    snapshot.close()
+
+    snapshot = MatcherSnapshot(path)
+    snapshot.put(content_key(new), AhoCorasickMatcher(new), owner="1")
+    snapshot.close()
+    assert set(_index(path)["entries"]) == {content_key(new)}
+
+
+def test_reload_hits_saved_matcher(tmp_path):
+    path = str(tmp_path / "m.cache")
+    words = {"违禁": 2}
+    snapshot = MatcherSnapshot(path)
+    assert snapshot.get(content_key(words), "1") is None
+    snapshot.put(content_key(words), AhoCorasickMatcher(words), owner="1")
+    snapshot.close()
+
+    snapshot = MatcherSnapshot(path)
+    matcher = snapshot.get(content_key(words), "1")
+    assert matcher.scan("有违禁")[1] == {"违禁": 1}
+    assert snapshot.hits == 1
+    snapshot.close()
+
+
+def test_corrupt_or_old_file_treated_as_empty(tmp_path):
+    path = tmp_path / "m.cache"
+    path.write_bytes(b"not a snapshot")
+    assert len(MatcherSnapshot(str(path))) == 0
+
+    path.write_bytes(_HEADER.pack(SNAPSHOT_MAGIC, 1, 2) + b"{}")
+    snapshot = MatcherSnapshot(str(path))
+    assert len(snapshot) == 0
+    snapshot.close()
+
+
+def test_content_key_includes_tables():
+    words = {"违禁": 1}
+    assert content_key(words, None, "a") != content_key(words, None, "b")
+    assert content_key(words, {"fuzzy_gap": 1}) != content_key(words)
+
+
+def test_matcher_cache_rebuild_replaces_pending_entry(tmp_path):
+    snapshot = MatcherSnapshot(str(tmp_path / "m.cache"))
+    cache = MatcherCache(snapshot)
+    cache.get("1", {"甲": 1})
+    for n in range(5):
+        assert asyncio.run(cache.rebuild("1", {f"乙{n}": 1}))
+    assert len(snapshot) == 1
+    assert cache.get("1", {}).scan("乙4")[1] == {"乙4": 1}
+    snapshot.close()
+
+
+def test_put_schedules_background_save(tmp_path):
+    path = str(tmp_path / "m.cache")
+    snapshot = MatcherSnapshot(path, save_interval=0.05)
+    for n in range(5):
+        words = {f"词{n}": 1}
+        snapshot.put(content_key(words), AhoCorasickMatcher(words), owner="1")
+    deadline = time.time() + 2
+    while not (tmp_path / "m.cache").exists() and time.time() < deadline:
+        time.sleep(0.01)
+    # 没有调用 save() / close()，后台已经把最后一次重建的结果写入文件
+    assert set(_index(path)["entries"]) == {content_key({"词4": 1})}
+    assert snapshot.get(content_key({"词4": 1}), "1").scan("词4")[1] == {"词4": 1}
+    snapshot.close()
@@ -0,0 +1,136 @@
+# tests/test_storage.py
+import json
+import os
+import stat
+import threading
+
+import pytest
+
+from juanjuan_copy.storage import (
+    JsonStorage, ScoreJournal, SqliteStorage, WriteBehindWriter, _umask, atomic_write_json,
+    migrate_json_to_sqlite,
+)
+
+
+def test_atomic_write_keeps_original_on_failure(tmp_path):
+    path = tmp_path / "data.json"
+    atomic_write_json(str(path), {"a": 1})
+    with pytest.raises(TypeError):
+        atomic_write_json(str(path), {"a": object()})
+    assert json.loads(path.read_text(encoding="utf-8")) == {"a": 1}
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+def test_write_behind_coalesces_and_retries():
+    flushed = []
+    fail = [True]
+
+    def flush(keys):
+        if fail[0]:
+            raise OSError("disk full")
+        flushed.append(set(keys))
+
+    writer = WriteBehindWriter(flush, interval=60, max_dirty=100)
+    for key in ["a", "b", "a", "a"]:
+        writer.mark_dirty(key)
+    writer.flush()
+    assert writer.pending == 2
+    fail[0] = False
+    writer.close()
+    assert flushed == [{"a", "b"}]
+
+
+def test_write_behind_flushes_when_dirty_limit_reached():
+    done = threading.Event()
+    writer = WriteBehindWriter(lambda keys: done.set(), interval=60, max_dirty=3)
+    for key in range(3):
+        writer.mark_dirty(key)
+    assert done.wait(5)
+    writer.close()
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "json":
+        backend = JsonStorage(str(tmp_path))
+    else:
+        backend = SqliteStorage(str(tmp_path / "banwords.db"))
+    yield backend
+    backend.close()
+
+
+def test_round_trip(storage):
+    ban_words = {"1": {"违禁": 2, "广告": 3}, "2": {"x": 1}}
+    storage.save_ban_words(ban_words, [(g, w) for g, words in ban_words.items() for w in words])
+    storage.save_ban_status({"1": True, "2": False}, ["1", "2"])
+    storage.save_group_settings({"1": {"raid": True}}, ["1"])
+    storage.save_user_scores({"1_9": 3, "1_8": [1.5, 100.0]}, ["1_9", "1_8"])
+    assert storage.load_ban_words() == ban_words
+    assert storage.load_ban_status() == {"1": True, "2": False}
+    assert storage.load_group_settings() == {"1": {"raid": True}}
+    assert storage.load_user_scores() == {"1_9": 3, "1_8": [1.5, 100.0]}
+
+
+def test_sqlite_writes_only_changed_rows(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "banwords.db"))
+    storage.save_ban_words({"1": {"a": 1, "b": 2}}, [("1", "a"), ("1", "b")])
+    # 字典里已经没有 a：按变化的键删除；没有列在 changes 中的 b 保持不变
+    storage.save_ban_words({"1": {"b": 5}}, [("1", "a")])
+    assert storage.load_ban_words() == {"1": {"b": 2}}
+    storage.close()
+
+
+def test_migration_runs_once(tmp_path):
+    json_storage = JsonStorage(str(tmp_path))
+    json_storage.save_ban_words({"1": {"违禁": 2}}, [])
+    json_storage.save_user_scores({"1_9": 4}, [])
+    storage = SqliteStorage(str(tmp_path / "banwords.db"))
+    assert migrate_json_to_sqlite(str(tmp_path), storage)
+    assert storage.load_ban_words() == {"1": {"违禁": 2}}
+    assert storage.load_user_scores() == {"1_9": 4}
+    json_storage.save_ban_words({"1": {"新": 1}}, [])
+    assert not migrate_json_to_sqlite(str(tmp_path), storage)
+    assert storage.load_ban_words() == {"1": {"违禁": 2}}
+    storage.close()
+
+
+def test_journal_replay_is_idempotent_and_skips_torn_line(tmp_path):
+    journal = ScoreJournal(str(tmp_path / "scores.journal"))
+    journal.append("1_9", 2, 2)
+    journal.append("1_9", 3, 5)
+    journal.close()
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"k": "1_8", "d": 1')
+    scores = {}
+    assert journal.replay(scores) == 2
+    journal.replay(scores)
+    assert scores == {"1_9": 5}
+
+
+def test_journal_crash_during_compaction(tmp_path):
+    journal = ScoreJournal(str(tmp_path / "scores.journal"))
+    journal.append("1_9", 2, 2)
+    journal.rotate()
+    # 快照还没写完就崩溃：.old 没有删除，之后又有新的变化
+    journal.append("1_8", 1, 1)
+    journal.rotate()
+    journal.append("1_9", 1, 3)
+    journal.close()
+
+    scores = {"1_9": 0}
+    ScoreJournal(journal.path).replay(scores)
+    assert scores == {"1_9": 3, "1_8": 1}
+
+    journal.discard_rotated()
+    scores = {}
+    ScoreJournal(journal.path).replay(scores)
+    assert scores == {"1_9": 3}
+
+
+def test_atomic_write_keeps_file_mode(tmp_path):
+    path = tmp_path / "data.json"
+    atomic_write_json(str(path), {})
+    assert stat.S_IMODE(path.stat().st_mode) == 0o666 & ~_umask()
+    os.chmod(path, 0o640)
+    atomic_write_json(str(path), {"a": 1})
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
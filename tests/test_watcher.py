@@ -0,0 +1,33 @@
+# tests/test_watcher.py
+import os
+
+from juanjuan_copy.storage import atomic_write_json
+from juanjuan_copy.watcher import FileWatcher, changed_groups, group_digest, group_digests
+
+
+def test_digest_ignores_order_and_finds_changed_groups():
+    assert group_digest({"a": 1, "b": 2}) == group_digest({"b": 2, "a": 1})
+    old = group_digests({"1": {"a": 1}, "2": {"b": 1}, "3": {"c": 1}})
+    new = group_digests({"1": {"a": 1}, "2": {"b": 2}, "4": {"d": 1}})
+    assert sorted(changed_groups(old, new)) == ["2", "3", "4"]
+
+
+def test_poll_reports_external_replace_once(tmp_path):
+    path = str(tmp_path / "ban_words.json")
+    atomic_write_json(path, {})
+    watcher = FileWatcher({"ban_words": path})
+    assert watcher.poll() == []
+    atomic_write_json(path, {"1": {"a": 1}})
+    assert watcher.poll() == ["ban_words"]
+    assert watcher.poll() == []
+
+
+def test_missing_file_and_own_writes_not_reported(tmp_path):
+    path = str(tmp_path / "ban_words.json")
+    atomic_write_json(path, {})
+    watcher = FileWatcher({"ban_words": path})
+    os.remove(path)
+    assert watcher.poll() == []
+    atomic_write_json(path, {"1": {}})
+    watcher.mark("ban_words")
+    assert watcher.poll() == []
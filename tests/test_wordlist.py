@@ -0,0 +1,58 @@
+# tests/test_wordlist.py
+import pytest
+
+from juanjuan_copy.wordlist import FORMATS, detect_format, export_words, iter_entries, plan_import
+
+WORDS = {
+    "违禁词": 3,
+    "带 空格": 2,
+    "a,b": 1,
+    "屏蔽": 0,
+    r"re:\d{6,}": 2,
+    r"re:1[3-9]\d{9}": 5,
+    "wc:加*微*信": 4,
+}
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_export_import_round_trip(tmp_path, fmt):
+    path = tmp_path / f"words.{fmt}"
+    assert export_words(WORDS, str(path)) == len(WORDS)
+    entries = list(iter_entries(str(path)))
+    assert [error for _, _, _, error in entries] == [None] * len(WORDS)
+    assert {word: weight for _, word, weight, _ in entries} == WORDS
+
+
+def test_txt_line_forms(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_text("# 注释\n甲\n乙 5\n丙,6\nre:\\d{2,4} 7\n", encoding="utf-8")
+    entries = [(word, weight) for _, word, weight, _ in iter_entries(str(path), default_weight=2)]
+    assert entries == [("甲", 2), ("乙", 5), ("丙", 6), ("re:\\d{2,4}", 7)]
+
+
+def test_invalid_lines_are_reported(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_text("好词 1\nre:(a+)+ 2\n坏词,-1\n", encoding="utf-8")
+    errors = [(line_no, error is not None) for line_no, _, _, error in iter_entries(str(path))]
+    assert errors == [(1, False), (2, True), (3, True)]
+
+
+def test_plan_import_merges_normalized_duplicates(tmp_path):
+    path = tmp_path / "words.csv"
+    path.write_text("word,weight\nＡＢ,3\nab,4\n新词,1\n旧词,2\n", encoding="utf-8")
+    updates, result = plan_import({"ab": 1, "旧词": 2}, str(path))
+    assert updates == {"ab": 3, "新词": 1}
+    assert (result.added, result.updated, result.unchanged, result.duplicates) == (1, 1, 1, 1)
+
+
+def test_plan_import_rejects_zero_when_not_allowed(tmp_path):
+    path = tmp_path / "words.jsonl"
+    path.write_text('{"word": "词", "weight": 0}\n["另一个", 2]\n', encoding="utf-8")
+    updates, result = plan_import({}, str(path), allow_zero=False)
+    assert updates == {"另一个": 2} and result.rejected == 1
+
+
+def test_detect_format():
+    assert detect_format("a.CSV") == "csv"
+    assert detect_format("a.json") == "jsonl"
+    assert detect_format("a.list") == "txt"
@@ -0,0 +1 @@
+# 离线工具：消息回放压测、基准测试等，不会被插件本身加载
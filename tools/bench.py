@@ -0,0 +1,263 @@
+# tools/bench.py
+"""
+违禁词检测、分数更新和提示消息生成的基准测试
+
+需要在装有 AstrBot 的环境中，以包的形式运行（插件目录的上一级为当前目录）：
+
+    # 运行全部用例，结果写入 JSON
+    python -m astrbot_plugin_juanjuan_copy.tools.bench run --output bench_results.json
+    # 只跑小规模用例 / 只跑名字包含 detect 的用例
+    python -m astrbot_plugin_juanjuan_copy.tools.bench run --quick --filter detect
+    # 对比两次结果，耗时增加超过 10% 的用例标记为退化（存在退化时退出码为 1）
+    python -m astrbot_plugin_juanjuan_copy.tools.bench compare base.json new.json --threshold 10
+
+所有数据都是按固定随机种子合成的：违禁词 10 ~ 100k 个，消息 10 ~ 10k 字，
+中文 / 英文 / 混合三种字符集，命中率 0 ~ 50%。detect_ban_words 在关闭检测结果缓存的情况下
+测量扫描本身；不超过缓存长度上限的消息另外记录缓存命中的耗时（detect_ban_words_cached）。
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import timeit
+from typing import Callable, Dict, List, Optional
+
+from .. import main
+from ..matcher import VerdictCache
+from .replay import use_data_dir
+
+WORD_COUNTS = [10, 100, 1000, 10000, 100000]
+MESSAGE_LENGTHS = [10, 100, 1000, 10000]
+SCRIPTS = ["cjk", "latin", "mixed"]
+HIT_RATES = [0.0, 0.1, 0.5]
+
+QUICK_WORD_COUNTS = [10, 1000]
+QUICK_MESSAGE_LENGTHS = [10, 1000]
+QUICK_SCRIPTS = ["cjk", "mixed"]
+QUICK_HIT_RATES = [0.0, 0.1]
+
+GROUP_ID = "10000"
+
+
+def _random_char(rng: random.Random, script: str) -> str:
+    if script == "cjk" or (script == "mixed" and rng.random() < 0.5):
+        return chr(rng.randint(0x4E00, 0x9FA5))
+    return chr(rng.randint(ord("a"), ord("z")))
+
+
+def make_words(count: int, script: str, seed: int = 1) -> Dict[str, int]:
+    """生成 count 个不重复的违禁词，长度 2 ~ 5"""
+    rng = random.Random(seed)
+    words: Dict[str, int] = {}
+    while len(words) < count:
+        word = "".join(_random_char(rng, script) for _ in range(rng.randint(2, 5)))
+        words[word] = rng.randint(1, 5)
+    return words
+
+
+def make_message(length: int, script: str, words: List[str], hit_rate: float, seed: int = 2) -> str:
+    """
+    生成长度约为 length 的消息
+
+    按片段拼接：每个片段以 hit_rate 的概率是一个违禁词，否则是 1 ~ 6 个随机字符。
+    """
+    rng = random.Random(seed)
+    parts: List[str] = []
+    size = 0
+    while size < length:
+        if words and rng.random() < hit_rate:
+            part = rng.choice(words)
+        else:
+            part = "".join(_random_char(rng, script) for _ in range(rng.randint(1, 6)))
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)[:length]
+
+
+def measure(func: Callable[[], object], min_time: float = 0.2, repeat: int = 3) -> float:
+    """返回单次调用的最短平均耗时（秒）"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+class BenchRunner:
+    def __init__(self, quick: bool = False, name_filter: Optional[str] = None, min_time: float = 0.2):
+        self.quick = quick
+        self.name_filter = name_filter
+        self.min_time = min_time
+        self.results: List[dict] = []
+
+    def _wanted(self, name: str) -> bool:
+        return not self.name_filter or self.name_filter in name
+
+    def _record(self, name: str, params: dict, seconds: float):
+        self.results.append({"name": name, "params": params, "ns_per_op": seconds * 1e9})
+        param_text = " ".join(f"{k}={v}" for k, v in params.items())
+        print(f"{name:<32}{param_text:<60}{seconds * 1e6:>14.2f} us/op", flush=True)
+
+    def run(self) -> List[dict]:
+        detector = main.get_detector()
+        # 同一条消息会被反复检测，开着检测结果缓存测到的只是缓存查找；
+        # 扫描耗时在关闭缓存时测量，缓存命中的耗时单独记为 detect_ban_words_cached
+        verdict_cache = detector._verdict_cache
+        uncached = VerdictCache(0)
+        detector._verdict_cache = uncached
+        try:
+            return self._run(detector, verdict_cache, uncached)
+        finally:
+            detector._verdict_cache = verdict_cache
+
+    def _run(self, detector, verdict_cache: VerdictCache, uncached: VerdictCache) -> List[dict]:
+        word_counts = QUICK_WORD_COUNTS if self.quick else WORD_COUNTS
+        lengths = QUICK_MESSAGE_LENGTHS if self.quick else MESSAGE_LENGTHS
+        scripts = QUICK_SCRIPTS if self.quick else SCRIPTS
+        hit_rates = QUICK_HIT_RATES if self.quick else HIT_RATES
+
+        if self._wanted("detect") or self._wanted("build"):
+            for count in word_counts:
+                for script in scripts:
+                    words = make_words(count, script)
+                    word_list = list(words)
+                    detector.set_ban_words({GROUP_ID: words})
+
+                    if self._wanted("build"):
+                        start = time.perf_counter()
+                        detector.detect_ban_words("", GROUP_ID, "1")
+                        self._record("build_matcher", {"words": count, "script": script},
+                                     time.perf_counter() - start)
+                    if not self._wanted("detect"):
+                        continue
+                    for length in lengths:
+                        for hit_rate in hit_rates:
+                            message = make_message(length, script, word_list, hit_rate)
+                            seconds = measure(lambda: detector.detect_ban_words(message, GROUP_ID, "1"),
+                                              self.min_time)
+                            params = {"words": count, "length": length, "script": script, "hit_rate": hit_rate}
+                            self._record("detect_ban_words", params, seconds)
+                            if not self._wanted("detect_ban_words_cached") or not verdict_cache.cacheable(message):
+                                continue
+                            detector._verdict_cache = verdict_cache
+                            try:
+                                seconds = measure(lambda: detector.detect_ban_words(message, GROUP_ID, "1"),
+                                                  self.min_time)
+                            finally:
+                                detector._verdict_cache = uncached
+                            self._record("detect_ban_words_cached", params, seconds)
+
+        if self._wanted("update_user_score"):
+            for users in ([100, 10000] if self.quick else [100, 10000, 100000]):
+                rng = random.Random(3)
+                user_ids = [str(rng.randint(10000, 999999999)) for _ in range(users)]
+                index = [0]
+
+                def update():
+                    i = index[0] = (index[0] + 1) % users
+                    detector.update_user_score(GROUP_ID, user_ids[i], 1)
+
+                self._record("update_user_score", {"users": users}, measure(update, self.min_time))
+            detector.flush()
+
+        if self._wanted("generate"):
+            words = make_words(100, "mixed")
+            for length in lengths:
+                message = make_message(length, "mixed", list(words), 0.1)
+                detector.set_ban_words({GROUP_ID: words})
+                weight, detected, spans = detector.detect_ban_words(message, GROUP_ID, "1")
+                formatters = {
+                    "generate_ban_message":
+                        lambda: detector.generate_ban_message("1", 12, detected, message, spans, 600),
+                    "generate_recall_and_ban_message":
+                        lambda: detector.generate_recall_and_ban_message("1", 12, detected, message, spans, 600),
+                    "generate_warning_message":
+                        lambda: detector.generate_warning_message("1", 5, detected, weight),
+                    "generate_recall_warning_message":
+                        lambda: detector.generate_recall_warning_message("1", 5, detected, weight, message),
+                }
+                for name, func in formatters.items():
+                    if self._wanted(name):
+                        self._record(name, {"length": length, "hits": len(spans)}, measure(func, self.min_time))
+
+        return self.results
+
+
+def _case_key(result: dict) -> str:
+    params = ",".join(f"{k}={v}" for k, v in sorted(result["params"].items()) if k != "hits")
+    return f"{result['name']}[{params}]"
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> int:
+    """
+    对比两次结果
+
+    Returns:
+        退化的用例数量
+    """
+    with open(base_path, "r", encoding="utf-8") as f:
+        base = {_case_key(r): r for r in json.load(f)["results"]}
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = {_case_key(r): r for r in json.load(f)["results"]}
+
+    regressions = 0
+    print(f"{'用例':<90}{'基准(us)':>12}{'当前(us)':>12}{'变化':>10}")
+    for key in sorted(base.keys() & new.keys()):
+        old_ns, new_ns = base[key]["ns_per_op"], new[key]["ns_per_op"]
+        change = (new_ns - old_ns) / old_ns * 100 if old_ns else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  ⚠️ 退化"
+            regressions += 1
+        elif change < -threshold:
+            flag = "  ✅ 提升"
+        print(f"{key:<90}{old_ns / 1000:>12.2f}{new_ns / 1000:>12.2f}{change:>9.1f}%{flag}")
+    for key in sorted(base.keys() - new.keys()):
+        print(f"{key:<90}（当前结果中缺少该用例）")
+    print(f"共 {len(base.keys() & new.keys())} 个用例，{regressions} 个退化（阈值 {threshold}%）")
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="违禁词插件基准测试")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="运行基准测试")
+    run_parser.add_argument("--output", default="bench_results.json", help="结果输出文件")
+    run_parser.add_argument("--quick", action="store_true", help="只跑小规模用例")
+    run_parser.add_argument("--filter", help="只跑名字包含该字符串的用例")
+    run_parser.add_argument("--min-time", type=float, default=0.2, help="每个用例每轮的最短计时（秒）")
+
+    compare_parser = sub.add_parser("compare", help="对比两次结果")
+    compare_parser.add_argument("base", help="基准结果文件")
+    compare_parser.add_argument("new", help="当前结果文件")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="判定为退化的耗时增幅（百分比）")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        sys.exit(1 if compare(args.base, args.new, args.threshold) else 0)
+
+    with tempfile.TemporaryDirectory(prefix="banword_bench_") as tmp:
+        use_data_dir(tmp)
+        results = BenchRunner(args.quick, args.filter, args.min_time).run()
+        main.get_detector().close()
+
+    report = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,266 @@
+# tools/replay.py
+"""
+离线回放压测：用本地假的 OneBot 客户端驱动 JuanJuan_Copy.handle_message
+
+需要在装有 AstrBot 的环境中，以包的形式运行（插件目录的上一级为当前目录）：
+
+    python -m astrbot_plugin_juanjuan_copy.tools.replay corpus.jsonl \\
+        --ban-words words.json --rate 500 --bot-latency 30
+
+corpus.jsonl 每行一条群消息：
+    {"group_id": "123", "user_id": "456", "message": "...", "message_id": 1, "is_admin": false}
+message_id / is_admin 可省略。words.json 格式与 data/ban_words.json 相同。
+
+回放使用临时数据目录，不会改动插件 data/ 下的真实数据。
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List
+
+from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event import AiocqhttpMessageEvent
+
+from .. import BanWordsDetector as detector_module
+from .. import main
+
+
+class StubBot:
+    """
+    假的 OneBot 客户端
+
+    任意 API 调用（delete_msg、set_group_ban 等）都会按设定的延迟 sleep 后返回，
+    并记录调用参数和耗时。
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0):
+        """
+        Args:
+            latency: 每次调用的模拟延迟（秒）
+            jitter: 在 latency 基础上随机增加 0~jitter 秒
+            failure_rate: 调用随机失败的概率
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.calls: List[tuple] = []
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+
+    def __getattr__(self, action: str):
+        if action.startswith("_"):
+            raise AttributeError(action)
+
+        async def call(**params):
+            start = time.perf_counter()
+            await asyncio.sleep(self.latency + random.random() * self.jitter)
+            self.calls.append((action, params))
+            self.timings[action].append(time.perf_counter() - start)
+            if self.failure_rate and random.random() < self.failure_rate:
+                raise RuntimeError(f"模拟 {action} 调用失败")
+            return {}
+
+        return call
+
+
+class _MessageObj:
+    __slots__ = ("message_id",)
+
+    def __init__(self, message_id):
+        self.message_id = message_id
+
+
+class ReplayEvent(AiocqhttpMessageEvent):
+    """只实现 handle_message 用到的接口的假事件，不调用父类构造函数"""
+
+    def __init__(self, bot: StubBot, group_id: str, user_id: str, message: str,
+                 message_id: int, is_admin: bool = False):
+        self.bot = bot
+        self.message_str = message
+        self.message_obj = _MessageObj(message_id)
+        self._group_id = group_id
+        self._user_id = user_id
+        self._is_admin = is_admin
+
+    def get_group_id(self) -> str:
+        return self._group_id
+
+    def get_sender_id(self) -> str:
+        return self._user_id
+
+    def is_admin(self) -> bool:
+        return self._is_admin
+
+    def plain_result(self, text: str):
+        return text
+
+
+def load_corpus(path: str) -> Iterator[dict]:
+    """逐行读取 JSONL 语料"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def use_data_dir(data_dir: str):
+    """
+    把插件的数据路径指向 data_dir，并关闭已有的全局检测器
+
+    之后第一次调用 main.get_detector()（包括创建插件实例）时按新路径创建检测器，
+    导入 main 本身不会读写数据目录。
+    """
+    detector_module.DATA_DIR = data_dir
+    detector_module.BAN_WORDS_FILE = os.path.join(data_dir, "ban_words.json")
+    detector_module.USER_SCORE_FILE = os.path.join(data_dir, "user_scores.json")
+    detector_module.SCORE_JOURNAL_FILE = os.path.join(data_dir, "user_scores.journal")
+    detector_module.MATCHER_SNAPSHOT_FILE = os.path.join(data_dir, "matchers.cache")
+    main.DATA_DIR = data_dir
+    main.BAN_STATUS_FILE = os.path.join(data_dir, "ban_status.json")
+    main.METRICS_FILE = os.path.join(data_dir, "metrics.prom")
+    main.WORDLIST_DIR = os.path.join(data_dir, "wordlists")
+    detector_module.close_detector()
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩法求分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": max(values) * 1000 if values else 0.0,
+    }
+
+
+def _timed(func, bucket: List[float]):
+    """包装检测器方法，记录每次调用耗时"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            bucket.append(time.perf_counter() - start)
+    return wrapper
+
+
+async def replay(corpus: List[dict], ban_words: Dict, rate: float, bot: StubBot) -> dict:
+    """
+    按目标速率并发回放语料
+
+    Args:
+        corpus: 消息列表
+        ban_words: {群号: {违禁词: 权重}}
+        rate: 目标速率（条/秒），0 表示不限速
+        bot: 假的 OneBot 客户端
+
+    Returns:
+        统计结果
+    """
+    plugin = main.JuanJuan_Copy(context=None)
+    plugin.ban_words.update(ban_words)
+    plugin.storage.save_ban_words(plugin.ban_words, [(g, w) for g, words in ban_words.items() for w in words])
+    for group_id in {str(item["group_id"]) for item in corpus}:
+        plugin.banword_status[group_id] = True
+    plugin.detector.set_ban_words(plugin.ban_words)
+
+    stages: Dict[str, List[float]] = defaultdict(list)
+    detector = plugin.detector
+    detector.detect_ban_words = _timed(detector.detect_ban_words, stages["detect"])
+    detector.update_user_score = _timed(detector.update_user_score, stages["update_score"])
+
+    replies = 0
+
+    async def handle(event: ReplayEvent):
+        nonlocal replies
+        start = time.perf_counter()
+        result = await plugin.handle_message(event)
+        stages["handle_message"].append(time.perf_counter() - start)
+        if result is not None:
+            replies += 1
+
+    tasks = []
+    interval = 1.0 / rate if rate > 0 else 0.0
+    began = time.perf_counter()
+    for index, item in enumerate(corpus):
+        if interval:
+            delay = began + index * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        event = ReplayEvent(
+            bot,
+            str(item["group_id"]),
+            str(item["user_id"]),
+            item["message"],
+            item.get("message_id", index + 1),
+            item.get("is_admin", False),
+        )
+        tasks.append(asyncio.create_task(handle(event)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - began
+
+    await plugin.terminate()
+
+    for action, timings in bot.timings.items():
+        stages[f"bot.{action}"] = timings
+    return {
+        "messages": len(corpus),
+        "replies": replies,
+        "elapsed_s": elapsed,
+        "throughput_msg_s": len(corpus) / elapsed if elapsed else 0.0,
+        "stages": {name: summarize(values) for name, values in stages.items()},
+    }
+
+
+def print_report(report: dict):
+    print(f"消息数：{report['messages']}  回复数：{report['replies']}  "
+          f"耗时：{report['elapsed_s']:.2f}s  吞吐：{report['throughput_msg_s']:.1f} 条/秒")
+    print(f"{'阶段':<24}{'次数':>8}{'p50(ms)':>12}{'p95(ms)':>12}{'p99(ms)':>12}{'max(ms)':>12}")
+    for name, s in report["stages"].items():
+        print(f"{name:<24}{s['count']:>8}{s['p50_ms']:>12.3f}{s['p95_ms']:>12.3f}"
+              f"{s['p99_ms']:>12.3f}{s['max_ms']:>12.3f}")
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="离线回放群消息，统计违禁词插件各阶段延迟")
+    parser.add_argument("corpus", help="JSONL 格式的群消息语料")
+    parser.add_argument("--ban-words", help="违禁词 JSON 文件，格式同 data/ban_words.json")
+    parser.add_argument("--rate", type=float, default=0, help="目标速率（条/秒），0 表示不限速")
+    parser.add_argument("--bot-latency", type=float, default=0, help="模拟 OneBot 调用延迟（毫秒）")
+    parser.add_argument("--bot-jitter", type=float, default=0, help="在延迟基础上的随机抖动（毫秒）")
+    parser.add_argument("--bot-failure-rate", type=float, default=0, help="模拟调用失败的概率")
+    parser.add_argument("--data-dir", help="回放使用的数据目录，默认使用临时目录")
+    parser.add_argument("--output", help="把统计结果写入该 JSON 文件")
+    args = parser.parse_args(argv)
+
+    ban_words = {}
+    if args.ban_words:
+        with open(args.ban_words, "r", encoding="utf-8") as f:
+            ban_words = json.load(f)
+    corpus = list(load_corpus(args.corpus))
+
+    with tempfile.TemporaryDirectory(prefix="banword_replay_") as tmp:
+        use_data_dir(args.data_dir or tmp)
+        bot = StubBot(args.bot_latency / 1000, args.bot_jitter / 1000, args.bot_failure_rate)
+        report = asyncio.run(replay(corpus, ban_words, args.rate, bot))
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
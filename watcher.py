@@ -0,0 +1,66 @@
+# watcher.py
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+
+def group_digest(words: Dict[str, int]) -> str:
+    """单个群违禁词字典的摘要，内容相同（与顺序无关）时摘要相同"""
+    data = json.dumps(words, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def group_digests(ban_words: Dict[str, Dict[str, int]]) -> Dict[str, str]:
+    """{群号: 摘要}"""
+    return {group_id: group_digest(words) for group_id, words in ban_words.items()}
+
+
+def changed_groups(old: Dict[str, str], new: Dict[str, str]) -> List[str]:
+    """比较两份摘要，返回新增、删除或内容变化的群号"""
+    return [group_id for group_id in set(old) | set(new) if old.get(group_id) != new.get(group_id)]
+
+
+class FileWatcher:
+    """
+    按 (修改时间, 大小, inode) 轮询一组文件是否被外部修改
+
+    每次检查只需要对每个文件做一次 stat，足够便宜，可以每隔几秒调用一次。
+    原子替换（先写临时文件再 rename）会改变 inode，也能被发现。
+    文件暂时不存在时不视为变化（避免部署工具先删后建的瞬间把数据当作清空），
+    重新出现后再报告。
+    """
+
+    def __init__(self, paths: Dict[str, str]):
+        """
+        Args:
+            paths: {名称: 文件路径}
+        """
+        self.paths = dict(paths)
+        self._signatures: Dict[str, Optional[Tuple[int, int, int]]] = {
+            key: self._stat(path) for key, path in self.paths.items()
+        }
+
+    @staticmethod
+    def _stat(path: str) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def poll(self) -> List[str]:
+        """返回自上次检查（或 mark）以来发生变化的文件名称"""
+        changed = []
+        for key, path in self.paths.items():
+            signature = self._stat(path)
+            if signature is None or signature == self._signatures[key]:
+                continue
+            self._signatures[key] = signature
+            changed.append(key)
+        return changed
+
+    def mark(self, key: str):
+        """插件自己写入文件后调用，把当前状态记为已同步，不再当作外部修改"""
+        if key in self.paths:
+            self._signatures[key] = self._stat(self.paths[key])
@@ -0,0 +1,191 @@
+# wordlist.py
+import csv
+import io
+import json
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .normalize import normalize_word
+from .patterns import is_pattern, rule_key, validate_rule
+from .storage import atomic_write_text
+
+FORMATS = ("txt", "csv", "jsonl")
+# 违禁词最大长度，过长的通常是把整行文本误当成了词
+MAX_WORD_LENGTH = 50
+# 导入结果中最多保留的错误示例条数
+MAX_ERROR_SAMPLES = 5
+
+
+def detect_format(path: str) -> str:
+    """按扩展名判断文件格式，无法识别时按 txt 处理"""
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext == "json":
+        return "jsonl"
+    return ext if ext in FORMATS else "txt"
+
+
+def _parse_fields(line: str, fmt: str) -> Tuple[object, object]:
+    """把一行拆成 (违禁词, 权重)，权重可能为 None"""
+    if fmt == "jsonl":
+        item = json.loads(line)
+        if isinstance(item, dict):
+            return item.get("word"), item.get("weight")
+        if isinstance(item, list) and item:
+            return item[0], item[1] if len(item) > 1 else None
+        raise ValueError("应为对象或数组")
+    if fmt == "csv":
+        fields = next(csv.reader(io.StringIO(line)))
+    elif "," in line and not is_pattern(line):
+        fields = line.rsplit(",", 1)
+    else:
+        # 违禁词本身可能含有空格，最后一段为权重；模式规则中常有逗号，只按空白拆分
+        fields = line.rsplit(None, 1)
+        if len(fields) == 2 and not fields[1].lstrip("-").isdigit():
+            fields = [line]
+    return fields[0], fields[1] if len(fields) > 1 else None
+
+
+def _validate(word, weight, default_weight: int) -> Tuple[str, int]:
+    if not isinstance(word, str) or not word.strip():
+        raise ValueError("违禁词为空")
+    word = word.strip()
+    if is_pattern(word):
+        validate_rule(word)
+    elif len(word) > MAX_WORD_LENGTH:
+        raise ValueError(f"违禁词超过{MAX_WORD_LENGTH}个字符")
+    if not normalize_word(word):
+        raise ValueError("违禁词只包含不可见字符")
+    if weight is None or (isinstance(weight, str) and not weight.strip()):
+        return word, default_weight
+    if isinstance(weight, bool) or (isinstance(weight, float) and not weight.is_integer()):
+        raise ValueError(f"权重必须为整数：{weight}")
+    weight = int(weight)
+    if weight < 0:
+        raise ValueError(f"权重不能为负数：{weight}")
+    return word, weight
+
+
+def iter_entries(path: str, fmt: Optional[str] = None,
+                 default_weight: int = 1) -> Iterator[Tuple[int, Optional[str], Optional[int], Optional[str]]]:
+    """
+    逐行解析词表文件，不会把整个文件读入内存
+
+    支持的格式：
+    - txt：每行 "违禁词 权重"、"违禁词,权重" 或只有违禁词（使用默认权重），# 开头为注释；
+      模式规则（re: / wc:）只能用 "规则 权重" 的形式
+    - csv：两列 违禁词,权重，第一行为 word,weight 表头时跳过
+    - jsonl：每行 {"word": ..., "weight": ...} 或 [违禁词, 权重]
+
+    权重为 0 表示在群内屏蔽订阅模板中的同名词。
+
+    Yields:
+        (行号, 违禁词, 权重, 错误信息)，解析失败时违禁词和权重为 None
+    """
+    fmt = fmt or detect_format(path)
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or (fmt == "txt" and line.startswith("#")):
+                continue
+            if fmt == "csv" and line_no == 1 and line.replace(" ", "").lower() in ("word,weight", "违禁词,权重"):
+                continue
+            try:
+                word, weight = _validate(*_parse_fields(line, fmt), default_weight)
+            except (ValueError, TypeError, StopIteration) as e:
+                yield line_no, None, None, str(e) or type(e).__name__
+            else:
+                yield line_no, word, weight, None
+
+
+class ImportResult:
+    """一次导入的统计"""
+
+    def __init__(self):
+        self.added = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.errors: List[str] = []
+
+    def reject(self, line_no: int, reason: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_ERROR_SAMPLES:
+            self.errors.append(f"第{line_no}行：{reason}")
+
+    def summary(self) -> str:
+        lines = [
+            f"新增 {self.added} 个，更新权重 {self.updated} 个，未变化 {self.unchanged} 个，"
+            f"文件内重复 {self.duplicates} 个，拒绝 {self.rejected} 个"
+        ]
+        if self.errors:
+            lines.append("拒绝示例：")
+            lines.extend(f"  • {error}" for error in self.errors)
+        return "\n".join(lines)
+
+
+def plan_import(current: Dict[str, int], path: str, fmt: Optional[str] = None,
+                default_weight: int = 1, allow_zero: bool = True) -> Tuple[Dict[str, int], ImportResult]:
+    """
+    解析词表文件并与现有词表比较，只计算需要写入的变化，不修改 current
+
+    模式规则（re: / wc:）在这里检查是否安全。文件内归一化后重复的词只保留第一次出现；与现有词归一化后相同（如全角/半角不同）的词
+    视为更新现有词的权重，不会新增一个写法不同的重复词。
+
+    Args:
+        current: 现有的 {违禁词: 权重}
+        path: 词表文件路径
+        allow_zero: 是否接受权重为 0 的屏蔽标记（模板中没有意义）
+
+    Returns:
+        Tuple[{违禁词: 新权重}（只含新增和更新的词）, 导入统计]
+    """
+    existing = {rule_key(word): word for word in current}
+    seen = set()
+    updates: Dict[str, int] = {}
+    result = ImportResult()
+    for line_no, word, weight, error in iter_entries(path, fmt, default_weight):
+        if error is None and weight == 0 and not allow_zero:
+            error = "权重必须为正整数"
+        if error is not None:
+            result.reject(line_no, error)
+            continue
+        key = rule_key(word)
+        if key in seen:
+            result.duplicates += 1
+            continue
+        seen.add(key)
+        target = existing.get(key)
+        if target is None:
+            updates[word] = weight
+            result.added += 1
+        elif current[target] == weight:
+            result.unchanged += 1
+        else:
+            updates[target] = weight
+            result.updated += 1
+    return updates, result
+
+
+def export_words(words: Dict[str, int], path: str, fmt: Optional[str] = None) -> int:
+    """
+    把词表写入文件（原子写入），格式与 iter_entries 对应
+
+    Returns:
+        写入的条数
+    """
+    fmt = fmt or detect_format(path)
+    if fmt == "jsonl":
+        lines = [json.dumps({"word": word, "weight": weight}, ensure_ascii=False) for word, weight in words.items()]
+    elif fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(("word", "weight"))
+        writer.writerows(words.items())
+        atomic_write_text(path, buffer.getvalue())
+        return len(words)
+    else:
+        # 模式规则中常有逗号，按 iter_entries 的约定写成 "规则 权重"
+        lines = [f"{word} {weight}" if is_pattern(word) else f"{word},{weight}" for word, weight in words.items()]
+    atomic_write_text(path, "\n".join(lines) + "\n" if lines else "")
+    return len(words)